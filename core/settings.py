@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 from datetime import timedelta
 
@@ -50,12 +51,14 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework_simplejwt',
+    'django_filters',
     'auth_app',
     'quizly_app',
     'corsheaders',
 ]
 
 MIDDLEWARE = [
+    'quizly_app.api.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -93,6 +96,13 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # The job and batch worker threads write concurrently. IMMEDIATE transactions take the write lock when they
+        # begin and wait up to `timeout` seconds for it, instead of failing with "database is locked" when a read
+        # transaction is upgraded. Every atomic block therefore holds the write lock, keep them short.
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
+        # Tests run the worker threads against a database file, an in-memory test database fails concurrent writes
+        # with "database table is locked" instead of waiting for the lock
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -149,4 +159,144 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=15),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
-}
\ No newline at end of file
+}
+
+
+# Quiz generation pipeline
+
+QUIZLY_GEMINI_MODEL = os.getenv('QUIZLY_GEMINI_MODEL', 'gemini-2.5-flash')
+
+# Run quiz creation as background job unless the request sets `background` explicitly
+QUIZLY_BACKGROUND_JOBS_DEFAULT = os.getenv('QUIZLY_BACKGROUND_JOBS_DEFAULT', 'False') == 'True'
+# Number of worker threads per process that run background quiz jobs
+QUIZLY_JOB_WORKERS = int(os.getenv('QUIZLY_JOB_WORKERS', '2'))
+# Maximum number of jobs waiting for a worker per process before new jobs are rejected
+QUIZLY_JOB_MAX_QUEUED = int(os.getenv('QUIZLY_JOB_MAX_QUEUED', '50'))
+# Re-queue jobs of stopped processes when the first request arrives and on every worker heartbeat
+QUIZLY_JOB_RESUME_ON_STARTUP = True
+# Seconds without progress after which a running job is considered interrupted
+QUIZLY_JOB_STALE_AFTER = 2 * 60 * 60
+QUIZLY_JOB_MAX_ATTEMPTS = 3
+# Processes that run jobs refresh their registration every QUIZLY_WORKER_HEARTBEAT_INTERVAL seconds, their jobs
+# are taken over by other processes when the heartbeat is older than QUIZLY_WORKER_TIMEOUT seconds
+QUIZLY_WORKER_HEARTBEAT_INTERVAL = 30
+QUIZLY_WORKER_TIMEOUT = 120
+
+# Cache for transcripts and generated quizzes keyed by YouTube video id
+QUIZLY_PIPELINE_CACHE_MAX_ENTRIES = int(os.getenv('QUIZLY_PIPELINE_CACHE_MAX_ENTRIES', '500'))
+QUIZLY_PIPELINE_CACHE_TTL = int(os.getenv('QUIZLY_PIPELINE_CACHE_TTL', str(24 * 60 * 60)))
+
+# Caption tracks are used instead of audio transcription when one of these languages is available
+QUIZLY_CAPTION_LANGUAGES = ['de', 'en']
+# Caption tracks with less text are treated as unusable
+QUIZLY_CAPTION_MIN_CHARS = 200
+
+# Videos longer than this many seconds are rejected by the metadata probe
+QUIZLY_MAX_VIDEO_DURATION = int(os.getenv('QUIZLY_MAX_VIDEO_DURATION', str(2 * 60 * 60)))
+QUIZLY_ALLOW_LIVE_VIDEOS = False
+
+# Transcription backend for videos without captions: 'gemini', 'whisper', 'whispercpp' or a dotted class path
+QUIZLY_TRANSCRIPTION_BACKEND = os.getenv('QUIZLY_TRANSCRIPTION_BACKEND', 'gemini')
+# Language passed to the local Whisper backends, None lets Whisper detect it
+QUIZLY_TRANSCRIPTION_LANGUAGE = None
+# Whisper model name, smaller models like 'base' or 'small' suit CPU-only nodes
+QUIZLY_WHISPER_MODEL = os.getenv('QUIZLY_WHISPER_MODEL', 'small')
+# Device for openai-whisper, None picks CUDA when available
+QUIZLY_WHISPER_DEVICE = os.getenv('QUIZLY_WHISPER_DEVICE') or None
+# Quantize the openai-whisper model to int8 when it runs on CPU
+QUIZLY_WHISPER_INT8 = os.getenv('QUIZLY_WHISPER_INT8', 'False') == 'True'
+
+# Audio longer than this many seconds is split into overlapping segments that are transcribed in parallel
+QUIZLY_CHUNK_THRESHOLD = 10 * 60
+QUIZLY_CHUNK_LENGTH = 5 * 60
+QUIZLY_CHUNK_OVERLAP = 3
+QUIZLY_CHUNK_SILENCE_NOISE = '-30dB'
+QUIZLY_CHUNK_RETRIES = 3
+QUIZLY_TRANSCRIPTION_WORKERS = int(os.getenv('QUIZLY_TRANSCRIPTION_WORKERS', '4'))
+
+# Speech audio profile for downloaded audio: yt-dlp format selector, codec ('opus', 'flac', 'mp3'), bitrate in kbps,
+# sample rate in Hz and whether long silences are removed before transcription
+QUIZLY_AUDIO_DOWNLOAD_FORMAT = 'bestaudio[abr<=96]/worstaudio/bestaudio/best'
+QUIZLY_AUDIO_CODEC = os.getenv('QUIZLY_AUDIO_CODEC', 'opus')
+QUIZLY_AUDIO_BITRATE = os.getenv('QUIZLY_AUDIO_BITRATE', '24')
+QUIZLY_AUDIO_SAMPLE_RATE = 16000
+QUIZLY_AUDIO_TRIM_SILENCE = os.getenv('QUIZLY_AUDIO_TRIM_SILENCE', 'False') == 'True'
+
+# Scratch space for downloaded audio, for example a tmpfs mount, and the byte quota shared by all jobs on this host
+QUIZLY_SCRATCH_ROOT = os.getenv('QUIZLY_SCRATCH_ROOT') or os.path.join(tempfile.gettempdir(), 'quizly')
+QUIZLY_SCRATCH_QUOTA_BYTES = int(os.getenv('QUIZLY_SCRATCH_QUOTA_BYTES', str(2 * 1024 ** 3)))
+# Reservation for videos without size or duration information
+QUIZLY_SCRATCH_DEFAULT_RESERVATION = 200 * 1024 ** 2
+# Seconds a job waits for free scratch space before it fails
+QUIZLY_SCRATCH_WAIT_TIMEOUT = 10 * 60
+
+# Lock files and results for coalescing concurrent requests for the same video across processes on one host
+QUIZLY_SINGLEFLIGHT_DIR = os.getenv('QUIZLY_SINGLEFLIGHT_DIR') or os.path.join(tempfile.gettempdir(), 'quizly-singleflight')
+QUIZLY_SINGLEFLIGHT_RESULT_TTL = 5 * 60
+
+# Budgets of the shared scheduler in front of all Gemini calls and the attempts per call for retryable errors
+QUIZLY_GEMINI_REQUESTS_PER_MINUTE = int(os.getenv('QUIZLY_GEMINI_REQUESTS_PER_MINUTE', '60'))
+QUIZLY_GEMINI_TOKENS_PER_MINUTE = int(os.getenv('QUIZLY_GEMINI_TOKENS_PER_MINUTE', '1000000'))
+QUIZLY_GEMINI_MAX_ATTEMPTS = 5
+# Tokens reserved for the answer of a model call when estimating its size
+QUIZLY_GEMINI_OUTPUT_TOKEN_ESTIMATE = 2000
+
+# Number of questions per quiz
+QUIZLY_QUESTION_COUNT = int(os.getenv('QUIZLY_QUESTION_COUNT', '10'))
+# Upper limit for the question count requested when a quiz is regenerated
+QUIZLY_MAX_QUESTION_COUNT = 30
+# Transcripts longer than this many characters are split into sections of about QUIZLY_SECTION_CHARS characters,
+# questions are generated per section in parallel and a final call with QUIZLY_SELECTION_MODEL picks the best ones
+QUIZLY_LONG_TRANSCRIPT_THRESHOLD = int(os.getenv('QUIZLY_LONG_TRANSCRIPT_THRESHOLD', '60000'))
+QUIZLY_SECTION_CHARS = 20000
+QUIZLY_MAP_CANDIDATE_FACTOR = 1.5
+QUIZLY_SELECTION_MODEL = os.getenv('QUIZLY_SELECTION_MODEL', 'gemini-2.5-flash-lite')
+QUIZLY_GENERATION_WORKERS = 4
+
+# Pipeline mode: 'two-step' transcribes the audio and sends the transcript to Gemini in a second call,
+# 'multimodal' sends the video ('url') or the downloaded audio ('audio') with the quiz schema in a single call
+QUIZLY_PIPELINE_MODE = os.getenv('QUIZLY_PIPELINE_MODE', 'two-step')
+QUIZLY_MULTIMODAL_SOURCE = os.getenv('QUIZLY_MULTIMODAL_SOURCE', 'url')
+# Let the multimodal call also return the transcript so later requests for the same video can use the cache
+QUIZLY_MULTIMODAL_RETURN_TRANSCRIPT = os.getenv('QUIZLY_MULTIMODAL_RETURN_TRANSCRIPT', 'True') == 'True'
+
+# Maximum number of quizzes accepted by one request to the bulk import endpoint
+QUIZLY_IMPORT_MAX_QUIZZES = int(os.getenv('QUIZLY_IMPORT_MAX_QUIZZES', '100'))
+
+# Quizzes per page of the quiz list, clients can ask for up to QUIZLY_QUIZ_MAX_PAGE_SIZE with ?page_size=
+QUIZLY_QUIZ_PAGE_SIZE = int(os.getenv('QUIZLY_QUIZ_PAGE_SIZE', '20'))
+QUIZLY_QUIZ_MAX_PAGE_SIZE = 100
+
+# Cache for quiz list and detail responses: 'local' (in-process, cachetools), 'django' (the Django cache
+# QUIZLY_RESPONSE_CACHE_ALIAS, shared by all processes) or a dotted class path
+QUIZLY_RESPONSE_CACHE_BACKEND = os.getenv('QUIZLY_RESPONSE_CACHE_BACKEND', 'local')
+QUIZLY_RESPONSE_CACHE_ALIAS = 'default'
+QUIZLY_RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('QUIZLY_RESPONSE_CACHE_MAX_ENTRIES', '1000'))
+QUIZLY_RESPONSE_CACHE_TTL = int(os.getenv('QUIZLY_RESPONSE_CACHE_TTL', '300'))
+
+# Per-process cache of the users resolved from access tokens, 0 entries disables it. Saving or deleting a user
+# clears its entries in this process, other processes see the change after at most QUIZLY_AUTH_USER_CACHE_TTL seconds
+QUIZLY_AUTH_USER_CACHE_MAX_ENTRIES = int(os.getenv('QUIZLY_AUTH_USER_CACHE_MAX_ENTRIES', '1000'))
+QUIZLY_AUTH_USER_CACHE_TTL = int(os.getenv('QUIZLY_AUTH_USER_CACHE_TTL', '60'))
+
+# Add a Server-Timing header with the pipeline stage durations to every response
+QUIZLY_SERVER_TIMING = os.getenv('QUIZLY_SERVER_TIMING', 'True') == 'True'
+# Bearer token of the Prometheus scraper for /api/metrics/, without a token only admin users can read it
+QUIZLY_METRICS_TOKEN = os.getenv('QUIZLY_METRICS_TOKEN', '')
+# Dotted paths of tracer classes that receive the pipeline stages, e.g. 'quizly_app.api.instrumentation.OpenTelemetryTracer'
+QUIZLY_TRACERS = [path for path in os.getenv('QUIZLY_TRACERS', '').split(',') if path]
+
+# Batch quiz creation: videos per batch (also the playlist limit), worker threads per process (global concurrency),
+# items of one user running at once, and finished quizzes saved together in one bulk insert
+QUIZLY_BATCH_MAX_VIDEOS = int(os.getenv('QUIZLY_BATCH_MAX_VIDEOS', '100'))
+QUIZLY_BATCH_WORKERS = int(os.getenv('QUIZLY_BATCH_WORKERS', '4'))
+QUIZLY_BATCH_USER_CONCURRENCY = int(os.getenv('QUIZLY_BATCH_USER_CONCURRENCY', '2'))
+QUIZLY_BATCH_SAVE_BUFFER = 10
+# Seconds a finished quiz waits in the save buffer at most, so progress stays visible while the buffer fills
+QUIZLY_BATCH_SAVE_INTERVAL = 2
+
+# Quiz search: 'sqlite' (FTS5 index, created by migration 0011 on SQLite), 'database' (unindexed icontains search
+# for other databases) or a dotted class path. Words per query beyond QUIZLY_SEARCH_MAX_TERMS are ignored
+QUIZLY_SEARCH_BACKEND = os.getenv('QUIZLY_SEARCH_BACKEND', 'sqlite')
+QUIZLY_SEARCH_MAX_TERMS = 8
+QUIZLY_SEARCH_REBUILD_BATCH = 1000
\ No newline at end of file
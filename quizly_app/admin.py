@@ -1,6 +1,11 @@
 from django.contrib import admin
 
-from quizly_app.models import Quiz, Question
+from quizly_app.models import Quiz, Question, QuizBatch, QuizJob, JobWorker, PipelineRun, Transcript
 
 admin.site.register(Quiz)
-admin.site.register(Question)
\ No newline at end of file
+admin.site.register(Question)
+admin.site.register(QuizJob)
+admin.site.register(QuizBatch)
+admin.site.register(JobWorker)
+admin.site.register(PipelineRun)
+admin.site.register(Transcript)
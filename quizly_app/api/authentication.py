@@ -1,4 +1,63 @@
+import copy
+import threading
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+
+class UserCache:
+    """
+    Per-process cache of the users resolved from access tokens, keyed by user id and token `jti`. Entries expire
+    after `ttl` seconds and the least recently used entry is evicted once `max_entries` users are cached.
+    A cache with `max_entries` 0 is disabled.
+    """
+    def __init__(self, max_entries, ttl):
+        self._lock = threading.Lock()
+        self._cache = TTLCache(maxsize=max_entries, ttl=ttl) if max_entries else None
+
+    def get(self, key):
+        if self._cache is None:
+            return None
+        with self._lock:
+            user = self._cache.get(key)
+        return copy.copy(user) if user is not None else None
+
+    def set(self, key, user):
+        if self._cache is None:
+            return
+        with self._lock:
+            self._cache[key] = copy.copy(user)
+
+    def invalidate_user(self, user_id):
+        """
+        Removes all cached entries of a user, whatever token they were resolved from.
+        """
+        if self._cache is None:
+            return
+        with self._lock:
+            for key in [key for key in self._cache.keys() if key[0] == user_id]:
+                self._cache.pop(key, None)
+
+    def clear(self):
+        if self._cache is not None:
+            with self._lock:
+                self._cache.clear()
+
+
+user_cache = UserCache(max_entries=settings.QUIZLY_AUTH_USER_CACHE_MAX_ENTRIES, ttl=settings.QUIZLY_AUTH_USER_CACHE_TTL)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Drops the cached user whenever it is saved or deleted, so deactivations and password changes take effect immediately.
+    """
+    user_cache.invalidate_user(str(instance.pk))
 
 
 class CookieJWTAuthentication(JWTAuthentication):
@@ -14,4 +73,20 @@ class CookieJWTAuthentication(JWTAuthentication):
         if not token:
             return None
         validated_token = self.get_validated_token(token)
-        return self.get_user(validated_token), validated_token
\ No newline at end of file
+        return self.get_user(validated_token), validated_token
+
+    def get_user(self, validated_token):
+        """
+        The `get_user` function returns the user of a validated token from the user cache and only queries the
+        database, including the active and password checks, for tokens it has not resolved before.
+        """
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if jti is None or user_id is None:
+            return super().get_user(validated_token)
+        key = (str(user_id), jti)
+        user = user_cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(key, user)
+        return user
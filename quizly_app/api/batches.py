@@ -0,0 +1,221 @@
+import logging
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from quizly_app.models import QuizBatch, QuizJob
+from .jobs import WORKER_ID, update_job
+from .workers import worker_registry
+from .quiz_logic import build_quiz_item, save_quizzes_bulk
+
+logger = logging.getLogger(__name__)
+
+
+class _BatchState:
+    """
+    In-memory state of a batch in this process: its owner, the items that still have to finish, the finished
+    quizzes waiting for the next bulk save and the timer that saves them.
+    """
+    def __init__(self, batch_id, owner):
+        self.batch_id = batch_id
+        self.owner = owner
+        self.lock = threading.Lock()
+        self.outstanding = 0
+        self.buffer = []
+        self.timer = None
+
+    def take_buffer(self):
+        """
+        Empties the buffer and cancels its timer, returns the buffered entries. Must be called with `lock` held.
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        entries, self.buffer = self.buffer, []
+        return entries
+
+
+class BatchRunner:
+    """
+    Runs the items of quiz batches on a process-wide pool of `workers` threads, which bounds the global concurrency.
+    Every user has at most `per_user` items in the pool at once, the rest waits in a per-user queue, so one large
+    playlist cannot hold all workers. Finished quizzes are buffered and saved in bulk, `buffer_size` at a time, at the
+    latest `flush_interval` seconds after they finished and when the last item of a batch finished. Each item is
+    marked as succeeded with the save of its quiz. Failed items are recorded on their job and do not affect the others.
+    """
+    def __init__(self, workers, per_user, buffer_size, flush_interval):
+        self.workers = workers
+        self.per_user = per_user
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = defaultdict(deque)
+        self._running = defaultdict(int)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                worker_registry.start()
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='quizly-batch')
+            return self._executor
+
+    def submit(self, batch, job_ids):
+        """
+        Queues the given jobs of a batch behind the other items of its owner.
+        """
+        state = _BatchState(batch.pk, batch.owner)
+        state.outstanding = len(job_ids)
+        executor = self._get_executor()
+        with self._lock:
+            self._pending[batch.owner_id].extend((state, job_id) for job_id in job_ids)
+        self._dispatch(batch.owner_id, executor)
+
+    def _dispatch(self, user_id, executor):
+        with self._lock:
+            while self._running[user_id] < self.per_user and self._pending[user_id]:
+                state, job_id = self._pending[user_id].popleft()
+                self._running[user_id] += 1
+                executor.submit(self._run_item, user_id, state, job_id)
+            if not self._pending[user_id]:
+                del self._pending[user_id]
+            if not self._running[user_id]:
+                del self._running[user_id]
+
+    def _run_item(self, user_id, state, job_id):
+        entry = None
+        try:
+            entry = run_batch_item(job_id)
+        except Exception:
+            logger.exception('Batch item %s failed', job_id)
+        finally:
+            try:
+                self._finish_item(state, entry)
+            finally:
+                with self._lock:
+                    self._running[user_id] -= 1
+                self._dispatch(user_id, self._get_executor())
+
+    def _finish_item(self, state, entry):
+        with state.lock:
+            state.outstanding -= 1
+            if entry is not None:
+                state.buffer.append(entry)
+            finished = state.outstanding == 0
+            entries = []
+            if finished or len(state.buffer) >= self.buffer_size:
+                entries = state.take_buffer()
+            elif state.buffer and state.timer is None:
+                state.timer = threading.Timer(self.flush_interval, self._flush, args=(state,))
+                state.timer.daemon = True
+                state.timer.start()
+        try:
+            if entries:
+                save_batch_items(state.owner, entries)
+        finally:
+            if finished:
+                QuizBatch.objects.filter(pk=state.batch_id).update(finished_at=timezone.now(), updated_at=timezone.now())
+            close_old_connections()
+
+    def _flush(self, state):
+        with state.lock:
+            state.timer = None
+            entries, state.buffer = state.buffer, []
+        try:
+            if entries:
+                save_batch_items(state.owner, entries)
+        finally:
+            close_old_connections()
+
+    def stats(self):
+        with self._lock:
+            return {'queued': sum(len(items) for items in self._pending.values()), 'running': sum(self._running.values())}
+
+
+def run_batch_item(job_id):
+    """
+    Claims a pending job of a batch and runs the pipeline for it up to the save. Returns (job_id, quiz item) for
+    the bulk save or None if the job was claimed elsewhere or failed, failures are recorded on the job.
+    """
+    close_old_connections()
+    claimed = QuizJob.objects.filter(pk=job_id, status=QuizJob.STATUS_PENDING).update(
+        status=QuizJob.STATUS_RUNNING, worker=WORKER_ID, attempts=F('attempts') + 1,
+        started_at=timezone.now(), updated_at=timezone.now())
+    if not claimed:
+        return None
+    video_url, mode = QuizJob.objects.filter(pk=job_id).values_list('video_url', 'mode').get()
+    try:
+        item = build_quiz_item(video_url, on_stage=lambda stage: update_job(job_id, stage=stage), mode=mode)
+    except Exception as e:
+        logger.warning('Batch item %s failed: %s', job_id, e)
+        update_job(job_id, status=QuizJob.STATUS_FAILED, error=str(e), finished_at=timezone.now())
+        return None
+    update_job(job_id, stage=QuizJob.STAGE_SAVE, video_metadata=item['video_metadata'])
+    return job_id, item
+
+
+def save_batch_items(owner, entries):
+    """
+    Saves the buffered quizzes of a batch with one bulk insert and marks their jobs as succeeded with one bulk update.
+    If the save fails, all jobs of the buffer are marked as failed.
+    """
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            quizzes = save_quizzes_bulk(owner, [item for _, item in entries])
+            QuizJob.objects.bulk_update([
+                QuizJob(pk=job_id, quiz=quiz, status=QuizJob.STATUS_SUCCEEDED, stage=QuizJob.STAGE_DONE, error=None, finished_at=now, updated_at=now)
+                for (job_id, _), quiz in zip(entries, quizzes)
+            ], ['quiz', 'status', 'stage', 'error', 'finished_at', 'updated_at'])
+    except Exception as e:
+        logger.exception('Saving %s batch items failed', len(entries))
+        QuizJob.objects.filter(pk__in=[job_id for job_id, _ in entries]).update(
+            status=QuizJob.STATUS_FAILED, error=f'Saving the quiz failed: {e}', finished_at=now, updated_at=now)
+
+
+def create_quiz_batch(user, video_urls, source_url=None, title=None, mode=None):
+    """
+    Persists a batch owned by this process with one pending job per distinct video URL and hands the jobs to the
+    batch runner once the surrounding transaction commits. Returns the created QuizBatch instance.
+    """
+    video_urls = list(dict.fromkeys(video_urls))
+    worker_registry.start()
+    with transaction.atomic():
+        batch = QuizBatch.objects.create(owner=user, source_url=source_url, title=title, mode=mode, worker=WORKER_ID)
+        jobs = QuizJob.objects.bulk_create([QuizJob(owner=user, batch=batch, video_url=url, mode=mode) for url in video_urls])
+        job_ids = [job.pk for job in jobs]
+        transaction.on_commit(lambda: batch_runner.submit(batch, job_ids))
+    return batch
+
+
+def resume_unfinished_batches():
+    """
+    Takes over the unfinished batches whose worker is no longer live, see `WorkerRegistry`, and hands their pending
+    jobs to the batch runner of this process. Batches of live workers are left to them. `resume_unfinished_jobs`
+    resets the interrupted jobs to pending first. Returns the number of re-queued jobs.
+    """
+    live_workers = worker_registry.live_worker_ids()
+    resumed = 0
+    orphaned = QuizBatch.objects.filter(finished_at__isnull=True).exclude(worker__in=live_workers).select_related('owner')
+    for batch in orphaned:
+        if not QuizBatch.objects.filter(pk=batch.pk, worker=batch.worker).update(worker=WORKER_ID):
+            continue
+        job_ids = list(batch.jobs.filter(status=QuizJob.STATUS_PENDING).order_by('id').values_list('id', flat=True))
+        if job_ids:
+            batch_runner.submit(batch, job_ids)
+            resumed += len(job_ids)
+        elif not batch.jobs.filter(status=QuizJob.STATUS_RUNNING).exists():
+            QuizBatch.objects.filter(pk=batch.pk).update(finished_at=timezone.now(), updated_at=timezone.now())
+    if resumed:
+        logger.info('Resumed %s unfinished batch items', resumed)
+    return resumed
+
+
+batch_runner = BatchRunner(workers=settings.QUIZLY_BATCH_WORKERS, per_user=settings.QUIZLY_BATCH_USER_CONCURRENCY,
+                           buffer_size=settings.QUIZLY_BATCH_SAVE_BUFFER, flush_interval=settings.QUIZLY_BATCH_SAVE_INTERVAL)
+worker_registry.add_reaper(resume_unfinished_batches)
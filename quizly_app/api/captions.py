@@ -0,0 +1,89 @@
+import html
+import json
+import re
+
+from django.conf import settings
+
+CAPTION_FORMATS = ('json3', 'vtt')
+VTT_TAG_PATTERN = re.compile(r'<[^>]+>')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def _language_matches(track_language, wanted_language):
+    """
+    Checks whether a track language like `de-DE` or `en-orig` belongs to the wanted language code.
+    """
+    return track_language == wanted_language or track_language.split('-')[0] == wanted_language
+
+
+def _pick_format(tracks):
+    for caption_format in CAPTION_FORMATS:
+        for track in tracks:
+            if track.get('ext') == caption_format and track.get('url'):
+                return track
+    return None
+
+
+def select_caption_track(video_info):
+    """
+    Picks the best caption track of a video from its yt-dlp info dict. Manual subtitles are preferred over
+    automatic captions and languages are tried in the order of `QUIZLY_CAPTION_LANGUAGES`.
+    Returns the track dict with `ext`, `url` and `language` or None if no usable track exists.
+    """
+    for source in ('subtitles', 'automatic_captions'):
+        tracks_by_language = video_info.get(source) or {}
+        for wanted_language in settings.QUIZLY_CAPTION_LANGUAGES:
+            for track_language, tracks in tracks_by_language.items():
+                if not _language_matches(track_language, wanted_language):
+                    continue
+                track = _pick_format(tracks)
+                if track is not None:
+                    return {**track, 'language': track_language, 'automatic': source == 'automatic_captions'}
+    return None
+
+
+def parse_json3_captions(raw):
+    """
+    Extracts the plain text of a YouTube `json3` caption document.
+    """
+    lines = []
+    for event in json.loads(raw).get('events', []):
+        text = ''.join(segment.get('utf8', '') for segment in event.get('segs') or [])
+        text = WHITESPACE_PATTERN.sub(' ', text).strip()
+        if text:
+            lines.append(text)
+    return ' '.join(lines)
+
+
+def parse_vtt_captions(raw):
+    """
+    Extracts the plain text of a WebVTT caption document. Cue timings, styling tags and the lines that
+    automatic captions repeat while they roll are dropped.
+    """
+    lines = []
+    for line in raw.splitlines():
+        line = line.strip()
+        if not line or line == 'WEBVTT' or '-->' in line or line.isdigit() or line.startswith(('Kind:', 'Language:', 'NOTE', 'STYLE')):
+            continue
+        text = WHITESPACE_PATTERN.sub(' ', html.unescape(VTT_TAG_PATTERN.sub('', line))).strip()
+        if text and (not lines or lines[-1] != text):
+            lines.append(text)
+    return ' '.join(lines)
+
+
+def fetch_caption_text(ydl, video_info):
+    """
+    Downloads the best caption track of a video through the given YoutubeDL instance and returns its text.
+    Returns None if the video has no captions or the captions are too short to build a quiz from.
+    """
+    track = select_caption_track(video_info)
+    if track is None:
+        return None
+    try:
+        raw = ydl.urlopen(track['url']).read().decode('utf-8')
+        text = parse_json3_captions(raw) if track['ext'] == 'json3' else parse_vtt_captions(raw)
+    except Exception:
+        return None
+    if len(text) < settings.QUIZLY_CAPTION_MIN_CHARS:
+        return None
+    return text
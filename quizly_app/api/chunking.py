@@ -0,0 +1,168 @@
+import asyncio
+import os
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from tenacity import AsyncRetrying, Retrying, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+
+from .exceptions import PipelineError
+from .instrumentation import propagate_context
+
+SILENCE_END_PATTERN = re.compile(r'silence_end: (?P<end>[\d.]+) \| silence_duration: (?P<duration>[\d.]+)')
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def get_audio_duration(file_path):
+    """
+    Returns the duration of an audio file in seconds using ffprobe or None if it cannot be determined.
+    """
+    try:
+        result = subprocess.run(['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', file_path],
+                                capture_output=True, text=True, check=True)
+        return float(result.stdout.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+
+
+def detect_silences(file_path):
+    """
+    Returns the midpoints of the silent passages of an audio file in seconds, detected with FFmpeg's silencedetect filter.
+    """
+    result = subprocess.run(['ffmpeg', '-hide_banner', '-nostats', '-i', file_path, '-af', f'silencedetect=noise={settings.QUIZLY_CHUNK_SILENCE_NOISE}:d=0.5', '-f', 'null', '-'],
+                            capture_output=True, text=True)
+    return [float(m['end']) - float(m['duration']) / 2 for m in SILENCE_END_PATTERN.finditer(result.stderr)]
+
+
+def plan_segments(duration, silences, target_length, overlap):
+    """
+    Splits `duration` seconds into segments of about `target_length` seconds. Cuts are moved to the closest
+    silence within a quarter of the target length, and every segment after the first starts `overlap` seconds
+    before the previous cut so no word is lost at a boundary. Returns a list of (start, end) tuples.
+    """
+    segments = []
+    cursor = 0.0
+    tolerance = target_length / 4
+    while cursor < duration:
+        end = cursor + target_length
+        if end >= duration - tolerance:
+            end = duration
+        else:
+            nearby = [point for point in silences if abs(point - end) <= tolerance and point > cursor]
+            if nearby:
+                end = min(nearby, key=lambda point: abs(point - end))
+        segments.append((max(0.0, cursor - overlap) if segments else 0.0, end))
+        cursor = end
+    return segments
+
+
+def cut_segment(file_path, start, end, output_path):
+    """
+    Copies the part between `start` and `end` seconds of an audio file into `output_path` without re-encoding.
+    """
+    subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-ss', f'{start:.3f}', '-t', f'{end - start:.3f}', '-i', file_path, '-c', 'copy', output_path], check=True)
+    return output_path
+
+
+def _words(text):
+    return [word.lower() for word in WORD_PATTERN.findall(text)]
+
+
+def stitch_transcripts(parts, max_overlap_words=60):
+    """
+    Joins segment transcripts in order. Words that a segment repeats from the end of the previous segment,
+    because both transcribed the same overlapping audio, are removed from the start of the later segment.
+    """
+    stitched = []
+    previous_words = []
+    for text in parts:
+        text = text.strip()
+        words = _words(text)
+        overlap = 0
+        for size in range(min(max_overlap_words, len(previous_words), len(words)), 0, -1):
+            if previous_words[-size:] == words[:size]:
+                overlap = size
+                break
+        if overlap:
+            matches = list(WORD_PATTERN.finditer(text))
+            text = text[matches[overlap - 1].end():].lstrip(' .,;:!?-')
+        if text:
+            stitched.append(text)
+        previous_words = words
+    return ' '.join(stitched)
+
+
+def is_retryable_segment_error(error):
+    """
+    Checks whether a failed segment is worth transcribing again. Model calls are already retried by the model
+    scheduler and fail with a `PipelineError` once that gave up, so only other failures like an interrupted upload
+    or a local transcription error are retried per segment.
+    """
+    return not isinstance(error, PipelineError)
+
+
+def segment_retrying_options():
+    return {'retry': retry_if_exception(is_retryable_segment_error), 'stop': stop_after_attempt(settings.QUIZLY_CHUNK_RETRIES),
+            'wait': wait_exponential_jitter(initial=1, max=20), 'reraise': True}
+
+
+def transcribe_segment(transcribe, segment_path):
+    """
+    Transcribes one segment and retries only this segment with jittered exponential backoff when it fails
+    for another reason than a model call.
+    """
+    for attempt in Retrying(**segment_retrying_options()):
+        with attempt:
+            return transcribe(segment_path)
+
+
+def split_into_segments(file_path, duration):
+    """
+    Cuts a long audio file into overlapping segments at silence boundaries and returns the segment paths.
+    Segment files are written next to the audio file.
+    """
+    segments = plan_segments(duration, detect_silences(file_path), settings.QUIZLY_CHUNK_LENGTH, settings.QUIZLY_CHUNK_OVERLAP)
+    base, extension = os.path.splitext(file_path)
+    return [cut_segment(file_path, start, end, f'{base}.part{index:03d}{extension}') for index, (start, end) in enumerate(segments)]
+
+
+def remove_segments(segment_paths):
+    for path in segment_paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def transcribe_in_chunks(file_path, transcribe, duration):
+    """
+    Splits a long audio file into overlapping segments, transcribes them concurrently on a bounded pool
+    and returns the stitched transcript.
+    """
+    segment_paths = split_into_segments(file_path, duration)
+    try:
+        with ThreadPoolExecutor(max_workers=settings.QUIZLY_TRANSCRIPTION_WORKERS, thread_name_prefix='quizly-transcribe') as pool:
+            parts = list(pool.map(propagate_context(lambda path: transcribe_segment(transcribe, path)), segment_paths))
+    finally:
+        remove_segments(segment_paths)
+    return stitch_transcripts(parts)
+
+
+async def atranscribe_segment(atranscribe, segment_path, semaphore):
+    async with semaphore:
+        async for attempt in AsyncRetrying(**segment_retrying_options()):
+            with attempt:
+                return await atranscribe(segment_path)
+
+
+async def atranscribe_in_chunks(file_path, atranscribe, duration):
+    """
+    Asynchronous variant of `transcribe_in_chunks` that awaits at most `QUIZLY_TRANSCRIPTION_WORKERS` segments at a time.
+    """
+    segment_paths = await sync_to_async(split_into_segments, thread_sensitive=False)(file_path, duration)
+    semaphore = asyncio.Semaphore(settings.QUIZLY_TRANSCRIPTION_WORKERS)
+    try:
+        parts = await asyncio.gather(*(atranscribe_segment(atranscribe, path, semaphore) for path in segment_paths))
+    finally:
+        await sync_to_async(remove_segments, thread_sensitive=False)(segment_paths)
+    return stitch_transcripts(parts)
@@ -0,0 +1,47 @@
+class PipelineError(RuntimeError):
+    """
+    Base class for errors of the quiz pipeline that are reported to the client with `status_code`.
+    """
+    status_code = 400
+
+
+class VideoRejectedError(PipelineError):
+    """
+    Raised when the metadata probe rejects a video because it is unavailable, live or too long.
+    """
+    status_code = 422
+
+
+class JobQueueFullError(PipelineError):
+    """
+    Raised when the worker pool of this process already holds the maximum number of queued jobs.
+    """
+    status_code = 503
+
+
+class ModelUnavailableError(PipelineError):
+    """
+    Raised when Gemini keeps answering with rate limit or server errors after all retries.
+    """
+    status_code = 503
+
+
+class ModelRequestError(PipelineError):
+    """
+    Raised when Gemini rejects a request with an error that retrying cannot fix.
+    """
+    status_code = 502
+
+
+class InvalidQuizDataError(PipelineError):
+    """
+    Raised when the quiz JSON returned by Gemini does not match the quiz schema.
+    """
+    status_code = 502
+
+
+class TranscriptUnavailableError(PipelineError):
+    """
+    Raised when a quiz should be regenerated but no transcript of its video was stored.
+    """
+    status_code = 409
@@ -0,0 +1,15 @@
+import django_filters
+
+from quizly_app.models import Quiz
+
+
+class QuizFilter(django_filters.FilterSet):
+    """
+    Optional filters for the quiz list, which is limited to the quizzes of the requesting user by `QuizListView.get_queryset`.
+    """
+    created_after = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='gte')
+    created_before = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='lt')
+
+    class Meta:
+        model = Quiz
+        fields = ['video_url', 'created_after', 'created_before']
@@ -0,0 +1,30 @@
+import threading
+
+from django.conf import settings
+from google import genai
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Returns the process-wide Gemini client. All model calls share it and with it one pool of HTTP connections,
+    `get_client().aio` is the asynchronous interface of the same client.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = genai.Client(api_key=settings.GEMINI_API_KEY)
+        return _client
+
+
+def set_client(client):
+    """
+    Replaces the process-wide Gemini client, for example with a client using different HTTP options. Returns the
+    previous client, None if none was created yet, so it can be put back without creating one.
+    """
+    global _client
+    with _client_lock:
+        previous, _client = _client, client
+        return previous
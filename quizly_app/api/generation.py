@@ -0,0 +1,214 @@
+import asyncio
+import json
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .exceptions import InvalidQuizDataError
+from .gemini import get_client
+from .scheduler import model_scheduler, estimate_text_tokens
+from .instrumentation import propagate_context
+
+JSON_CONFIG = {'response_mime_type': 'application/json'}
+SENTENCE_END_PATTERN = re.compile(r'(?<=[.!?])\s+|\n+')
+NORMALIZE_PATTERN = re.compile(r'\W+')
+DIFFICULTY_INSTRUCTIONS = {
+    'easy': 'Die Fragen sollen leicht sein und die wichtigsten Aussagen abfragen.',
+    'medium': 'Die Fragen sollen mittelschwer sein.',
+    'hard': 'Die Fragen sollen schwer sein, auf Details eingehen und plausible falsche Antworten enthalten.',
+}
+
+
+def difficulty_instruction(difficulty):
+    return DIFFICULTY_INSTRUCTIONS.get(difficulty, '')
+
+
+def build_quiz_prompt(text, question_count, difficulty=None):
+    """
+    Returns the prompt that asks Gemini for a quiz about the given transcript, optionally of a given difficulty.
+    """
+    return f"""
+    Erstelle ein Multiple-Choice-Quiz mit {question_count} Fragen basierend auf folgendem Video-Transkript:
+    {difficulty_instruction(difficulty)}
+    Das Format muss STRICT JSON sein:
+    {{
+      'title': '...',
+      'description': '...',
+      'questions': [
+        {{
+          'question_title': '...',
+          'question_options': ['A','B','C','D'],
+          'answer': 'A'
+        }}
+      ]
+    }}
+    Transkript: 
+    {text}
+    """
+
+
+def build_section_prompt(section, question_count, difficulty=None):
+    """
+    Returns the prompt that asks Gemini for candidate questions and a short summary of one transcript section.
+    """
+    return f"""
+    Erstelle {question_count} Multiple-Choice-Fragen zu folgendem Abschnitt eines Video-Transkripts
+    und fasse den Abschnitt in einem Satz zusammen.
+    {difficulty_instruction(difficulty)}
+    Das Format muss STRICT JSON sein:
+    {{
+      'summary': '...',
+      'questions': [
+        {{
+          'question_title': '...',
+          'question_options': ['A','B','C','D'],
+          'answer': 'A'
+        }}
+      ]
+    }}
+    Abschnitt:
+    {section}
+    """
+
+
+def build_selection_prompt(summaries, candidates, question_count):
+    """
+    Returns the prompt that asks Gemini to pick the best questions from the candidates of all sections and to
+    title the quiz. Only the question titles are sent, which keeps the final call small.
+    """
+    numbered = '\n'.join(f'{index}: {question["question_title"]}' for index, question in enumerate(candidates))
+    return f"""
+    Ein Video-Transkript wurde in Abschnitte mit folgenden Zusammenfassungen geteilt:
+    {' '.join(summaries)}
+    Wähle aus den folgenden Fragen die {question_count} besten aus. Sie sollen das ganze Video abdecken
+    und sich nicht wiederholen. Gib außerdem einen Titel und eine Beschreibung für das Quiz an.
+    Das Format muss STRICT JSON sein:
+    {{
+      'title': '...',
+      'description': '...',
+      'selected': [0, 1, 2]
+    }}
+    Fragen:
+    {numbered}
+    """
+
+
+def split_transcript(text, section_chars):
+    """
+    Splits a transcript into sections of at most about `section_chars` characters at sentence boundaries.
+    """
+    sections = []
+    current = ''
+    for sentence in SENTENCE_END_PATTERN.split(text):
+        if current and len(current) + len(sentence) + 1 > section_chars:
+            sections.append(current)
+            current = ''
+        current = f'{current} {sentence}' if current else sentence
+    if current.strip():
+        sections.append(current)
+    return sections
+
+
+def deduplicate_questions(questions):
+    """
+    Removes questions whose normalized title was already seen and questions without a title.
+    """
+    seen = set()
+    unique = []
+    for question in questions:
+        key = NORMALIZE_PATTERN.sub(' ', str(question.get('question_title', ''))).strip().lower()
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(question)
+    return unique
+
+
+def candidates_per_section(question_count, section_count):
+    return max(2, math.ceil(question_count * settings.QUIZLY_MAP_CANDIDATE_FACTOR / section_count))
+
+
+def assemble_quiz(selection, candidates, question_count):
+    """
+    Builds the final quiz from the selection answer. Invalid or missing indexes are skipped and the quiz is
+    filled up with the remaining candidates in transcript order.
+    """
+    chosen = []
+    for index in selection.get('selected') or []:
+        if isinstance(index, int) and 0 <= index < len(candidates) and index not in chosen:
+            chosen.append(index)
+    chosen += [index for index in range(len(candidates)) if index not in chosen]
+    return {
+        'title': selection.get('title'),
+        'description': selection.get('description'),
+        'questions': [candidates[index] for index in chosen[:question_count]],
+    }
+
+
+def parse_model_json(text):
+    """
+    Parses the JSON object answered by Gemini. Empty answers, for example of a response blocked by the safety
+    filters, and malformed JSON raise `InvalidQuizDataError`.
+    """
+    if not text:
+        raise InvalidQuizDataError('Gemini returned an empty answer.')
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        raise InvalidQuizDataError(f'Gemini returned invalid JSON: {e}') from e
+    if not isinstance(data, dict):
+        raise InvalidQuizDataError('Gemini returned JSON that is not an object.')
+    return data
+
+
+def generate_json(prompt, model=None):
+    """
+    Sends a prompt through the model scheduler and returns the parsed JSON answer.
+    """
+    response = model_scheduler.call(lambda: get_client().models.generate_content(model=model or settings.QUIZLY_GEMINI_MODEL, contents=prompt, config=JSON_CONFIG),
+                                    tokens=estimate_text_tokens(prompt))
+    return parse_model_json(response.text)
+
+
+async def agenerate_json(prompt, model=None):
+    """
+    Asynchronous variant of `generate_json`.
+    """
+    response = await model_scheduler.acall(lambda: get_client().aio.models.generate_content(model=model or settings.QUIZLY_GEMINI_MODEL, contents=prompt, config=JSON_CONFIG),
+                                           tokens=estimate_text_tokens(prompt))
+    return parse_model_json(response.text)
+
+
+def generate_quiz_map_reduce(text, question_count, difficulty=None):
+    """
+    Long-transcript mode: generates candidate questions for every section concurrently (map), then lets a cheap
+    selection call pick `question_count` questions from the de-duplicated candidates (reduce).
+    """
+    sections = split_transcript(text, settings.QUIZLY_SECTION_CHARS)
+    per_section = candidates_per_section(question_count, len(sections))
+    with ThreadPoolExecutor(max_workers=settings.QUIZLY_GENERATION_WORKERS, thread_name_prefix='quizly-generate') as pool:
+        results = list(pool.map(propagate_context(lambda section: generate_json(build_section_prompt(section, per_section, difficulty))), sections))
+    candidates = deduplicate_questions([question for result in results for question in result.get('questions', [])])
+    summaries = [result.get('summary', '') for result in results]
+    selection = generate_json(build_selection_prompt(summaries, candidates, question_count), model=settings.QUIZLY_SELECTION_MODEL)
+    return assemble_quiz(selection, candidates, question_count)
+
+
+async def agenerate_quiz_map_reduce(text, question_count, difficulty=None):
+    """
+    Asynchronous variant of `generate_quiz_map_reduce`.
+    """
+    sections = split_transcript(text, settings.QUIZLY_SECTION_CHARS)
+    per_section = candidates_per_section(question_count, len(sections))
+    semaphore = asyncio.Semaphore(settings.QUIZLY_GENERATION_WORKERS)
+
+    async def generate_section(section):
+        async with semaphore:
+            return await agenerate_json(build_section_prompt(section, per_section, difficulty))
+
+    results = await asyncio.gather(*(generate_section(section) for section in sections))
+    candidates = deduplicate_questions([question for result in results for question in result.get('questions', [])])
+    summaries = [result.get('summary', '') for result in results]
+    selection = await agenerate_json(build_selection_prompt(summaries, candidates, question_count), model=settings.QUIZLY_SELECTION_MODEL)
+    return assemble_quiz(selection, candidates, question_count)
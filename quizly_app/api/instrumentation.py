@@ -0,0 +1,271 @@
+import bisect
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+_current_timings = contextvars.ContextVar('quizly_request_timings', default=None)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels, rendered in the Prometheus text format.
+    """
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, self.labelnames, key, value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """
+    Histogram with fixed upper bounds and optional labels, rendered in the Prometheus text format with
+    cumulative `_bucket` series and `_sum` and `_count`.
+    """
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _format_value(float(bound))
+                samples.append((f'{self.name}_bucket', self.labelnames + ('le',), key + (le,), cumulative))
+            samples.append((f'{self.name}_sum', self.labelnames, key, total))
+            samples.append((f'{self.name}_count', self.labelnames, key, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    Process-wide collection of metrics. Every worker process keeps its own values, so a scraper has to
+    collect all workers or the metrics have to be served from a single process.
+    """
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """
+        Returns all metrics in the Prometheus text exposition format 0.0.4.
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labelnames, key, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labelnames, key)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+stage_duration = registry.register(Histogram('quizly_stage_duration_seconds', 'Duration of the quiz pipeline stages.', ('stage', 'outcome')))
+request_duration = registry.register(Histogram('quizly_http_request_duration_seconds', 'Duration of the HTTP requests per endpoint.',
+                                               ('endpoint', 'method', 'status'), buckets=REQUEST_BUCKETS))
+bytes_total = registry.register(Counter('quizly_bytes_total', 'Bytes moved by the quiz pipeline.', ('direction',)))
+model_tokens_total = registry.register(Counter('quizly_model_tokens_total', 'Gemini tokens reported in the usage metadata.', ('kind',)))
+model_calls_total = registry.register(Counter('quizly_model_calls_total', 'Gemini calls that returned a response.'))
+
+
+class RequestTimings:
+    """
+    Collects the stage durations of one request for its `Server-Timing` header. Stages of pool threads
+    are added concurrently, so the durations are guarded by a lock.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._durations = {}
+
+    def add(self, name, seconds):
+        with self._lock:
+            total, count = self._durations.get(name, (0.0, 0))
+            self._durations[name] = (total + seconds, count + 1)
+
+    def durations(self):
+        """
+        Returns the summed seconds per stage.
+        """
+        with self._lock:
+            return {name: total for name, (total, count) in self._durations.items()}
+
+    def header(self, total_seconds=None):
+        """
+        Returns the `Server-Timing` header value in milliseconds. Repeated stages are summed and their
+        number is given as description.
+        """
+        with self._lock:
+            durations = list(self._durations.items())
+        entries = [f'{name};dur={total * 1000:.1f}' + (f';desc="{count}x"' if count > 1 else '') for name, (total, count) in durations]
+        if total_seconds is not None:
+            entries.append(f'total;dur={total_seconds * 1000:.1f}')
+        return ', '.join(entries)
+
+
+@contextmanager
+def collect_request_timings():
+    """
+    Collects the stages measured inside the block for one request and yields the `RequestTimings`.
+    """
+    timings = RequestTimings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+def record_stage(name, seconds, outcome='ok'):
+    """
+    Records a stage duration that was measured outside of `span`, like a yt-dlp postprocessor run.
+    """
+    stage_duration.observe(seconds, stage=name, outcome=outcome)
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+class OpenTelemetryTracer:
+    """
+    Tracer that forwards the pipeline stages as OpenTelemetry spans of the `quizly` tracer. Requires the
+    opentelemetry-api package and a configured tracer provider.
+    """
+    def __init__(self):
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            raise ImproperlyConfigured('The OpenTelemetry tracer requires the opentelemetry-api package.')
+        self.tracer = trace.get_tracer('quizly')
+
+    def span(self, name, attributes):
+        return self.tracer.start_as_current_span(f'quizly.{name}', attributes=attributes)
+
+
+@lru_cache(maxsize=None)
+def get_tracers():
+    """
+    Returns the tracers listed in `QUIZLY_TRACERS` as dotted paths. A tracer has a `span(name, attributes)`
+    method that returns a context manager wrapped around the stage.
+    """
+    return tuple(import_string(path)() for path in settings.QUIZLY_TRACERS)
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Measures the enclosed pipeline stage: the duration goes into the stage histogram and the `Server-Timing`
+    header of the current request, and the stage is passed on to the configured tracers.
+    """
+    with ExitStack() as stack:
+        for tracer in get_tracers():
+            stack.enter_context(tracer.span(name, attributes))
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            yield
+            outcome = 'ok'
+        finally:
+            record_stage(name, time.perf_counter() - started, outcome)
+
+
+def timed(name):
+    """
+    Decorator that wraps every call of a function or coroutine function in `span(name)`.
+    """
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def propagate_context(fn):
+    """
+    Wraps `fn` so it runs in a copy of the submitting context when it is called in a pool thread, which does
+    not inherit it. Model calls are then added to the tally of the current pipeline run and stages to the
+    timings of the current request.
+    """
+    context = contextvars.copy_context()
+
+    def wrapper(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+
+def count_bytes(direction, amount):
+    bytes_total.inc(amount, direction=direction)
+
+
+def count_model_usage(usage_metadata):
+    """
+    Adds a model response to the call and token counters.
+    """
+    model_calls_total.inc()
+    if usage_metadata is None:
+        return
+    model_tokens_total.inc(usage_metadata.prompt_token_count or 0, kind='prompt')
+    model_tokens_total.inc((usage_metadata.candidates_token_count or 0) + (usage_metadata.thoughts_token_count or 0), kind='output')
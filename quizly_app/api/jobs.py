@@ -0,0 +1,149 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from quizly_app.models import QuizJob
+from .quiz_logic import create_quiz_pipeline
+from .probe import summarize_video_info
+from .exceptions import JobQueueFullError
+from .workers import WORKER_ID, worker_registry
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_queued = 0
+_video_infos = {}
+
+
+def get_executor():
+    """
+    Returns the process-wide worker pool, creating it on first use and registering this process as worker.
+    Its size is bounded by `QUIZLY_JOB_WORKERS`.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            worker_registry.start()
+            _executor = ThreadPoolExecutor(max_workers=settings.QUIZLY_JOB_WORKERS, thread_name_prefix='quizly-job')
+        return _executor
+
+
+def enqueue_job(job_id):
+    """
+    Hands a persisted job over to the worker pool. Raises `JobQueueFullError` when the queue is full.
+    """
+    global _queued
+    with _executor_lock:
+        if _queued >= settings.QUIZLY_JOB_MAX_QUEUED:
+            raise JobQueueFullError('Too many quiz jobs are queued. Please try again later.')
+        _queued += 1
+    get_executor().submit(_run_queued_job, job_id)
+
+
+def _run_queued_job(job_id):
+    global _queued
+    with _executor_lock:
+        _queued -= 1
+    run_quiz_job(job_id)
+
+
+def submit_quiz_job(user, youtube_url, video_info=None, mode=None):
+    """
+    Persists a new job for the given user, URL and pipeline mode and schedules it in this process once the surrounding
+    transaction commits. This process is registered as worker first, so no other process takes the job over. The
+    metadata probe result is stored on the job and handed to the worker, so the video is not probed twice. If the queue filled up in the meantime, the job is marked as failed and `JobQueueFullError` is raised.
+    Returns the created QuizJob instance.
+    """
+    with _executor_lock:
+        if _queued >= settings.QUIZLY_JOB_MAX_QUEUED:
+            raise JobQueueFullError('Too many quiz jobs are queued. Please try again later.')
+    video_metadata = summarize_video_info(video_info) if video_info is not None else None
+    worker_registry.start()
+    job = QuizJob.objects.create(owner=user, video_url=youtube_url, video_metadata=video_metadata, mode=mode, worker=WORKER_ID)
+    if video_info is not None:
+        _video_infos[job.pk] = video_info
+
+    def enqueue():
+        try:
+            enqueue_job(job.pk)
+        except JobQueueFullError as e:
+            _video_infos.pop(job.pk, None)
+            update_job(job.pk, status=QuizJob.STATUS_FAILED, error=str(e), finished_at=timezone.now())
+            raise
+
+    transaction.on_commit(enqueue)
+    return job
+
+
+def update_job(job_id, **fields):
+    QuizJob.objects.filter(pk=job_id).update(updated_at=timezone.now(), **fields)
+
+
+def run_quiz_job(job_id):
+    """
+    Claims a pending job, runs the quiz pipeline for it and records every stage, the result or the error on the job.
+    Jobs that were already claimed by another worker are skipped.
+    """
+    close_old_connections()
+    video_info = _video_infos.pop(job_id, None)
+    try:
+        claimed = QuizJob.objects.filter(pk=job_id, status=QuizJob.STATUS_PENDING).update(
+            status=QuizJob.STATUS_RUNNING, worker=WORKER_ID, attempts=F('attempts') + 1,
+            started_at=timezone.now(), updated_at=timezone.now())
+        if not claimed:
+            return
+        job = QuizJob.objects.select_related('owner').get(pk=job_id)
+        try:
+            quiz = create_quiz_pipeline(job.owner, job.video_url, video_info=video_info, on_stage=lambda stage: update_job(job_id, stage=stage), mode=job.mode)
+        except Exception as e:
+            logger.exception('Quiz job %s failed', job_id)
+            update_job(job_id, status=QuizJob.STATUS_FAILED, error=str(e), finished_at=timezone.now())
+            return
+        update_job(job_id, status=QuizJob.STATUS_SUCCEEDED, stage=QuizJob.STAGE_DONE, quiz=quiz, error=None, finished_at=timezone.now())
+    finally:
+        close_old_connections()
+
+
+def resume_unfinished_jobs():
+    """
+    Takes over jobs of workers that are no longer live, see `WorkerRegistry`. Their running jobs and running jobs that
+    have not reported progress within `QUIZLY_JOB_STALE_AFTER` are reset to pending, jobs out of attempts are marked
+    as failed. Pending jobs without a live worker are then claimed for and queued in this process. Jobs of batches are
+    left to `resume_unfinished_batches`. Returns the number of re-queued jobs.
+    """
+    live_workers = worker_registry.live_worker_ids()
+    stale_before = timezone.now() - timedelta(seconds=settings.QUIZLY_JOB_STALE_AFTER)
+    running = QuizJob.objects.filter(status=QuizJob.STATUS_RUNNING).exclude(worker=WORKER_ID)
+    for job in running.only('id', 'worker', 'updated_at', 'attempts'):
+        if job.worker in live_workers and job.updated_at >= stale_before:
+            continue
+        if job.attempts >= settings.QUIZLY_JOB_MAX_ATTEMPTS:
+            QuizJob.objects.filter(pk=job.pk, status=QuizJob.STATUS_RUNNING).update(
+                status=QuizJob.STATUS_FAILED, error='Job was interrupted too often.', finished_at=timezone.now(), updated_at=timezone.now())
+        else:
+            QuizJob.objects.filter(pk=job.pk, status=QuizJob.STATUS_RUNNING).update(
+                status=QuizJob.STATUS_PENDING, stage=QuizJob.STAGE_QUEUED, worker=None, updated_at=timezone.now())
+    pending = QuizJob.objects.filter(status=QuizJob.STATUS_PENDING, batch__isnull=True).exclude(worker__in=live_workers)
+    resumed = 0
+    for job_id, worker in pending.order_by('created_at').values_list('pk', 'worker'):
+        if not QuizJob.objects.filter(pk=job_id, status=QuizJob.STATUS_PENDING, worker=worker).update(worker=WORKER_ID):
+            continue
+        try:
+            enqueue_job(job_id)
+        except JobQueueFullError:
+            update_job(job_id, worker=None)
+            break
+        resumed += 1
+    if resumed:
+        logger.info('Resumed %s unfinished quiz jobs', resumed)
+    return resumed
+
+
+worker_registry.add_reaper(resume_unfinished_jobs)
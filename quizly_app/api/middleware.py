@@ -0,0 +1,44 @@
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from .instrumentation import collect_request_timings, request_duration
+
+
+def endpoint_label(request):
+    """
+    Returns the URL pattern name of the request as metrics label, so the label set stays bounded.
+    """
+    match = getattr(request, 'resolver_match', None)
+    return (match.url_name or match.route) if match else 'unmatched'
+
+
+def finish_request(request, response, timings, started):
+    elapsed = time.perf_counter() - started
+    request_duration.observe(elapsed, endpoint=endpoint_label(request), method=request.method, status=response.status_code)
+    if settings.QUIZLY_SERVER_TIMING:
+        response['Server-Timing'] = timings.header(total_seconds=elapsed)
+    return response
+
+
+@sync_and_async_middleware
+def ServerTimingMiddleware(get_response):
+    """
+    Measures every request for the per-endpoint latency histogram and adds a `Server-Timing` header with the
+    pipeline stages the request went through. Streaming responses only carry the stages before the first byte.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            started = time.perf_counter()
+            with collect_request_timings() as timings:
+                response = await get_response(request)
+            return finish_request(request, response, timings, started)
+    else:
+        def middleware(request):
+            started = time.perf_counter()
+            with collect_request_timings() as timings:
+                response = get_response(request)
+            return finish_request(request, response, timings, started)
+    return middleware
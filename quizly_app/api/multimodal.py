@@ -0,0 +1,128 @@
+from django.conf import settings
+from google.genai import types
+
+from .gemini import get_client
+from .generation import parse_model_json
+from .scheduler import model_scheduler
+from .instrumentation import timed
+from .transcription import (
+    upload_audio, aupload_audio, delete_uploaded_file, adelete_uploaded_file, estimate_audio_tokens,
+)
+
+# Gemini counts about 100 tokens per second of video at low media resolution, including the audio track
+VIDEO_TOKENS_PER_SECOND = 100
+
+
+def build_multimodal_prompt(question_count, include_transcript):
+    """
+    Returns the prompt that asks Gemini for a quiz about the attached audio or video, optionally together with
+    the German transcript of the speech.
+    """
+    transcript_field = "\n      'transcript': '...',"
+    return f"""
+    Erstelle ein Multiple-Choice-Quiz mit {question_count} Fragen basierend auf dem Inhalt des angehängten Videos bzw. der Audiodatei.
+    {'Gib außerdem im Feld transcript eine vollständige deutsche Transkription des Gesprochenen zurück.' if include_transcript else ''}
+    Das Format muss STRICT JSON sein:
+    {{{transcript_field if include_transcript else ''}
+      'title': '...',
+      'description': '...',
+      'questions': [
+        {{
+          'question_title': '...',
+          'question_options': ['A','B','C','D'],
+          'answer': 'A'
+        }}
+      ]
+    }}
+    """
+
+
+def multimodal_config():
+    return {'response_mime_type': 'application/json', 'media_resolution': types.MediaResolution.MEDIA_RESOLUTION_LOW}
+
+
+def estimate_video_tokens(video_summary, include_transcript):
+    """
+    Estimates the tokens of a multimodal call on a YouTube video from its duration. A returned transcript
+    adds roughly 4 output tokens per second of speech.
+    """
+    duration = (video_summary or {}).get('duration') or 0
+    return int(duration * (VIDEO_TOKENS_PER_SECOND + (4 if include_transcript else 0))) + settings.QUIZLY_GEMINI_OUTPUT_TOKEN_ESTIMATE
+
+
+def split_transcript_field(quiz_json):
+    """
+    Removes the transcript from a multimodal answer and returns (quiz_json, transcript or None).
+    """
+    transcript = quiz_json.pop('transcript', None)
+    if not isinstance(transcript, str) or not transcript.strip():
+        transcript = None
+    return quiz_json, transcript
+
+
+def youtube_part(youtube_url):
+    return types.Part.from_uri(file_uri=youtube_url, mime_type='video/*')
+
+
+@timed('generate')
+def generate_quiz_from_youtube_url(youtube_url, video_summary, question_count=None):
+    """
+    Lets Gemini watch the YouTube video itself and returns (quiz_json, transcript) from a single call.
+    Nothing is downloaded on this host.
+    """
+    question_count = question_count or settings.QUIZLY_QUESTION_COUNT
+    include_transcript = settings.QUIZLY_MULTIMODAL_RETURN_TRANSCRIPT
+    contents = [youtube_part(youtube_url), build_multimodal_prompt(question_count, include_transcript)]
+    response = model_scheduler.call(lambda: get_client().models.generate_content(model=settings.QUIZLY_GEMINI_MODEL, contents=contents, config=multimodal_config()),
+                                    tokens=estimate_video_tokens(video_summary, include_transcript))
+    return split_transcript_field(parse_model_json(response.text))
+
+
+@timed('generate')
+async def agenerate_quiz_from_youtube_url(youtube_url, video_summary, question_count=None):
+    """
+    Asynchronous variant of `generate_quiz_from_youtube_url`.
+    """
+    question_count = question_count or settings.QUIZLY_QUESTION_COUNT
+    include_transcript = settings.QUIZLY_MULTIMODAL_RETURN_TRANSCRIPT
+    contents = [youtube_part(youtube_url), build_multimodal_prompt(question_count, include_transcript)]
+    response = await model_scheduler.acall(lambda: get_client().aio.models.generate_content(model=settings.QUIZLY_GEMINI_MODEL, contents=contents, config=multimodal_config()),
+                                           tokens=estimate_video_tokens(video_summary, include_transcript))
+    return split_transcript_field(parse_model_json(response.text))
+
+
+@timed('generate')
+def generate_quiz_from_audio(file_path, question_count=None):
+    """
+    Uploads a downloaded audio file and returns (quiz_json, transcript) from a single call instead of
+    a transcription call followed by a generation call.
+    """
+    question_count = question_count or settings.QUIZLY_QUESTION_COUNT
+    include_transcript = settings.QUIZLY_MULTIMODAL_RETURN_TRANSCRIPT
+    client = get_client()
+    uploaded = upload_audio(client, file_path)
+    try:
+        contents = [uploaded, build_multimodal_prompt(question_count, include_transcript)]
+        response = model_scheduler.call(lambda: client.models.generate_content(model=settings.QUIZLY_GEMINI_MODEL, contents=contents, config=multimodal_config()),
+                                        tokens=estimate_audio_tokens(file_path))
+    finally:
+        delete_uploaded_file(client, uploaded)
+    return split_transcript_field(parse_model_json(response.text))
+
+
+@timed('generate')
+async def agenerate_quiz_from_audio(file_path, question_count=None):
+    """
+    Asynchronous variant of `generate_quiz_from_audio`.
+    """
+    question_count = question_count or settings.QUIZLY_QUESTION_COUNT
+    include_transcript = settings.QUIZLY_MULTIMODAL_RETURN_TRANSCRIPT
+    client = get_client()
+    uploaded = await aupload_audio(client, file_path)
+    try:
+        contents = [uploaded, build_multimodal_prompt(question_count, include_transcript)]
+        response = await model_scheduler.acall(lambda: client.aio.models.generate_content(model=settings.QUIZLY_GEMINI_MODEL, contents=contents, config=multimodal_config()),
+                                               tokens=estimate_audio_tokens(file_path))
+    finally:
+        await adelete_uploaded_file(client, uploaded)
+    return split_transcript_field(parse_model_json(response.text))
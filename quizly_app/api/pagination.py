@@ -0,0 +1,60 @@
+from django.conf import settings
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class QuizCursorPagination(CursorPagination):
+    """
+    Cursor pagination for the quiz list, newest quizzes first. Every page is a range scan on the
+    (owner, created_at) index, so its cost does not grow with the number of quizzes.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = settings.QUIZLY_QUIZ_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.QUIZLY_QUIZ_MAX_PAGE_SIZE
+
+
+class QuizSearchPagination(BasePagination):
+    """
+    Page number pagination for ranked search results. One row more than the page size is fetched to know whether
+    a next page exists, so no matches are counted.
+    """
+    page_size = settings.QUIZLY_QUIZ_PAGE_SIZE
+    page_query_param = 'page'
+    page_size_query_param = 'page_size'
+    max_page_size = settings.QUIZLY_QUIZ_MAX_PAGE_SIZE
+
+    def _positive_int(self, request, name, default, maximum=None):
+        try:
+            value = int(request.query_params[name])
+        except (KeyError, ValueError):
+            return default
+        if value < 1:
+            return default
+        return min(value, maximum) if maximum else value
+
+    def paginate_search(self, request, search):
+        """
+        Calls `search(offset, limit)` for the requested page and returns the results of that page.
+        """
+        self.request = request
+        self.page = self._positive_int(request, self.page_query_param, 1)
+        size = self._positive_int(request, self.page_size_query_param, self.page_size, self.max_page_size)
+        results = search((self.page - 1) * size, size + 1)
+        self.has_next = len(results) > size
+        return results[:size]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.page_query_param, self.page + 1)
+
+    def get_previous_link(self):
+        if self.page == 1:
+            return None
+        url = self.request.build_absolute_uri()
+        return remove_query_param(url, self.page_query_param) if self.page == 2 else replace_query_param(url, self.page_query_param, self.page - 1)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'previous': self.get_previous_link(), 'results': data})
@@ -1,3 +1,6 @@
+import hmac
+
+from django.conf import settings
 from rest_framework import permissions
 
 
@@ -6,4 +9,16 @@ class IsOwnerAndAuthenticated(permissions.BasePermission):
     Custom permission to only allow owners of an object to edit the Quiz.
     """
     def has_object_permission(self, request, view, obj):
-        return request.user and request.user.is_authenticated and obj.owner == request.user
\ No newline at end of file
+        return request.user and request.user.is_authenticated and obj.owner_id == request.user.id
+
+
+class HasMetricsToken(permissions.BasePermission):
+    """
+    Allows scrapers that send `Authorization: Bearer <QUIZLY_METRICS_TOKEN>`. Without a configured token only
+    admin users can read the metrics.
+    """
+    def has_permission(self, request, view):
+        token = settings.QUIZLY_METRICS_TOKEN
+        if not token:
+            return bool(request.user and request.user.is_staff)
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
\ No newline at end of file
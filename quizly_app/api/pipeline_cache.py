@@ -0,0 +1,66 @@
+import threading
+
+from cachetools import TTLCache
+from django.conf import settings
+
+
+class PipelineCache:
+    """
+    In-process cache for pipeline results keyed by canonical YouTube video id. Transcripts and generated quiz JSON
+    are kept in separate TTL caches, so a quiz can be regenerated from a cached transcript after the quiz entry
+    expired. Each cache evicts the least recently used entry once it holds `max_entries` items.
+    """
+    KINDS = ('transcript', 'quiz')
+
+    def __init__(self, max_entries, ttl):
+        self._lock = threading.Lock()
+        self._caches = {kind: TTLCache(maxsize=max_entries, ttl=ttl) for kind in self.KINDS}
+        self._hits = dict.fromkeys(self.KINDS, 0)
+        self._misses = dict.fromkeys(self.KINDS, 0)
+
+    def get(self, kind, video_id):
+        """
+        Returns the cached value of the given kind for a video id or None and counts the hit or miss.
+        """
+        if not video_id:
+            return None
+        with self._lock:
+            value = self._caches[kind].get(video_id)
+            if value is None:
+                self._misses[kind] += 1
+            else:
+                self._hits[kind] += 1
+            return value
+
+    def set(self, kind, video_id, value):
+        """
+        Stores a value of the given kind for a video id. Values without a video id are not cached.
+        """
+        if not video_id or value is None:
+            return
+        with self._lock:
+            self._caches[kind][video_id] = value
+
+    def delete(self, video_id):
+        """
+        Removes all cached values of a video id.
+        """
+        with self._lock:
+            for cache in self._caches.values():
+                cache.pop(video_id, None)
+
+    def clear(self):
+        with self._lock:
+            for cache in self._caches.values():
+                cache.clear()
+
+    def stats(self):
+        """
+        Returns hit and miss counters and the current size of every cache.
+        """
+        with self._lock:
+            return {kind: {'hits': self._hits[kind], 'misses': self._misses[kind], 'size': len(self._caches[kind]),
+                           'max_size': self._caches[kind].maxsize, 'ttl': self._caches[kind].ttl} for kind in self.KINDS}
+
+
+pipeline_cache = PipelineCache(max_entries=settings.QUIZLY_PIPELINE_CACHE_MAX_ENTRIES, ttl=settings.QUIZLY_PIPELINE_CACHE_TTL)
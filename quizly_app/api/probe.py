@@ -0,0 +1,102 @@
+import yt_dlp
+from django.conf import settings
+
+from .exceptions import VideoRejectedError
+from .instrumentation import timed
+
+METADATA_YDL_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'skip_download': True,
+    'noplaylist': True,
+}
+PLAYLIST_YDL_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'skip_download': True,
+    'extract_flat': 'in_playlist',
+}
+UNAVAILABLE_STATES = ('private', 'premium_only', 'subscriber_only', 'needs_auth')
+LIVE_STATES = ('is_live', 'is_upcoming', 'post_live')
+
+
+def extract_video_info(youtube_url):
+    """
+    Fetches the metadata of a YouTube video without downloading it and returns the yt-dlp info dict.
+    Videos that cannot be accessed at all, for example geo-blocked or removed ones, are rejected.
+    """
+    try:
+        with yt_dlp.YoutubeDL(METADATA_YDL_OPTS) as ydl:
+            return ydl.sanitize_info(ydl.extract_info(youtube_url, download=False))
+    except yt_dlp.utils.DownloadError as e:
+        raise VideoRejectedError(f"Video is not available: {e}")
+    except Exception as e:
+        raise RuntimeError(f"YouTube metadata lookup failed: {e}")
+
+
+def check_video_limits(video_info):
+    """
+    Raises `VideoRejectedError` if a video is not public, is a live stream or exceeds `QUIZLY_MAX_VIDEO_DURATION`.
+    """
+    if video_info.get('_type', 'video') != 'video':
+        raise VideoRejectedError('URL does not point to a single video.')
+    if video_info.get('availability') in UNAVAILABLE_STATES:
+        raise VideoRejectedError(f"Video is not publicly available ({video_info['availability']}).")
+    if not settings.QUIZLY_ALLOW_LIVE_VIDEOS and (video_info.get('is_live') or video_info.get('live_status') in LIVE_STATES):
+        raise VideoRejectedError('Live streams are not supported.')
+    duration = video_info.get('duration')
+    if duration and duration > settings.QUIZLY_MAX_VIDEO_DURATION:
+        raise VideoRejectedError(f'Video is too long ({int(duration)} s, maximum {settings.QUIZLY_MAX_VIDEO_DURATION} s).')
+
+
+def summarize_video_info(video_info):
+    """
+    Returns the part of the yt-dlp info dict that is stored on quizzes and jobs for later stages.
+    """
+    audio_sizes = [f.get('filesize') or f.get('filesize_approx') for f in video_info.get('formats') or []
+                   if f.get('vcodec') == 'none' and (f.get('filesize') or f.get('filesize_approx'))]
+    return {
+        'id': video_info.get('id'),
+        'title': video_info.get('title'),
+        'channel': video_info.get('channel') or video_info.get('uploader'),
+        'duration': video_info.get('duration'),
+        'live_status': video_info.get('live_status'),
+        'availability': video_info.get('availability'),
+        'language': video_info.get('language'),
+        'upload_date': video_info.get('upload_date'),
+        'subtitle_languages': sorted(video_info.get('subtitles') or {}),
+        'has_automatic_captions': bool(video_info.get('automatic_captions')),
+        'audio_filesize': max(audio_sizes) if audio_sizes else None,
+    }
+
+
+@timed('probe')
+def probe_video(youtube_url):
+    """
+    Pre-flight metadata probe that runs before anything is downloaded. Returns the yt-dlp info dict of an
+    accepted video and raises `VideoRejectedError` for videos the pipeline would fail on.
+    """
+    video_info = extract_video_info(youtube_url)
+    check_video_limits(video_info)
+    return video_info
+
+
+def expand_playlist(playlist_url, max_entries):
+    """
+    Lists the videos of a YouTube playlist from its flat metadata, without probing every video. Returns the playlist
+    title and the watch URLs of at most `max_entries` videos. Raises `VideoRejectedError` for URLs that are no playlist
+    or for empty playlists.
+    """
+    try:
+        with yt_dlp.YoutubeDL({**PLAYLIST_YDL_OPTS, 'playlistend': max_entries}) as ydl:
+            info = ydl.extract_info(playlist_url, download=False)
+    except yt_dlp.utils.DownloadError as e:
+        raise VideoRejectedError(f"Playlist is not available: {e}")
+    except Exception as e:
+        raise RuntimeError(f"YouTube playlist lookup failed: {e}")
+    if info.get('_type') != 'playlist':
+        raise VideoRejectedError('URL does not point to a playlist.')
+    urls = [f"https://www.youtube.com/watch?v={entry['id']}" for entry in info.get('entries') or [] if entry and entry.get('id')]
+    if not urls:
+        raise VideoRejectedError('Playlist contains no videos.')
+    return info.get('title'), urls[:max_entries]
@@ -1,101 +1,592 @@
-import tempfile
-import json
+import re
+import time
 import yt_dlp
 import os
-from google import genai
-from google.genai import types
+from urllib.parse import urlparse, parse_qs
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from rest_framework import status
-from rest_framework.response import Response
+from django.db import transaction
 
-from quizly_app.models import Quiz, Question
+from quizly_app.models import Quiz, Question, PipelineRun, Transcript
+from quizly_app.signals import notify_quiz_changed
+from .pipeline_cache import pipeline_cache
+from .captions import fetch_caption_text
+from .probe import METADATA_YDL_OPTS, probe_video, summarize_video_info
+from .generation import build_quiz_prompt, generate_json, agenerate_json, generate_quiz_map_reduce, agenerate_quiz_map_reduce
+from .transcription import get_transcription_backend
+from .chunking import get_audio_duration, transcribe_in_chunks, atranscribe_in_chunks
+from .scratch import scratch_space, estimate_scratch_bytes
+from .singleflight import single_flight
+from .streaming import stream_quiz_from_text
+from .multimodal import generate_quiz_from_youtube_url, agenerate_quiz_from_youtube_url, generate_quiz_from_audio, agenerate_quiz_from_audio
+from .usage import record_pipeline_run, arecord_pipeline_run
+from .instrumentation import timed, record_stage, count_bytes
+from .serializers import QuizDataSerializer, QuizDataQuestionSerializer
+from .exceptions import InvalidQuizDataError, TranscriptUnavailableError
 
+VIDEO_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{11}$')
+YOUTUBE_HOSTS = ('youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com', 'youtube-nocookie.com', 'www.youtube-nocookie.com')
+YOUTUBE_PATH_PREFIXES = ('shorts', 'embed', 'live', 'v', 'e')
 
-def download_audio_from_youtube(youtube_url):
+
+def extract_video_id(youtube_url):
+    """
+    Returns the canonical 11 character video id of a YouTube URL or None if the URL does not point to a video.
+    Handles `youtu.be/<id>`, `watch?v=<id>` with any extra parameters, shorts, embed and live URLs.
+    """
+    parsed = urlparse(youtube_url.strip())
+    host = (parsed.hostname or '').lower()
+    segments = [segment for segment in parsed.path.split('/') if segment]
+    candidate = None
+    if host == 'youtu.be' and segments:
+        candidate = segments[0]
+    elif host in YOUTUBE_HOSTS:
+        if segments[:1] == ['watch']:
+            candidate = parse_qs(parsed.query).get('v', [None])[0]
+        elif len(segments) >= 2 and segments[0] in YOUTUBE_PATH_PREFIXES:
+            candidate = segments[1]
+    if candidate and VIDEO_ID_PATTERN.match(candidate):
+        return candidate
+    return None
+
+
+@timed('captions')
+def fetch_captions(video_info):
+    """
+    Returns the text of the best caption track of a video or None if it has no usable captions.
+    """
+    with yt_dlp.YoutubeDL(METADATA_YDL_OPTS) as ydl:
+        return fetch_caption_text(ydl, video_info)
+
+
+def build_audio_postprocessor_args():
+    """
+    Returns the FFmpeg arguments of the speech audio profile: mono, `QUIZLY_AUDIO_SAMPLE_RATE` and optionally
+    with long silences removed.
+    """
+    args = ['-ac', '1', '-ar', str(settings.QUIZLY_AUDIO_SAMPLE_RATE)]
+    if settings.QUIZLY_AUDIO_TRIM_SILENCE:
+        args += ['-af', 'silenceremove=start_periods=1:stop_periods=-1:stop_duration=1:stop_threshold=-40dB']
+    return args
+
+
+def build_download_hooks():
+    """
+    Returns yt-dlp hooks that count the downloaded bytes and record the FFmpeg audio extraction as the
+    `transcode` stage, which runs inside the `download` stage.
     """
-    Downloads audio from YouTube and returns the path to the temp file.
+    started = {}
+
+    def progress_hook(progress):
+        if progress['status'] == 'finished':
+            count_bytes('download', progress.get('downloaded_bytes') or progress.get('total_bytes') or 0)
+
+    def postprocessor_hook(progress):
+        if progress.get('postprocessor') != 'ExtractAudio':
+            return
+        if progress['status'] == 'started':
+            started['transcode'] = time.perf_counter()
+        elif progress['status'] == 'finished' and 'transcode' in started:
+            record_stage('transcode', time.perf_counter() - started.pop('transcode'))
+    return {'progress_hooks': [progress_hook], 'postprocessor_hooks': [postprocessor_hook]}
+
+
+@timed('download')
+def download_audio_from_youtube(youtube_url, target_dir):
+    """
+    Downloads audio from YouTube in a speech-optimized profile into `target_dir` and returns the path to the file.
+    The smallest suitable audio stream is downloaded and re-encoded to `QUIZLY_AUDIO_CODEC` at `QUIZLY_AUDIO_BITRATE` kbps.
     """
-    temp_dir = tempfile.mkdtemp()
     ydl_opts = {
-        'format': 'bestaudio/best',
-        'outtmpl': os.path.join(temp_dir, 'audio.%(ext)s'),
+        'format': settings.QUIZLY_AUDIO_DOWNLOAD_FORMAT,
+        'outtmpl': os.path.join(target_dir, 'audio.%(ext)s'),
         'postprocessors': [{
             'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',
+            'preferredcodec': settings.QUIZLY_AUDIO_CODEC,
+            'preferredquality': settings.QUIZLY_AUDIO_BITRATE,
         }],
+        'postprocessor_args': {'extractaudio': build_audio_postprocessor_args()},
         'quiet': False,
         'no_warnings': False,
+        **build_download_hooks(),
     }
     try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([youtube_url])
+            info = ydl.extract_info(youtube_url, download=True)
     except Exception as e:
         raise RuntimeError(f"YouTube download failed: {e}")
-    return os.path.join(temp_dir, 'audio.mp3')
+    return info['requested_downloads'][0]['filepath']
 
 
+@timed('transcribe')
 def transcribe_audio(file_path):
     """
-    Transcribes an audio file using Gemini and returns the transcription text.
+    Transcribes an audio file with the configured transcription backend and returns the transcription text.
+    Audio longer than `QUIZLY_CHUNK_THRESHOLD` seconds is transcribed in parallel segments.
     """
     if not os.path.exists(file_path):
-        raise FileNotFoundError(f'Audio file not found: {file_path}', status=status.HTTP_400_BAD_REQUEST)
-    client = genai.Client(api_key=settings.GEMINI_API_KEY)
-    with open(file_path, 'rb') as audio_file:
-        audio_data = audio_file.read()
-    response = client.models.generate_content(model='gemini-2.5-flash', contents= ['Transkribiere die folgende Audiodatei ins Deutsche: ', types.Part.from_bytes(data=audio_data, mime_type='audio/mp3')])
-    text = response.text
+        raise FileNotFoundError(f'Audio file not found: {file_path}')
+    backend = get_transcription_backend()
+    duration = get_audio_duration(file_path) if backend.parallel_chunks else None
+    if duration and duration > settings.QUIZLY_CHUNK_THRESHOLD:
+        text = transcribe_in_chunks(file_path, backend.transcribe, duration)
+    else:
+        text = backend.transcribe(file_path)
     if not text:
         raise ValueError('Transcription failed or returned empty text.')
     return text
 
 
-def generate_quiz_from_text(text):
+@timed('transcribe')
+async def atranscribe_audio(file_path):
+    """
+    Asynchronous variant of `transcribe_audio`.
     """
-    Sends transcription text to Gemini and returns a quiz JSON structure.
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f'Audio file not found: {file_path}')
+    backend = get_transcription_backend()
+    duration = await sync_to_async(get_audio_duration, thread_sensitive=False)(file_path) if backend.parallel_chunks else None
+    if duration and duration > settings.QUIZLY_CHUNK_THRESHOLD:
+        text = await atranscribe_in_chunks(file_path, backend.atranscribe, duration)
+    else:
+        text = await backend.atranscribe(file_path)
+    if not text:
+        raise ValueError('Transcription failed or returned empty text.')
+    return text
+
+
+@timed('generate')
+def generate_quiz_from_text(text, question_count=None, difficulty=None):
     """
-    client = genai.Client(api_key=settings.GEMINI_API_KEY)
-    prompt = f"""
-    Erstelle ein Multiple-Choice-Quiz mit 10 Fragen basierend auf folgendem Video-Transkript:
-    Das Format muss STRICT JSON sein:
-    {{
-      'title': '...',
-      'description': '...',
-      'questions': [
-        {{
-          'question_title': '...',
-          'question_options': ['A','B','C','D'],
-          'answer': 'A'
-        }}
-      ]
-    }}
-    Transkript: 
-    {text}
+    Sends transcription text to Gemini and returns a quiz JSON structure with `question_count` questions of the
+    optional `difficulty`. Transcripts longer than `QUIZLY_LONG_TRANSCRIPT_THRESHOLD` characters are handled section by section.
     """
-    response = client.models.generate_content(model='gemini-2.5-flash', contents=prompt, config={'response_mime_type': 'application/json'})
-    return json.loads(response.text)
+    question_count = question_count or settings.QUIZLY_QUESTION_COUNT
+    if len(text) > settings.QUIZLY_LONG_TRANSCRIPT_THRESHOLD:
+        return generate_quiz_map_reduce(text, question_count, difficulty)
+    return generate_json(build_quiz_prompt(text, question_count, difficulty))
 
 
-def save_quiz_to_db(user, youtube_url, quiz_data):
+@timed('generate')
+async def agenerate_quiz_from_text(text, question_count=None, difficulty=None):
     """
-    Saves quiz and questions into database.
-    Returns the created Quiz instance.
+    Asynchronous variant of `generate_quiz_from_text` using the async interface of the shared Gemini client.
     """
-    quiz = Quiz.objects.create(owner=user, title=quiz_data.get('title'), description=quiz_data.get('description'), video_url=youtube_url)
-    for q in quiz_data.get('questions', []):
-        Question.objects.create(quiz=quiz, question_title=q['question_title'], question_options=q['question_options'], answer=q['answer'])
-    return quiz
+    question_count = question_count or settings.QUIZLY_QUESTION_COUNT
+    if len(text) > settings.QUIZLY_LONG_TRANSCRIPT_THRESHOLD:
+        return await agenerate_quiz_map_reduce(text, question_count, difficulty)
+    return await agenerate_json(build_quiz_prompt(text, question_count, difficulty))
+
+
+def validate_quiz_data(quiz_data, serializer_class=QuizDataSerializer):
+    """
+    Validates generated quiz JSON against the quiz schema and returns the validated data.
+    Raises `InvalidQuizDataError` with the schema errors if it does not match.
+    """
+    serializer = serializer_class(data=quiz_data)
+    if not serializer.is_valid():
+        raise InvalidQuizDataError(f'Gemini returned an invalid quiz: {serializer.errors}')
+    return serializer.validated_data
+
+
+def stored_transcript_id(youtube_url):
+    """
+    Returns the id of the stored transcript of a video or None.
+    """
+    video_id = extract_video_id(youtube_url)
+    if not video_id:
+        return None
+    return Transcript.objects.filter(video_id=video_id).values_list('id', flat=True).first()
+
+
+@timed('save')
+def save_quizzes_bulk(user, quizzes):
+    """
+    Saves many validated quizzes in one transaction with one bulk insert for the quizzes and one for all their
+    questions. Every item holds `video_url`, `title`, `description`, `questions` and optionally `video_metadata` and `transcript_id`.
+    Bulk inserts skip the model signals, so `quiz_changed` is sent explicitly. Returns the created Quiz instances in the order of `quizzes`.
+    """
+    with transaction.atomic():
+        created = Quiz.objects.bulk_create([
+            Quiz(owner=user, title=item['title'], description=item.get('description'), video_url=item['video_url'], video_metadata=item.get('video_metadata'),
+                 transcript_id=item.get('transcript_id'))
+            for item in quizzes
+        ])
+        Question.objects.bulk_create([
+            Question(quiz=quiz, question_title=q['question_title'], question_options=q['question_options'], answer=q['answer'])
+            for quiz, item in zip(created, quizzes) for q in item['questions']
+        ])
+        notify_quiz_changed(user.pk if user else None, [quiz.pk for quiz in created])
+    return created
+
+
+def save_quiz_to_db(user, youtube_url, quiz_data, video_metadata=None):
+    """
+    Validates the quiz JSON and saves quiz and questions into database in one transaction, the questions
+    with a single bulk insert. The quiz is linked to the stored transcript of the video. Returns the created Quiz instance.
+    """
+    validated = validate_quiz_data(quiz_data)
+    item = {**validated, 'video_url': youtube_url, 'video_metadata': video_metadata, 'transcript_id': stored_transcript_id(youtube_url)}
+    return save_quizzes_bulk(user, [item])[0]
+
+
+def load_transcript(video_id):
+    """
+    Returns the transcript of a video from the pipeline cache or, after a cache miss, from the stored transcripts.
+    Returns None if the video was never transcribed.
+    """
+    transcript = pipeline_cache.get('transcript', video_id)
+    if transcript is None and video_id:
+        stored = Transcript.objects.filter(video_id=video_id).first()
+        if stored is not None:
+            transcript = stored.text
+            pipeline_cache.set('transcript', video_id, transcript)
+    return transcript
+
+
+def remember_transcript(video_id, youtube_url, transcript):
+    """
+    Puts a new transcript into the pipeline cache and stores it compressed under the video id.
+    """
+    pipeline_cache.set('transcript', video_id, transcript)
+    if not video_id or not transcript:
+        return
+    stored = Transcript(video_id=video_id, video_url=youtube_url)
+    stored.text = transcript
+    Transcript.objects.update_or_create(video_id=video_id, defaults={'video_url': youtube_url, 'compressed_text': stored.compressed_text, 'char_count': stored.char_count})
+
+
+async def aload_transcript(video_id):
+    return await sync_to_async(load_transcript)(video_id)
+
+
+async def aremember_transcript(video_id, youtube_url, transcript):
+    await sync_to_async(remember_transcript)(video_id, youtube_url, transcript)
+
 
+def report_stage(on_stage, stage):
+    """
+    Notifies the optional `on_stage` callback that the pipeline entered the given stage.
+    """
+    if on_stage is not None:
+        on_stage(stage)
+
+
+def obtain_transcript(youtube_url, video_info=None, on_stage=None):
+    """
+    Returns the transcript of a video, taken from the pipeline cache or the stored transcripts when possible.
+    Otherwise the caption track of the video is used and only videos without usable captions are
+    downloaded and transcribed in a scratch directory that is removed afterwards. The transcript is cached and stored under the video id.
+    `video_info` is the result of the metadata probe, the video is probed here if it is missing.
+    """
+    video_id = extract_video_id(youtube_url)
+    transcript = load_transcript(video_id)
+    if transcript is not None:
+        return transcript
+    if video_info is None:
+        report_stage(on_stage, 'probe')
+        video_info = probe_video(youtube_url)
+    report_stage(on_stage, 'transcribe')
+    transcript = fetch_captions(video_info)
+    if transcript is not None:
+        remember_transcript(video_id, youtube_url, transcript)
+        return transcript
+    reserved_bytes = estimate_scratch_bytes(summarize_video_info(video_info))
+    with scratch_space.job_dir(reserved_bytes, label=video_id or youtube_url) as scratch_dir:
+        report_stage(on_stage, 'download')
+        audio_path = download_audio_from_youtube(youtube_url, scratch_dir.path)
+        scratch_dir.measure()
+        report_stage(on_stage, 'transcribe')
+        transcript = transcribe_audio(audio_path)
+    remember_transcript(video_id, youtube_url, transcript)
+    return transcript
+
+
+def generate_quiz_multimodal(youtube_url, video_info=None, on_stage=None):
+    """
+    Single-call mode: Gemini gets the YouTube URL (`QUIZLY_MULTIMODAL_SOURCE = 'url'`) or the downloaded audio
+    together with the quiz schema and answers with the quiz and, with `QUIZLY_MULTIMODAL_RETURN_TRANSCRIPT`, the
+    transcript for the cache. Cached transcripts and captions need no transcription call and use the text prompt.
+    """
+    video_id = extract_video_id(youtube_url)
+    if video_info is None:
+        report_stage(on_stage, 'probe')
+        video_info = probe_video(youtube_url)
+    transcript = load_transcript(video_id)
+    if transcript is None:
+        report_stage(on_stage, 'transcribe')
+        transcript = fetch_captions(video_info)
+        if transcript is not None:
+            remember_transcript(video_id, youtube_url, transcript)
+    if transcript is not None:
+        report_stage(on_stage, 'generate')
+        return generate_quiz_from_text(transcript)
+    video_summary = summarize_video_info(video_info)
+    if settings.QUIZLY_MULTIMODAL_SOURCE == 'url':
+        report_stage(on_stage, 'generate')
+        quiz_json, transcript = generate_quiz_from_youtube_url(youtube_url, video_summary)
+    else:
+        with scratch_space.job_dir(estimate_scratch_bytes(video_summary), label=video_id or youtube_url) as scratch_dir:
+            report_stage(on_stage, 'download')
+            audio_path = download_audio_from_youtube(youtube_url, scratch_dir.path)
+            scratch_dir.measure()
+            report_stage(on_stage, 'generate')
+            quiz_json, transcript = generate_quiz_from_audio(audio_path)
+    if transcript is not None:
+        remember_transcript(video_id, youtube_url, transcript)
+    return quiz_json
+
+
+def build_quiz_data(youtube_url, video_info=None, on_stage=None, mode=None):
+    """
+    Returns the quiz JSON for a video. Cached quizzes skip the download and both Gemini calls,
+    cached transcripts skip the download and the transcription. Concurrent requests for the same video
+    are coalesced, only the first one runs the pipeline and the others wait for its result.
+    `mode` selects the two-step pipeline (transcribe, then generate) or the single multimodal call.
+    """
+    video_id = extract_video_id(youtube_url)
+    quiz_json = pipeline_cache.get('quiz', video_id)
+    if quiz_json is not None:
+        return quiz_json
 
-def create_quiz_pipeline(user, youtube_url):
+    def generate():
+        if mode == PipelineRun.MODE_MULTIMODAL:
+            return validate_quiz_data(generate_quiz_multimodal(youtube_url, video_info=video_info, on_stage=on_stage))
+        transcript = obtain_transcript(youtube_url, video_info=video_info, on_stage=on_stage)
+        report_stage(on_stage, 'generate')
+        return validate_quiz_data(generate_quiz_from_text(transcript))
+
+    quiz_json = single_flight.do(video_id, generate)
+    pipeline_cache.set('quiz', video_id, quiz_json)
+    return quiz_json
+
+
+def build_quiz_item(youtube_url, video_info=None, on_stage=None, mode=None):
+    """
+    Runs the pipeline up to the save: probe → download → transcribe → Gemini. Returns the validated quiz
+    as an item for `save_quizzes_bulk`, so callers can save many quizzes at once.
+    `video_info` is the result of an earlier metadata probe, the video is probed here if it is missing.
+    `mode` defaults to `QUIZLY_PIPELINE_MODE`, latency and token usage of the run are recorded per mode.
+    """
+    mode = mode or settings.QUIZLY_PIPELINE_MODE
+    if video_info is None:
+        report_stage(on_stage, 'probe')
+        video_info = probe_video(youtube_url)
+    with record_pipeline_run(mode, extract_video_id(youtube_url)):
+        quiz_json = build_quiz_data(youtube_url, video_info=video_info, on_stage=on_stage, mode=mode)
+    return {**validate_quiz_data(quiz_json), 'video_url': youtube_url, 'video_metadata': summarize_video_info(video_info),
+            'transcript_id': stored_transcript_id(youtube_url)}
+
+
+def create_quiz_pipeline(user, youtube_url, video_info=None, on_stage=None, mode=None):
     """
-    Full pipeline: download → transcribe → Gemini → save.
+    Full pipeline: probe → download → transcribe → Gemini → save.
     Raises exceptions normally so View can catch them.
+    `on_stage` is called with the name of every stage the pipeline enters.
+    """
+    item = build_quiz_item(youtube_url, video_info=video_info, on_stage=on_stage, mode=mode)
+    report_stage(on_stage, 'save')
+    return save_quizzes_bulk(user, [item])[0]
+
+
+def regenerate_quiz(quiz, question_count=None, difficulty=None):
+    """
+    Rebuilds title, description and questions of a quiz from the stored transcript of its video with a single
+    Gemini call (one per section for long transcripts), without downloading or transcribing the video again.
+    Raises `TranscriptUnavailableError` if no transcript was stored for the video.
+    """
+    transcript = quiz.transcript or Transcript.objects.filter(video_id=extract_video_id(quiz.video_url)).first()
+    if transcript is None:
+        raise TranscriptUnavailableError('No transcript is stored for this video. Please create the quiz again.')
+    quiz_data = validate_quiz_data(generate_quiz_from_text(transcript.text, question_count, difficulty))
+    with transaction.atomic():
+        quiz.questions.all().delete()
+        Question.objects.bulk_create([
+            Question(quiz=quiz, question_title=q['question_title'], question_options=q['question_options'], answer=q['answer'])
+            for q in quiz_data['questions']
+        ])
+        quiz.title = quiz_data['title']
+        quiz.description = quiz_data.get('description')
+        quiz.transcript = transcript
+        quiz.save()
+    return quiz
+
+
+def stream_new_quiz(user, youtube_url, transcript, video_metadata, saved):
+    """
+    Generates the quiz for a transcript as stream and saves it while it arrives: the quiz as soon as its title is known,
+    then every question in its own transaction. Yields ('quiz', Quiz) and ('question', Question) and returns the
+    validated quiz JSON. The created quiz is put into `saved` under 'quiz' and deleted again if the generation fails.
+    """
+    quiz = None
+    quiz_json = None
+    fields = {}
+    questions = []
+    try:
+        for event, value in stream_quiz_from_text(transcript):
+            if event in ('title', 'description') and quiz is not None:
+                setattr(quiz, event, value)
+                quiz.save(update_fields=[event, 'updated_at'])
+            elif event in ('title', 'description'):
+                fields[event] = value
+            elif event == 'question':
+                questions.append(validate_quiz_data(value, QuizDataQuestionSerializer))
+            else:
+                quiz_json = validate_quiz_data(value)
+            if quiz is None and fields.get('title'):
+                quiz = saved['quiz'] = Quiz.objects.create(owner=user, title=fields['title'], description=fields.get('description'), video_url=youtube_url,
+                                                           video_metadata=video_metadata, transcript_id=stored_transcript_id(youtube_url))
+                yield 'quiz', quiz
+            while quiz is not None and questions:
+                value = questions.pop(0)
+                with transaction.atomic():
+                    question = Question.objects.create(quiz=quiz, question_title=value['question_title'], question_options=value['question_options'], answer=value['answer'])
+                yield 'question', question
+        if quiz_json is None:
+            raise InvalidQuizDataError('Gemini ended the quiz stream without the complete quiz.')
+    except BaseException:
+        if quiz is not None:
+            quiz.delete()
+        raise
+    return quiz_json
+
+
+def stream_quiz_pipeline(user, youtube_url, video_info=None):
+    """
+    Streaming variant of `create_quiz_pipeline`. Yields ('stage', name) while the transcript is prepared, then
+    ('quiz', Quiz) once the quiz was saved with its generated title, ('question', Question) for every question as soon
+    as it is generated and saved in its own transaction, and finally ('done', Quiz). A quiz whose generation fails is
+    deleted again. Like the other pipelines, the run is recorded and concurrent requests for the same video are
+    coalesced: a request that arrives while the video is generated elsewhere waits and gets the finished quiz at once.
+    """
+    if video_info is None:
+        yield 'stage', 'probe'
+        video_info = probe_video(youtube_url)
+    video_id = extract_video_id(youtube_url)
+    video_metadata = summarize_video_info(video_info)
+    saved = {}
+
+    def generate():
+        yield 'stage', 'transcribe'
+        transcript = obtain_transcript(youtube_url, video_info=video_info)
+        yield 'stage', 'generate'
+        if len(transcript) > settings.QUIZLY_LONG_TRANSCRIPT_THRESHOLD:
+            return validate_quiz_data(generate_quiz_from_text(transcript))
+        return (yield from stream_new_quiz(user, youtube_url, transcript, video_metadata, saved))
+
+    with record_pipeline_run(PipelineRun.MODE_TWO_STEP, video_id):
+        quiz_json = pipeline_cache.get('quiz', video_id)
+        if quiz_json is None:
+            quiz_json = yield from single_flight.stream(video_id, generate)
+            pipeline_cache.set('quiz', video_id, quiz_json)
+    quiz = saved.get('quiz')
+    if quiz is None:
+        quiz = save_quiz_to_db(user, youtube_url, quiz_json, video_metadata=video_metadata)
+        yield 'quiz', quiz
+        for question in quiz.questions.all():
+            yield 'question', question
+    yield 'done', quiz
+
+
+async def aobtain_transcript(youtube_url, video_info=None, on_stage=None):
+    """
+    Asynchronous variant of `obtain_transcript`. Blocking yt-dlp and file system work runs in worker threads,
+    the Gemini calls are awaited on the event loop.
+    """
+    video_id = extract_video_id(youtube_url)
+    transcript = await aload_transcript(video_id)
+    if transcript is not None:
+        return transcript
+    if video_info is None:
+        report_stage(on_stage, 'probe')
+        video_info = await sync_to_async(probe_video, thread_sensitive=False)(youtube_url)
+    report_stage(on_stage, 'transcribe')
+    transcript = await sync_to_async(fetch_captions, thread_sensitive=False)(video_info)
+    if transcript is not None:
+        await aremember_transcript(video_id, youtube_url, transcript)
+        return transcript
+    reserved_bytes = estimate_scratch_bytes(summarize_video_info(video_info))
+    scratch_dir = await sync_to_async(scratch_space.acquire, thread_sensitive=False)(reserved_bytes, label=video_id or youtube_url)
+    try:
+        report_stage(on_stage, 'download')
+        audio_path = await sync_to_async(download_audio_from_youtube, thread_sensitive=False)(youtube_url, scratch_dir.path)
+        scratch_dir.measure()
+        report_stage(on_stage, 'transcribe')
+        transcript = await atranscribe_audio(audio_path)
+    finally:
+        await sync_to_async(scratch_space.release, thread_sensitive=False)(scratch_dir)
+    await aremember_transcript(video_id, youtube_url, transcript)
+    return transcript
+
+
+async def agenerate_quiz_multimodal(youtube_url, video_info=None, on_stage=None):
+    """
+    Asynchronous variant of `generate_quiz_multimodal`.
+    """
+    video_id = extract_video_id(youtube_url)
+    if video_info is None:
+        report_stage(on_stage, 'probe')
+        video_info = await sync_to_async(probe_video, thread_sensitive=False)(youtube_url)
+    transcript = await aload_transcript(video_id)
+    if transcript is None:
+        report_stage(on_stage, 'transcribe')
+        transcript = await sync_to_async(fetch_captions, thread_sensitive=False)(video_info)
+        if transcript is not None:
+            await aremember_transcript(video_id, youtube_url, transcript)
+    if transcript is not None:
+        report_stage(on_stage, 'generate')
+        return await agenerate_quiz_from_text(transcript)
+    video_summary = summarize_video_info(video_info)
+    if settings.QUIZLY_MULTIMODAL_SOURCE == 'url':
+        report_stage(on_stage, 'generate')
+        quiz_json, transcript = await agenerate_quiz_from_youtube_url(youtube_url, video_summary)
+    else:
+        scratch_dir = await sync_to_async(scratch_space.acquire, thread_sensitive=False)(estimate_scratch_bytes(video_summary), label=video_id or youtube_url)
+        try:
+            report_stage(on_stage, 'download')
+            audio_path = await sync_to_async(download_audio_from_youtube, thread_sensitive=False)(youtube_url, scratch_dir.path)
+            scratch_dir.measure()
+            report_stage(on_stage, 'generate')
+            quiz_json, transcript = await agenerate_quiz_from_audio(audio_path)
+        finally:
+            await sync_to_async(scratch_space.release, thread_sensitive=False)(scratch_dir)
+    if transcript is not None:
+        await aremember_transcript(video_id, youtube_url, transcript)
+    return quiz_json
+
+
+async def abuild_quiz_data(youtube_url, video_info=None, on_stage=None, mode=None):
+    """
+    Asynchronous variant of `build_quiz_data`.
+    """
+    video_id = extract_video_id(youtube_url)
+    quiz_json = pipeline_cache.get('quiz', video_id)
+    if quiz_json is not None:
+        return quiz_json
+
+    async def generate():
+        if mode == PipelineRun.MODE_MULTIMODAL:
+            return validate_quiz_data(await agenerate_quiz_multimodal(youtube_url, video_info=video_info, on_stage=on_stage))
+        transcript = await aobtain_transcript(youtube_url, video_info=video_info, on_stage=on_stage)
+        report_stage(on_stage, 'generate')
+        return validate_quiz_data(await agenerate_quiz_from_text(transcript))
+
+    quiz_json = await single_flight.ado(video_id, generate)
+    pipeline_cache.set('quiz', video_id, quiz_json)
+    return quiz_json
+
+
+async def acreate_quiz_pipeline(user, youtube_url, video_info=None, on_stage=None, mode=None):
+    """
+    Asynchronous variant of `create_quiz_pipeline` for ASGI deployments. A worker can keep many pipelines in
+    flight because the event loop is never blocked by network I/O.
     """
-    audio_path = download_audio_from_youtube(youtube_url)
-    transcript = transcribe_audio(audio_path)
-    quiz_json = generate_quiz_from_text(transcript)
-    quiz = save_quiz_to_db(user, youtube_url, quiz_json)
-    return quiz
\ No newline at end of file
+    mode = mode or settings.QUIZLY_PIPELINE_MODE
+    if video_info is None:
+        report_stage(on_stage, 'probe')
+        video_info = await sync_to_async(probe_video, thread_sensitive=False)(youtube_url)
+    async with arecord_pipeline_run(mode, extract_video_id(youtube_url)):
+        quiz_json = await abuild_quiz_data(youtube_url, video_info=video_info, on_stage=on_stage, mode=mode)
+    report_stage(on_stage, 'save')
+    return await sync_to_async(save_quiz_to_db)(user, youtube_url, quiz_json, video_metadata=summarize_video_info(video_info))
\ No newline at end of file
@@ -0,0 +1,106 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+
+from quizly_app.models import Question
+
+QUIZ_FIELDS = ('id', 'title', 'description', 'created_at', 'updated_at', 'video_url')
+QUESTION_FIELDS = ('id', 'question_title', 'question_options', 'answer', 'created_at', 'updated_at')
+QUIZ_DATETIME_FIELDS = ('created_at', 'updated_at')
+EXPANDABLE_FIELDS = ('questions',)
+# Compact default shape of the quiz list, enough for a quiz picker
+LIST_FIELDS = ('id', 'title', 'created_at')
+DETAIL_FIELDS = QUIZ_FIELDS + EXPANDABLE_FIELDS
+
+_datetime_field = serializers.DateTimeField()
+
+
+def datetime_formatter():
+    """
+    Returns a function that formats datetimes exactly like the `DateTimeField` of the serializers, in the current
+    time zone with `Z` for UTC. The time zone is resolved once instead of once per value.
+    """
+    output_format = api_settings.DATETIME_FORMAT
+    if not settings.USE_TZ or output_format is None or output_format.lower() != ISO_8601:
+        return _datetime_field.to_representation
+    current_timezone = timezone.get_current_timezone()
+
+    def format_datetime(value):
+        if not value or not timezone.is_aware(value):
+            return _datetime_field.to_representation(value)
+        value = value.astimezone(current_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return format_datetime
+
+
+def question_dicts(quiz_ids, format_datetime):
+    """
+    Returns the questions of the given quizzes as plain dicts in the shape of `QuestionSerializer`, grouped by quiz id
+    and ordered by id. All questions are read with one query on the (quiz, id) index.
+    """
+    questions = defaultdict(list)
+    for row in Question.objects.filter(quiz_id__in=quiz_ids).order_by('id').values_list('quiz_id', *QUESTION_FIELDS):
+        questions[row[0]].append({
+            'id': row[1],
+            'question_title': row[2],
+            'question_options': row[3],
+            'answer': row[4],
+            'created_at': format_datetime(row[5]),
+            'updated_at': format_datetime(row[6]),
+        })
+    return questions
+
+
+def _split_param(value):
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+
+def select_fields(query_params, default_fields):
+    """
+    Reads the sparse fieldset of a request from `?fields=` (quiz fields, defaults to `default_fields`) and
+    `?expand=questions`. Returns the selected quiz fields in schema order and whether questions are included.
+    Raises `ValidationError` for unknown fields.
+    """
+    fields = _split_param(query_params.get('fields')) or list(default_fields)
+    expand = _split_param(query_params.get('expand'))
+    errors = {}
+    unknown_fields = [field for field in fields if field not in QUIZ_FIELDS + EXPANDABLE_FIELDS]
+    if unknown_fields:
+        errors['fields'] = [f'Unknown field: {field}' for field in unknown_fields]
+    unknown_expand = [field for field in expand if field not in EXPANDABLE_FIELDS]
+    if unknown_expand:
+        errors['expand'] = [f'Cannot expand: {field}' for field in unknown_expand]
+    if errors:
+        raise ValidationError(errors)
+    return tuple(field for field in QUIZ_FIELDS if field in fields), 'questions' in fields or 'questions' in expand
+
+
+def query_fields(fields, required=('id',)):
+    """
+    Returns the columns to read for the selected fields, adding the `required` ones like the id that the
+    questions are grouped by or the ordering fields the cursor is built from.
+    """
+    return tuple(dict.fromkeys(required + fields))
+
+
+def quiz_dicts(rows, fields=QUIZ_FIELDS, include_questions=True):
+    """
+    Turns quiz rows read with `values()` into plain dicts in the shape of `QuizSerializer`, limited to `fields`
+    and with the nested questions only if `include_questions` is set. Questions that are not included are not
+    queried at all. Builds no model instances and no serializer fields.
+    """
+    rows = list(rows)
+    format_datetime = datetime_formatter()
+    questions = question_dicts([row['id'] for row in rows], format_datetime) if include_questions else None
+    converters = [(field, format_datetime if field in QUIZ_DATETIME_FIELDS else None) for field in fields]
+    result = []
+    for row in rows:
+        quiz = {field: convert(row[field]) if convert else row[field] for field, convert in converters}
+        if include_questions:
+            quiz['questions'] = questions.get(row['id'], [])
+        result.append(quiz)
+    return result
@@ -0,0 +1,50 @@
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def format_server_sent_event(event, data):
+    """
+    Formats one Server-Sent Event with a JSON payload.
+    """
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'.encode('utf-8')
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Renderer for clients that accept `text/event-stream`. Regular responses, like validation errors returned
+    before a stream starts, are sent as a single `error` event.
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return format_server_sent_event('error', data)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON renderer for read-only payloads of plain dicts and lists. Compact output is encoded with orjson when it is
+    installed and produces the same bytes as `JSONRenderer`, falling back to `JSONRenderer` otherwise. Datetimes and
+    other types orjson does not handle like DRF go through the DRF encoder, payloads orjson cannot encode, like integers
+    beyond 64 bit, through `JSONRenderer`. Only floats differ: exponents are spelled `1e16` instead of `1e+16`, and NaN
+    and infinity become `null` where `JSONRenderer` raises. Indented output for the browsable API and clients asking
+    for `indent` also goes through `JSONRenderer`.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact or self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=JSONEncoder().default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,146 @@
+import hashlib
+import threading
+import time
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.core.cache import caches
+from django.dispatch import receiver
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.http import http_date
+from django.utils.module_loading import import_string
+from rest_framework.response import Response
+
+from quizly_app.signals import quiz_changed
+
+RESPONSE_CACHE_BACKENDS = {
+    'local': 'quizly_app.api.response_cache.LocalResponseCacheBackend',
+    'django': 'quizly_app.api.response_cache.DjangoResponseCacheBackend',
+}
+
+
+class LocalResponseCacheBackend:
+    """
+    In-process response cache backed by a cachetools TTL cache that evicts the least recently used entry once
+    it holds `QUIZLY_RESPONSE_CACHE_MAX_ENTRIES` items.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache = TTLCache(maxsize=settings.QUIZLY_RESPONSE_CACHE_MAX_ENTRIES, ttl=settings.QUIZLY_RESPONSE_CACHE_TTL)
+
+    def get(self, key):
+        with self._lock:
+            return self._cache.get(key)
+
+    def set(self, key, value):
+        with self._lock:
+            self._cache[key] = value
+
+    def size(self):
+        with self._lock:
+            return len(self._cache)
+
+
+class DjangoResponseCacheBackend:
+    """
+    Response cache in the Django cache `QUIZLY_RESPONSE_CACHE_ALIAS`, for example Redis or Memcached shared
+    by all processes.
+    """
+    def __init__(self):
+        self._cache = caches[settings.QUIZLY_RESPONSE_CACHE_ALIAS]
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value):
+        self._cache.set(key, value, timeout=settings.QUIZLY_RESPONSE_CACHE_TTL)
+
+    def size(self):
+        return None
+
+
+class ResponseCache:
+    """
+    Cache for the data of read-only quiz responses. Every entry belongs to one or more scopes, like the quizzes
+    of one owner or one quiz. Each scope has a generation token that is part of the entry keys, so replacing
+    the token on `invalidate` makes all entries of the scope unreachable at once, whatever their keys were.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _generation(self, scope):
+        key = f'quizly:generation:{scope}'
+        generation = self.backend.get(key)
+        if generation is None:
+            generation = time.time_ns()
+            self.backend.set(key, generation)
+        return generation
+
+    def get_or_set(self, scopes, key, build):
+        """
+        Returns the cached data for `key` in the given scopes, building and storing it with `build` on a miss.
+        """
+        full_key = f'quizly:response:{key}:' + ':'.join(str(self._generation(scope)) for scope in scopes)
+        data = self.backend.get(full_key)
+        with self._lock:
+            if data is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        if data is None:
+            data = build()
+            self.backend.set(full_key, data)
+        return data
+
+    def invalidate(self, scopes):
+        """
+        Drops every cached entry of the given scopes.
+        """
+        for scope in scopes:
+            self.backend.set(f'quizly:generation:{scope}', time.time_ns())
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self._hits, 'misses': self._misses, 'size': self.backend.size()}
+
+
+def get_response_cache_backend(name=None):
+    """
+    Returns the backend selected by `QUIZLY_RESPONSE_CACHE_BACKEND`, `local`, `django` or a dotted class path.
+    """
+    name = name or settings.QUIZLY_RESPONSE_CACHE_BACKEND
+    return import_string(RESPONSE_CACHE_BACKENDS.get(name, name))()
+
+
+def build_etag(*parts):
+    """
+    Returns a strong ETag for the given validator parts, like timestamps, counts and the requested representation.
+    """
+    return quote_etag(hashlib.md5(repr(parts).encode('utf-8')).hexdigest())
+
+
+def conditional_cached_response(request, etag, scopes, build, last_modified=None):
+    """
+    Answers a conditional GET with 304 when the client already has the representation with this ETag or last
+    modification time. Otherwise returns the data from the response cache, built with `build` on a miss.
+    """
+    last_modified = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = Response(response_cache.get_or_set(scopes, etag, build))
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+response_cache = ResponseCache(get_response_cache_backend())
+
+
+@receiver(quiz_changed)
+def invalidate_cached_responses(sender, owner_id, quiz_ids, **kwargs):
+    response_cache.invalidate([f'owner:{owner_id}'] + [f'quiz:{quiz_id}' for quiz_id in quiz_ids])
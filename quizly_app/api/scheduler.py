@@ -0,0 +1,224 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+
+import httpx
+from django.conf import settings
+from google.genai import errors
+from tenacity import AsyncRetrying, Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+from .exceptions import ModelRequestError, ModelUnavailableError
+from .usage import record_usage
+from .instrumentation import span
+
+LANE_INTERACTIVE = 'interactive'
+LANE_BULK = 'bulk'
+LANE_PRIORITIES = {LANE_INTERACTIVE: 0, LANE_BULK: 1}
+RETRYABLE_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+NETWORK_ERRORS = (httpx.TransportError, ConnectionError, TimeoutError)
+# Every failure of a model call that is translated into a `PipelineError`
+MODEL_ERRORS = (errors.APIError,) + NETWORK_ERRORS
+
+
+def is_retryable(error):
+    """
+    Checks whether a failed model call is worth retrying: rate limits, server errors and network problems.
+    """
+    if isinstance(error, errors.APIError):
+        return error.code in RETRYABLE_STATUS_CODES
+    return isinstance(error, NETWORK_ERRORS)
+
+
+class TokenBucket:
+    """
+    Token bucket that holds at most `per_minute` units and refills continuously at `per_minute` units per minute.
+    """
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """
+        Returns the seconds until `amount` units are available. Amounts above the capacity wait for a full bucket.
+        """
+        self._refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+
+class ModelCallScheduler:
+    """
+    Shared scheduler in front of all Gemini calls. Calls wait in priority lanes until a request and their
+    estimated tokens fit into the per-minute budgets, short interactive calls are admitted before long
+    bulk transcriptions. Retryable errors are retried with jittered exponential backoff.
+    """
+    def __init__(self, requests_per_minute, tokens_per_minute, max_attempts):
+        self.max_attempts = max_attempts
+        self._condition = threading.Condition()
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._lanes = {lane: {'calls': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0} for lane in LANE_PRIORITIES}
+        self._retries = 0
+        self._failures = 0
+
+    def set_budgets(self, requests_per_minute, tokens_per_minute):
+        """
+        Replaces the per-minute budgets, for example to run benchmarks against a stand-in model without the Gemini quota.
+        """
+        with self._condition:
+            self._requests = TokenBucket(requests_per_minute)
+            self._tokens = TokenBucket(tokens_per_minute)
+            self._condition.notify_all()
+
+    def _enqueue(self, lane):
+        ticket = (LANE_PRIORITIES[lane], next(self._sequence))
+        heapq.heappush(self._waiting, ticket)
+        return ticket
+
+    def _try_admit(self, ticket, tokens):
+        """
+        Admits the ticket if it is first in line and both budgets allow it. Returns 0 when admitted, otherwise
+        the seconds to wait or None when other tickets are ahead.
+        """
+        if self._waiting[0] != ticket:
+            return None
+        wait = max(self._requests.wait_time(1), self._tokens.wait_time(tokens))
+        if wait > 0:
+            return wait
+        self._requests.take(1)
+        self._tokens.take(tokens)
+        heapq.heappop(self._waiting)
+        self._condition.notify_all()
+        return 0
+
+    def _record_wait(self, lane, started):
+        waited = time.monotonic() - started
+        with self._condition:
+            metrics = self._lanes[lane]
+            metrics['calls'] += 1
+            metrics['wait_seconds'] += waited
+            metrics['max_wait_seconds'] = max(metrics['max_wait_seconds'], waited)
+
+    def acquire(self, tokens, lane=LANE_INTERACTIVE):
+        """
+        Blocks until the call may be sent.
+        """
+        started = time.monotonic()
+        with self._condition:
+            ticket = self._enqueue(lane)
+            while True:
+                wait = self._try_admit(ticket, tokens)
+                if wait == 0:
+                    break
+                self._condition.wait(timeout=wait)
+        self._record_wait(lane, started)
+
+    async def aacquire(self, tokens, lane=LANE_INTERACTIVE):
+        """
+        Waits on the event loop until the call may be sent.
+        """
+        started = time.monotonic()
+        with self._condition:
+            ticket = self._enqueue(lane)
+        try:
+            while True:
+                with self._condition:
+                    wait = self._try_admit(ticket, tokens)
+                if wait == 0:
+                    break
+                await asyncio.sleep(wait or 0.05)
+        except asyncio.CancelledError:
+            with self._condition:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+            raise
+        self._record_wait(lane, started)
+
+    def _before_retry(self, retry_state):
+        with self._condition:
+            self._retries += 1
+
+    def _retrying_options(self):
+        return {'retry': retry_if_exception(is_retryable), 'stop': stop_after_attempt(self.max_attempts),
+                'wait': wait_random_exponential(multiplier=1, max=30), 'before_sleep': self._before_retry, 'reraise': True}
+
+    def _translate_error(self, error):
+        with self._condition:
+            self._failures += 1
+        if is_retryable(error):
+            return ModelUnavailableError(f'Gemini is currently unavailable: {error}')
+        return ModelRequestError(f'Gemini request failed: {error}')
+
+    def call(self, fn, tokens, lane=LANE_INTERACTIVE, streamed=False):
+        """
+        Runs the model call `fn` once the budgets allow it and retries it on retryable errors.
+        The usage of the response is added to the tally of the current pipeline run, `streamed` calls record the
+        usage of their final chunk themselves. The wait and every attempt are measured as the `model_wait` and `model_call` stages.
+        """
+        try:
+            for attempt in Retrying(**self._retrying_options()):
+                with attempt:
+                    with span('model_wait', lane=lane):
+                        self.acquire(tokens, lane)
+                    with span('model_call', lane=lane):
+                        response = fn()
+                    if not streamed:
+                        record_usage(response)
+                    return response
+        except MODEL_ERRORS as e:
+            raise self._translate_error(e) from e
+
+    async def acall(self, fn, tokens, lane=LANE_INTERACTIVE):
+        """
+        Asynchronous variant of `call`, `fn` returns the awaitable of the model call.
+        """
+        try:
+            async for attempt in AsyncRetrying(**self._retrying_options()):
+                with attempt:
+                    with span('model_wait', lane=lane):
+                        await self.aacquire(tokens, lane)
+                    with span('model_call', lane=lane):
+                        response = await fn()
+                    record_usage(response)
+                    return response
+        except MODEL_ERRORS as e:
+            raise self._translate_error(e) from e
+
+    def stats(self):
+        """
+        Returns the queue depth, wait times per lane and retry counters.
+        """
+        with self._condition:
+            lanes = {}
+            for lane, metrics in self._lanes.items():
+                average = metrics['wait_seconds'] / metrics['calls'] if metrics['calls'] else 0.0
+                lanes[lane] = {**metrics, 'avg_wait_seconds': average}
+            return {'queue_depth': len(self._waiting), 'lanes': lanes, 'retries': self._retries, 'failures': self._failures,
+                    'available_requests': int(self._requests.tokens), 'available_tokens': int(self._tokens.tokens)}
+
+
+def estimate_text_tokens(text):
+    """
+    Rough token estimate for a prompt, about four characters per token plus room for the answer.
+    """
+    return len(text) // 4 + settings.QUIZLY_GEMINI_OUTPUT_TOKEN_ESTIMATE
+
+
+model_scheduler = ModelCallScheduler(requests_per_minute=settings.QUIZLY_GEMINI_REQUESTS_PER_MINUTE,
+                                     tokens_per_minute=settings.QUIZLY_GEMINI_TOKENS_PER_MINUTE,
+                                     max_attempts=settings.QUIZLY_GEMINI_MAX_ATTEMPTS)
@@ -0,0 +1,208 @@
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .exceptions import PipelineError
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+RESERVATION_FILE = '.reservation'
+LOCK_FILE = '.lock'
+
+
+class ScratchSpaceExhaustedError(PipelineError):
+    """
+    Raised when a job waited longer than `QUIZLY_SCRATCH_WAIT_TIMEOUT` for free scratch space.
+    """
+    status_code = 503
+
+
+def _directory_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return total
+
+
+def _pid_is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+class ScratchDir:
+    """
+    A job directory inside the scratch root together with its byte reservation and measured disk use.
+    """
+    def __init__(self, path, reserved_bytes, label):
+        self.path = path
+        self.reserved_bytes = reserved_bytes
+        self.label = label
+        self.peak_bytes = 0
+
+    def measure(self):
+        """
+        Measures the current disk use of the directory and returns it, keeping track of the peak.
+        """
+        used = _directory_size(self.path)
+        self.peak_bytes = max(self.peak_bytes, used)
+        return used
+
+
+class ScratchSpace:
+    """
+    Manages the temp files of the pipeline below one root directory. Every job reserves bytes up front and
+    waits until the reservations of all jobs on this host fit into the quota. Job directories are removed
+    when the job ends, and directories left behind by crashed processes are removed by `cleanup_stale`.
+    """
+    def __init__(self, root, quota_bytes, wait_timeout, poll_interval=0.5):
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._active = {}
+        self._finished = deque(maxlen=50)
+
+    @contextmanager
+    def _root_lock(self):
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock, open(os.path.join(self.root, LOCK_FILE), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _reserved_bytes(self):
+        total = 0
+        for entry in os.scandir(self.root):
+            if not entry.is_dir():
+                continue
+            try:
+                with open(os.path.join(entry.path, RESERVATION_FILE)) as reservation:
+                    total += int(reservation.read() or 0)
+            except (OSError, ValueError):
+                pass
+        return total
+
+    def _try_reserve(self, path, reserved_bytes):
+        with self._root_lock():
+            reserved = self._reserved_bytes()
+            if reserved and reserved + reserved_bytes > self.quota_bytes:
+                return False
+            os.makedirs(path)
+            with open(os.path.join(path, RESERVATION_FILE), 'w') as reservation:
+                reservation.write(str(reserved_bytes))
+            return True
+
+    def acquire(self, reserved_bytes, label=None):
+        """
+        Creates a job directory once `reserved_bytes` fit into the quota and returns it as `ScratchDir`.
+        A single job larger than the whole quota is admitted when no other job holds a reservation.
+        """
+        reserved_bytes = min(int(reserved_bytes), self.quota_bytes)
+        path = os.path.join(self.root, f'{os.getpid()}-{uuid.uuid4().hex}')
+        deadline = time.monotonic() + self.wait_timeout
+        while not self._try_reserve(path, reserved_bytes):
+            if time.monotonic() >= deadline:
+                raise ScratchSpaceExhaustedError('Not enough scratch space to process the video. Please try again later.')
+            time.sleep(self.poll_interval)
+        scratch_dir = ScratchDir(path, reserved_bytes, label)
+        with self._lock:
+            self._active[path] = scratch_dir
+        return scratch_dir
+
+    def release(self, scratch_dir):
+        """
+        Records the disk use of a job directory, removes it and frees its reservation.
+        """
+        scratch_dir.measure()
+        shutil.rmtree(scratch_dir.path, ignore_errors=True)
+        with self._lock:
+            self._active.pop(scratch_dir.path, None)
+            self._finished.append({'label': scratch_dir.label, 'reserved_bytes': scratch_dir.reserved_bytes, 'peak_bytes': scratch_dir.peak_bytes})
+        logger.info('Scratch job %s used %s bytes (reserved %s)', scratch_dir.label, scratch_dir.peak_bytes, scratch_dir.reserved_bytes)
+
+    @contextmanager
+    def job_dir(self, reserved_bytes, label=None):
+        """
+        Context manager around `acquire` and `release` that cleans up on success and on failure.
+        """
+        scratch_dir = self.acquire(reserved_bytes, label=label)
+        try:
+            yield scratch_dir
+        finally:
+            self.release(scratch_dir)
+
+    def cleanup_stale(self):
+        """
+        Removes job directories of processes on this host that no longer run. Returns the number of removed directories.
+        """
+        if not os.path.isdir(self.root):
+            return 0
+        removed = 0
+        with self._root_lock():
+            for entry in os.scandir(self.root):
+                pid = entry.name.split('-', 1)[0]
+                if entry.is_dir() and pid.isdigit() and int(pid) != os.getpid() and not _pid_is_alive(int(pid)):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    removed += 1
+        if removed:
+            logger.info('Removed %s stale scratch directories from %s', removed, self.root)
+        return removed
+
+    def stats(self):
+        """
+        Returns the quota, the reservations of all jobs on this host and the disk use of the jobs of this process.
+        """
+        with self._root_lock():
+            reserved = self._reserved_bytes()
+        with self._lock:
+            active = list(self._active.values())
+            finished = list(self._finished)
+        return {
+            'root': self.root,
+            'quota_bytes': self.quota_bytes,
+            'reserved_bytes': reserved,
+            'active_jobs': [{'label': d.label, 'reserved_bytes': d.reserved_bytes, 'used_bytes': d.measure()} for d in active],
+            'recent_jobs': finished,
+        }
+
+
+def estimate_scratch_bytes(video_info):
+    """
+    Estimates the scratch space a video needs: the downloaded audio stream plus the converted copy and its segments.
+    """
+    video_info = video_info or {}
+    source_bytes = video_info.get('audio_filesize')
+    if not source_bytes and video_info.get('duration'):
+        source_bytes = video_info['duration'] * 16 * 1024
+    if not source_bytes:
+        return settings.QUIZLY_SCRATCH_DEFAULT_RESERVATION
+    return int(source_bytes * 2.5)
+
+
+scratch_space = ScratchSpace(root=settings.QUIZLY_SCRATCH_ROOT, quota_bytes=settings.QUIZLY_SCRATCH_QUOTA_BYTES, wait_timeout=settings.QUIZLY_SCRATCH_WAIT_TIMEOUT)
@@ -0,0 +1,162 @@
+import logging
+import re
+from collections import defaultdict
+from functools import lru_cache, reduce
+from operator import and_, or_
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.db.models import Q
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from quizly_app.models import Quiz, Question
+from quizly_app.signals import quiz_changed
+
+logger = logging.getLogger(__name__)
+
+SEARCH_BACKENDS = {
+    'sqlite': 'quizly_app.api.search.SqliteSearchBackend',
+    'database': 'quizly_app.api.search.DatabaseSearchBackend',
+}
+TERM_PATTERN = re.compile(r'\w+')
+SEARCH_TABLE = 'quizly_quiz_search'
+# bm25 weights of the owner, title, description, questions and options columns
+COLUMN_WEIGHTS = (0.0, 10.0, 3.0, 5.0, 1.0)
+
+
+def search_terms(query):
+    """
+    Splits a search query into words. Operators and quotes of the query are dropped, so user input can never
+    form an invalid or expensive full-text expression.
+    """
+    return TERM_PATTERN.findall(query)[:settings.QUIZLY_SEARCH_MAX_TERMS]
+
+
+def owner_token(owner_id):
+    return f'u{owner_id}'
+
+
+class SearchBackend:
+    """
+    Base class of the search backends. `search` returns the ids of the matching quizzes of one owner, best match
+    first, `update` brings the index up to date for changed or deleted quizzes and `rebuild` indexes all quizzes.
+    """
+    def search(self, owner_id, query, offset, limit):
+        raise NotImplementedError
+
+    def update(self, quiz_ids):
+        pass
+
+    def rebuild(self):
+        return 0
+
+
+class SqliteSearchBackend(SearchBackend):
+    """
+    Full-text index in the SQLite FTS5 table `quizly_quiz_search` with one row per quiz: its title, description,
+    question titles and answer options, plus the owner as token so a search only intersects the owner's rows.
+    Results are ranked with bm25, title matches weigh most. The table is created by migration 0011.
+    """
+    def __init__(self):
+        if connection.vendor != 'sqlite':
+            raise ImproperlyConfigured('The sqlite search backend requires the SQLite database backend.')
+
+    def match_expression(self, owner_id, terms):
+        """
+        Returns the FTS5 query for the quizzes of the owner that contain all terms, the last one as prefix so
+        results appear while the user is typing.
+        """
+        words = [f'"{term}"' for term in terms]
+        words[-1] += '*'
+        words = ' '.join(words)
+        return f'owner : "{owner_token(owner_id)}" AND {{title description questions options}} : ({words})'
+
+    def search(self, owner_id, query, offset, limit):
+        terms = search_terms(query)
+        if not terms:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+                           f'ORDER BY bm25({SEARCH_TABLE}, {", ".join(map(str, COLUMN_WEIGHTS))}) LIMIT %s OFFSET %s',
+                           [self.match_expression(owner_id, terms), limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+
+    def documents(self, quiz_ids):
+        """
+        Returns the index rows of the given quizzes that still exist, with two queries.
+        """
+        questions = defaultdict(list)
+        options = defaultdict(list)
+        for quiz_id, title, question_options in Question.objects.filter(quiz_id__in=quiz_ids).values_list('quiz_id', 'question_title', 'question_options'):
+            questions[quiz_id].append(title)
+            options[quiz_id].extend(str(option) for option in question_options or [])
+        return [(quiz_id, owner_token(owner_id), title, description or '', ' '.join(questions[quiz_id]), ' '.join(options[quiz_id]))
+                for quiz_id, owner_id, title, description in Quiz.objects.filter(pk__in=quiz_ids).values_list('id', 'owner_id', 'title', 'description')]
+
+    def update(self, quiz_ids):
+        quiz_ids = list(quiz_ids)
+        if not quiz_ids:
+            return
+        documents = self.documents(quiz_ids)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({", ".join(["%s"] * len(quiz_ids))})', quiz_ids)
+            cursor.executemany(f'INSERT INTO {SEARCH_TABLE} (rowid, owner, title, description, questions, options) VALUES (%s, %s, %s, %s, %s, %s)', documents)
+
+    def rebuild(self):
+        """
+        Re-indexes all quizzes in batches of `QUIZLY_SEARCH_REBUILD_BATCH` and merges the index segments afterwards.
+        Returns the number of indexed quizzes.
+        """
+        indexed = 0
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+            quiz_ids = list(Quiz.objects.order_by('id').values_list('id', flat=True))
+            for start in range(0, len(quiz_ids), settings.QUIZLY_SEARCH_REBUILD_BATCH):
+                batch = quiz_ids[start:start + settings.QUIZLY_SEARCH_REBUILD_BATCH]
+                with connection.cursor() as cursor:
+                    cursor.executemany(f'INSERT INTO {SEARCH_TABLE} (rowid, owner, title, description, questions, options) VALUES (%s, %s, %s, %s, %s, %s)',
+                                       self.documents(batch))
+                indexed += len(batch)
+            with connection.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+        return indexed
+
+
+class DatabaseSearchBackend(SearchBackend):
+    """
+    Search without an index for databases without FTS5: every word has to occur in the title, the description or a
+    question title of the quiz, newest quizzes first. Good enough for small installations, it scans the quizzes of the owner.
+    """
+    def search(self, owner_id, query, offset, limit):
+        terms = search_terms(query)
+        if not terms:
+            return []
+        matches = reduce(and_, [reduce(or_, [Q(title__icontains=term), Q(description__icontains=term), Q(questions__question_title__icontains=term)])
+                                for term in terms])
+        quiz_ids = Quiz.objects.filter(matches, owner_id=owner_id).order_by('-created_at', '-id').values_list('id', flat=True).distinct()
+        return list(quiz_ids[offset:offset + limit])
+
+
+@lru_cache(maxsize=None)
+def get_search_backend(name=None):
+    """
+    Returns the search backend selected by `QUIZLY_SEARCH_BACKEND`, either one of the names `sqlite` and
+    `database` or the dotted path of a `SearchBackend` subclass.
+    """
+    name = name or settings.QUIZLY_SEARCH_BACKEND
+    return import_string(SEARCH_BACKENDS.get(name, name))()
+
+
+@receiver(quiz_changed)
+def update_search_index(sender, owner_id, quiz_ids, **kwargs):
+    """
+    Keeps the index in sync with saved and deleted quizzes and questions. A failed update is logged and does not
+    fail the write, `rebuild_search_index` repairs the index.
+    """
+    try:
+        get_search_backend().update(quiz_ids)
+    except Exception:
+        logger.exception('Updating the search index for quizzes %s failed', quiz_ids)
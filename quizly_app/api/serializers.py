@@ -1,5 +1,7 @@
+from django.conf import settings
 from rest_framework import serializers
-from quizly_app.models import Quiz, Question
+from quizly_app.models import Quiz, Question, QuizBatch, QuizJob, PipelineRun
+from .generation import DIFFICULTY_INSTRUCTIONS
 
 class QuestionSerializer(serializers.ModelSerializer):
     """
@@ -27,3 +29,113 @@ class QuizCreateSerializer(serializers.Serializer):
     Serializer for generating a quiz from a YouTube URL.
     """
     url = serializers.URLField()
+    background = serializers.BooleanField(required=False, default=None, allow_null=True)
+    mode = serializers.ChoiceField(choices=PipelineRun.MODE_CHOICES, required=False, default=None, allow_null=True)
+
+
+class QuizJobSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a background quiz job including the resulting quiz once the job succeeded.
+    """
+    quiz = QuizSerializer(read_only=True)
+
+    class Meta:
+        model = QuizJob
+        fields = ['id', 'video_url', 'video_metadata', 'mode', 'status', 'stage', 'error', 'attempts', 'created_at', 'updated_at', 'started_at', 'finished_at', 'quiz']
+
+
+class QuizBatchCreateSerializer(serializers.Serializer):
+    """
+    Serializer for generating quizzes for many videos at once, given either as a list of YouTube URLs or as a playlist URL.
+    """
+    urls = serializers.ListField(child=serializers.URLField(), required=False, allow_empty=False, max_length=settings.QUIZLY_BATCH_MAX_VIDEOS)
+    playlist_url = serializers.URLField(required=False)
+    mode = serializers.ChoiceField(choices=PipelineRun.MODE_CHOICES, required=False, default=None, allow_null=True)
+
+    def validate(self, data):
+        if ('urls' in data) == ('playlist_url' in data):
+            raise serializers.ValidationError('Provide either urls or playlist_url.')
+        return data
+
+
+class QuizBatchItemSerializer(serializers.ModelSerializer):
+    """
+    Serializer for one video of a batch, the background job that generates its quiz.
+    """
+    class Meta:
+        model = QuizJob
+        fields = ['id', 'video_url', 'status', 'stage', 'error', 'quiz', 'started_at', 'finished_at']
+
+
+class QuizBatchSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a quiz batch with the overall status, the progress counters and the state of every item.
+    Expects the jobs of the batch to be prefetched.
+    """
+    status = serializers.SerializerMethodField()
+    progress = serializers.SerializerMethodField()
+    items = QuizBatchItemSerializer(source='jobs', many=True, read_only=True)
+
+    class Meta:
+        model = QuizBatch
+        fields = ['id', 'source_url', 'title', 'mode', 'status', 'progress', 'created_at', 'updated_at', 'finished_at', 'items']
+
+    def get_progress(self, obj):
+        progress = {'total': 0, **{status: 0 for status, _ in QuizJob.STATUS_CHOICES}}
+        for job in obj.jobs.all():
+            progress['total'] += 1
+            progress[job.status] += 1
+        return progress
+
+    def get_status(self, obj):
+        progress = self.get_progress(obj)
+        if progress[QuizJob.STATUS_PENDING] or progress[QuizJob.STATUS_RUNNING] or obj.finished_at is None:
+            return 'running'
+        if not progress[QuizJob.STATUS_FAILED]:
+            return 'succeeded'
+        return 'failed' if not progress[QuizJob.STATUS_SUCCEEDED] else 'partial'
+
+
+class QuizDataQuestionSerializer(serializers.Serializer):
+    """
+    Schema of one question in the quiz JSON produced by Gemini or sent to the import endpoint.
+    """
+    question_title = serializers.CharField(max_length=500)
+    question_options = serializers.ListField(child=serializers.CharField(max_length=500), min_length=2)
+    answer = serializers.CharField(max_length=255)
+
+    def validate(self, data):
+        if data['answer'] not in data['question_options']:
+            raise serializers.ValidationError({'answer': 'The answer must be one of the question options.'})
+        return data
+
+
+class QuizDataSerializer(serializers.Serializer):
+    """
+    Schema of a whole quiz JSON structure, validated before anything is written to the database.
+    """
+    title = serializers.CharField(max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True, default=None)
+    questions = QuizDataQuestionSerializer(many=True, allow_empty=False)
+
+
+class QuizImportItemSerializer(QuizDataSerializer):
+    """
+    Serializer for one quiz of a bulk import, a quiz JSON structure together with its video URL.
+    """
+    video_url = serializers.URLField()
+
+
+class QuizImportSerializer(serializers.Serializer):
+    """
+    Serializer for importing many quizzes at once.
+    """
+    quizzes = QuizImportItemSerializer(many=True, allow_empty=False, max_length=settings.QUIZLY_IMPORT_MAX_QUIZZES)
+
+
+class QuizRegenerateSerializer(serializers.Serializer):
+    """
+    Serializer for regenerating a quiz from its stored transcript with another question count or difficulty.
+    """
+    question_count = serializers.IntegerField(min_value=1, max_value=settings.QUIZLY_MAX_QUESTION_COUNT, required=False)
+    difficulty = serializers.ChoiceField(choices=list(DIFFICULTY_INSTRUCTIONS), required=False)
@@ -0,0 +1,217 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .exceptions import PipelineError
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class CoalescedCallCancelledError(PipelineError):
+    """
+    Raised in callers that waited for a call whose first caller was cancelled, for example by a client that went
+    away, before it finished.
+    """
+    status_code = 503
+
+
+# Seconds between two attempts of an async caller to take the file lock of a key held by another process
+LOCK_POLL_INTERVAL = 0.05
+CANCELLED_MESSAGE = 'The quiz generation for this video was cancelled. Please try again.'
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key, so only the first caller does the work and all others
+    wait for its result. Threads of one process wait on an in-process event, processes on one host wait on
+    a file lock per key and read the JSON result the first process left in `lock_dir`.
+    """
+    def __init__(self, lock_dir, result_ttl):
+        self.lock_dir = lock_dir
+        self.result_ttl = result_ttl
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = {}
+
+    def _result_path(self, key):
+        return os.path.join(self.lock_dir, f'{key}.json')
+
+    def _read_result(self, key):
+        path = self._result_path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.result_ttl:
+                os.remove(path)
+                return None
+            with open(path) as result_file:
+                return json.load(result_file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_result(self, key, result):
+        path = self._result_path(key)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w') as result_file:
+            json.dump(result, result_file)
+        os.replace(temp_path, path)
+
+    @contextmanager
+    def _file_lock(self, key):
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.lock_dir, exist_ok=True)
+        with open(os.path.join(self.lock_dir, f'{key}.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _run_locked(self, key, fn):
+        with self._file_lock(key):
+            result = self._read_result(key)
+            if result is None:
+                result = fn()
+                self._write_result(key, result)
+            return result
+
+    def do(self, key, fn):
+        """
+        Returns `fn()` for the first caller of a key and the same result for every caller that arrives while
+        it runs. Errors of the first caller are raised in all waiting callers, if the first caller is interrupted they get
+        `CoalescedCallCancelledError`. Calls without a key are not coalesced.
+        """
+        if not key:
+            return fn()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = self._run_locked(key, fn)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        except BaseException:
+            call.error = CoalescedCallCancelledError(CANCELLED_MESSAGE)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def stream(self, key, generator_fn):
+        """
+        Streaming variant of `do` for generators, used with `yield from`. The first caller of a key gets the items of
+        `generator_fn()` and its return value, callers of `do` and `stream` that arrive meanwhile wait for that return
+        value and get no items. If the first caller stops consuming, the waiting callers get `CoalescedCallCancelledError`.
+        """
+        if not key:
+            return (yield from generator_fn())
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            with self._file_lock(key):
+                result = self._read_result(key)
+                if result is None:
+                    result = yield from generator_fn()
+                    self._write_result(key, result)
+            call.result = result
+            return result
+        except Exception as e:
+            call.error = e
+            raise
+        except BaseException:
+            call.error = CoalescedCallCancelledError(CANCELLED_MESSAGE)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    async def ado(self, key, coroutine_fn):
+        """
+        Asynchronous variant of `do` for coroutines. Callers on the same event loop share one future, the file lock
+        for other processes is polled without blocking, so the event loop never waits on it. If the first caller is
+        cancelled, the waiting callers get `CoalescedCallCancelledError`.
+        """
+        if not key:
+            return await coroutine_fn()
+        loop = asyncio.get_running_loop()
+        future = self._async_calls.get((loop, key))
+        if future is not None:
+            return await asyncio.shield(future)
+        future = self._async_calls[(loop, key)] = loop.create_future()
+        try:
+            result = await self._arun_locked(key, coroutine_fn)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        except BaseException:
+            future.set_exception(CoalescedCallCancelledError(CANCELLED_MESSAGE))
+            future.exception()
+            raise
+        finally:
+            del self._async_calls[(loop, key)]
+
+    async def _aflock(self, lock_file):
+        """
+        Takes the file lock with non-blocking attempts and `asyncio.sleep` in between. Nothing holds the descriptor
+        outside this coroutine, so a cancelled caller can close it right away.
+        """
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                await asyncio.sleep(LOCK_POLL_INTERVAL)
+
+    async def _arun_locked(self, key, coroutine_fn):
+        if fcntl is None:
+            return await coroutine_fn()
+        os.makedirs(self.lock_dir, exist_ok=True)
+        with open(os.path.join(self.lock_dir, f'{key}.lock'), 'a') as lock_file:
+            await self._aflock(lock_file)
+            try:
+                result = self._read_result(key)
+                if result is None:
+                    result = await coroutine_fn()
+                    self._write_result(key, result)
+                return result
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+single_flight = SingleFlight(lock_dir=settings.QUIZLY_SINGLEFLIGHT_DIR, result_ttl=settings.QUIZLY_SINGLEFLIGHT_RESULT_TTL)
@@ -0,0 +1,109 @@
+import json
+from itertools import chain
+
+from django.conf import settings
+
+from .gemini import get_client
+from .generation import JSON_CONFIG, build_quiz_prompt, parse_model_json
+from .scheduler import model_scheduler, estimate_text_tokens
+from .usage import record_usage
+
+META_KEYS = ('title', 'description')
+
+
+class IncrementalQuizParser:
+    """
+    Parses the quiz JSON while it is still being generated. `feed` takes the next piece of text and returns the
+    events that became complete with it: ('title', str), ('description', str) and ('question', dict) for every
+    object of the `questions` array as soon as its closing brace arrives.
+    """
+    def __init__(self):
+        self.buffer = ''
+        self.position = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.expect_key = False
+        self.key = None
+        self.array_key = None
+        self.object_start = None
+
+    def _string_finished(self, events):
+        value = json.loads(self.buffer[self.string_start:self.position + 1])
+        if self.depth != 1:
+            return
+        if self.expect_key:
+            self.key = value
+        elif self.key in META_KEYS:
+            events.append((self.key, value))
+
+    def feed(self, text):
+        self.buffer += text
+        events = []
+        while self.position < len(self.buffer):
+            char = self.buffer[self.position]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    self._string_finished(events)
+            elif char == '"':
+                self.in_string = True
+                self.string_start = self.position
+            elif char in '{[':
+                self.depth += 1
+                if self.depth == 1:
+                    self.expect_key = True
+                elif self.depth == 2 and char == '[':
+                    self.array_key = self.key
+                elif self.depth == 3 and char == '{' and self.array_key == 'questions':
+                    self.object_start = self.position
+            elif char in '}]':
+                if self.depth == 3 and char == '}' and self.object_start is not None:
+                    events.append(('question', parse_model_json(self.buffer[self.object_start:self.position + 1])))
+                    self.object_start = None
+                self.depth -= 1
+                if self.depth == 1:
+                    self.array_key = None
+            elif self.depth == 1 and char == ',':
+                self.expect_key = True
+            elif self.depth == 1 and char == ':':
+                self.expect_key = False
+            self.position += 1
+        return events
+
+
+def _start_stream(prompt):
+    """
+    Opens the streaming generation and waits for its first chunk, so rate limits and server errors that happen
+    before any text arrived are retried by the model scheduler.
+    """
+    stream = iter(get_client().models.generate_content_stream(model=settings.QUIZLY_GEMINI_MODEL, contents=prompt, config=JSON_CONFIG))
+    return next(stream, None), stream
+
+
+def stream_quiz_from_text(text, question_count=None):
+    """
+    Streams the quiz generation for a transcript and yields the parser events of `IncrementalQuizParser`
+    while the answer arrives. The complete quiz JSON is yielded last as ('quiz', dict), a truncated or malformed answer
+    raises `InvalidQuizDataError` instead. The token usage is
+    recorded from the last chunk, which carries the totals of the whole answer.
+    """
+    question_count = question_count or settings.QUIZLY_QUESTION_COUNT
+    prompt = build_quiz_prompt(text, question_count)
+    first_chunk, stream = model_scheduler.call(lambda: _start_stream(prompt), tokens=estimate_text_tokens(prompt), streamed=True)
+    parser = IncrementalQuizParser()
+    chunks = [first_chunk] if first_chunk is not None else []
+    last_chunk = first_chunk
+    try:
+        for chunk in chain(chunks, stream):
+            last_chunk = chunk
+            if chunk.text:
+                yield from parser.feed(chunk.text)
+    finally:
+        record_usage(last_chunk)
+    yield 'quiz', parse_model_json(parser.buffer)
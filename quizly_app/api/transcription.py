@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import os
+import subprocess
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from asgiref.sync import sync_to_async
+
+from .gemini import get_client
+from .scheduler import model_scheduler, LANE_BULK
+from .instrumentation import timed, count_bytes
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPTION_PROMPT = 'Transkribiere die folgende Audiodatei ins Deutsche: '
+TRANSCRIPTION_BACKENDS = {
+    'gemini': 'quizly_app.api.transcription.GeminiTranscriptionBackend',
+    'whisper': 'quizly_app.api.transcription.WhisperTranscriptionBackend',
+    'whispercpp': 'quizly_app.api.transcription.WhisperCppTranscriptionBackend',
+}
+
+AUDIO_MIME_TYPES = {
+    '.opus': 'audio/ogg',
+    '.ogg': 'audio/ogg',
+    '.flac': 'audio/flac',
+    '.mp3': 'audio/mp3',
+    '.wav': 'audio/wav',
+    '.m4a': 'audio/aac',
+    '.aac': 'audio/aac',
+}
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def guess_audio_mime_type(file_path):
+    return AUDIO_MIME_TYPES.get(os.path.splitext(file_path)[1].lower(), 'audio/ogg')
+
+
+def estimate_audio_tokens(file_path):
+    """
+    Estimates the input tokens of an audio file from its size and the audio profile bitrate. Gemini counts
+    32 tokens per second of audio.
+    """
+    seconds = os.path.getsize(file_path) / (int(settings.QUIZLY_AUDIO_BITRATE) * 125)
+    return int(seconds * 32) + settings.QUIZLY_GEMINI_OUTPUT_TOKEN_ESTIMATE
+
+
+@timed('upload')
+def upload_audio(client, file_path):
+    """
+    Uploads an audio file through the Gemini Files API, which streams it from disk in chunks, and waits until
+    Gemini has processed it.
+    """
+    count_bytes('upload', os.path.getsize(file_path))
+    uploaded = client.files.upload(file=file_path, config={'mime_type': guess_audio_mime_type(file_path)})
+    while uploaded.state and uploaded.state.name == 'PROCESSING':
+        time.sleep(1)
+        uploaded = client.files.get(name=uploaded.name)
+    return uploaded
+
+
+@timed('upload')
+async def aupload_audio(client, file_path):
+    """
+    Asynchronous variant of `upload_audio`.
+    """
+    count_bytes('upload', os.path.getsize(file_path))
+    uploaded = await client.aio.files.upload(file=file_path, config={'mime_type': guess_audio_mime_type(file_path)})
+    while uploaded.state and uploaded.state.name == 'PROCESSING':
+        await asyncio.sleep(1)
+        uploaded = await client.aio.files.get(name=uploaded.name)
+    return uploaded
+
+
+def delete_uploaded_file(client, uploaded):
+    """
+    Deletes an uploaded file from the Gemini Files API. A failed delete is only logged, so it never replaces the
+    result or the error of the call that used the file. Gemini removes uploads after 48 hours anyway.
+    """
+    try:
+        client.files.delete(name=uploaded.name)
+    except Exception:
+        logger.warning('Deleting the uploaded file %s failed', uploaded.name, exc_info=True)
+
+
+async def adelete_uploaded_file(client, uploaded):
+    """
+    Asynchronous variant of `delete_uploaded_file`.
+    """
+    try:
+        await client.aio.files.delete(name=uploaded.name)
+    except Exception:
+        logger.warning('Deleting the uploaded file %s failed', uploaded.name, exc_info=True)
+
+
+def load_model_once(key, loader):
+    """
+    Returns the model stored under `key`, loading it with `loader` on first use. Models stay resident for the
+    lifetime of the worker process and are shared by all requests.
+    """
+    with _models_lock:
+        if key not in _models:
+            _models[key] = (loader(), threading.Lock())
+        return _models[key]
+
+
+class TranscriptionBackend:
+    """
+    Base class of the transcription backends. Subclasses turn an audio file into transcript text.
+    Backends with `parallel_chunks` get long audio split into segments that are transcribed concurrently.
+    """
+    parallel_chunks = False
+
+    def transcribe(self, file_path):
+        raise NotImplementedError
+
+    async def atranscribe(self, file_path):
+        """
+        Asynchronous variant of `transcribe`. Backends without native async support run in a worker thread.
+        """
+        return await sync_to_async(self.transcribe, thread_sensitive=False)(file_path)
+
+
+class GeminiTranscriptionBackend(TranscriptionBackend):
+    """
+    Transcribes audio by sending it to Gemini. The file goes through the Files API, which streams it from disk
+    in chunks, so the audio is never held in memory as a whole. Calls run in the bulk lane of the model scheduler.
+    """
+    parallel_chunks = True
+
+    def transcribe(self, file_path):
+        client = get_client()
+        uploaded = upload_audio(client, file_path)
+        try:
+            response = model_scheduler.call(lambda: client.models.generate_content(model=settings.QUIZLY_GEMINI_MODEL, contents=[TRANSCRIPTION_PROMPT, uploaded]),
+                                            tokens=estimate_audio_tokens(file_path), lane=LANE_BULK)
+        finally:
+            delete_uploaded_file(client, uploaded)
+        return response.text
+
+    async def atranscribe(self, file_path):
+        client = get_client()
+        uploaded = await aupload_audio(client, file_path)
+        try:
+            response = await model_scheduler.acall(lambda: client.aio.models.generate_content(model=settings.QUIZLY_GEMINI_MODEL, contents=[TRANSCRIPTION_PROMPT, uploaded]),
+                                                   tokens=estimate_audio_tokens(file_path), lane=LANE_BULK)
+        finally:
+            await adelete_uploaded_file(client, uploaded)
+        return response.text
+
+
+class WhisperTranscriptionBackend(TranscriptionBackend):
+    """
+    Transcribes audio locally with openai-whisper. On CPU-only nodes the model can be quantized to int8
+    with `QUIZLY_WHISPER_INT8`, which makes inference noticeably faster at a small accuracy cost.
+    """
+    def load_model(self):
+        try:
+            import torch
+            import whisper
+        except ImportError:
+            raise ImproperlyConfigured('The whisper transcription backend requires the openai-whisper package.')
+        device = settings.QUIZLY_WHISPER_DEVICE or ('cuda' if torch.cuda.is_available() else 'cpu')
+        model = whisper.load_model(settings.QUIZLY_WHISPER_MODEL, device=device)
+        if settings.QUIZLY_WHISPER_INT8 and device == 'cpu':
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+    def transcribe(self, file_path):
+        model, lock = load_model_once(('whisper', settings.QUIZLY_WHISPER_MODEL, settings.QUIZLY_WHISPER_INT8), self.load_model)
+        with lock:
+            result = model.transcribe(file_path, language=settings.QUIZLY_TRANSCRIPTION_LANGUAGE, fp16=next(model.parameters()).is_cuda)
+        return result['text'].strip()
+
+
+class WhisperCppTranscriptionBackend(TranscriptionBackend):
+    """
+    Transcribes audio locally with whisper.cpp, which runs small models fast on CPU-only nodes.
+    whisper.cpp reads 16 kHz mono WAV files, so other formats are converted with FFmpeg first.
+    """
+    def load_model(self):
+        try:
+            from whispercpp import Whisper
+        except ImportError:
+            raise ImproperlyConfigured('The whispercpp transcription backend requires the whispercpp package.')
+        return Whisper.from_pretrained(settings.QUIZLY_WHISPER_MODEL)
+
+    def to_wav(self, file_path):
+        if file_path.endswith('.wav'):
+            return file_path
+        wav_path = os.path.splitext(file_path)[0] + '.wav'
+        subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-i', file_path, '-ar', '16000', '-ac', '1', '-c:a', 'pcm_s16le', wav_path], check=True)
+        return wav_path
+
+    def transcribe(self, file_path):
+        model, lock = load_model_once(('whispercpp', settings.QUIZLY_WHISPER_MODEL), self.load_model)
+        wav_path = self.to_wav(file_path)
+        with lock:
+            return model.transcribe_from_file(wav_path).strip()
+
+
+@lru_cache(maxsize=None)
+def get_transcription_backend(name=None):
+    """
+    Returns the transcription backend selected by `QUIZLY_TRANSCRIPTION_BACKEND`, either one of the names
+    `gemini`, `whisper` and `whispercpp` or the dotted path of a `TranscriptionBackend` subclass.
+    """
+    name = name or settings.QUIZLY_TRANSCRIPTION_BACKEND
+    return import_string(TRANSCRIPTION_BACKENDS.get(name, name))()
@@ -1,8 +1,18 @@
 from django.urls import path
-from .views import CreateQuizFromYoutubeView, QuizListView, QuizDetailView
+from .views import CreateQuizFromYoutubeView, AsyncCreateQuizFromYoutubeView, CreateQuizStreamView, CreateQuizBatchView, QuizListView, QuizSearchView, QuizDetailView, QuizImportView, QuizRegenerateView, QuizJobDetailView, QuizBatchDetailView, PipelineStatsView, MetricsView
 
 urlpatterns = [
     path('createQuiz/', CreateQuizFromYoutubeView.as_view(), name='create-quiz'),
+    path('createQuiz/async/', AsyncCreateQuizFromYoutubeView.as_view(), name='create-quiz-async'),
+    path('createQuiz/stream/', CreateQuizStreamView.as_view(), name='create-quiz-stream'),
+    path('createQuiz/batch/', CreateQuizBatchView.as_view(), name='create-quiz-batch'),
     path('quizzes/', QuizListView.as_view(), name='quiz-list'),
-    path('quizzes/<int:pk>/', QuizDetailView.as_view(), name='quiz-detail')
+    path('quizzes/import/', QuizImportView.as_view(), name='quiz-import'),
+    path('quizzes/search/', QuizSearchView.as_view(), name='quiz-search'),
+    path('quizzes/<int:pk>/', QuizDetailView.as_view(), name='quiz-detail'),
+    path('quizzes/<int:pk>/regenerate/', QuizRegenerateView.as_view(), name='quiz-regenerate'),
+    path('jobs/<int:pk>/', QuizJobDetailView.as_view(), name='quiz-job-detail'),
+    path('batches/<int:pk>/', QuizBatchDetailView.as_view(), name='quiz-batch-detail'),
+    path('pipeline/stats/', PipelineStatsView.as_view(), name='pipeline-stats'),
+    path('metrics/', MetricsView.as_view(), name='metrics')
 ]
\ No newline at end of file
@@ -0,0 +1,104 @@
+import contextvars
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.db.models import Avg, Count, Q, Sum
+
+from quizly_app.models import PipelineRun
+from .instrumentation import count_model_usage
+
+_current_tally = contextvars.ContextVar('quizly_usage_tally', default=None)
+
+
+class UsageTally:
+    """
+    Sums the Gemini calls and the token counts of their `usage_metadata` for one pipeline run.
+    Calls of worker threads are added concurrently, so the counters are guarded by a lock.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.model_calls = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.total_tokens = 0
+
+    def add(self, usage_metadata):
+        with self._lock:
+            self.model_calls += 1
+            if usage_metadata is None:
+                return
+            self.prompt_tokens += usage_metadata.prompt_token_count or 0
+            self.output_tokens += (usage_metadata.candidates_token_count or 0) + (usage_metadata.thoughts_token_count or 0)
+            self.total_tokens += usage_metadata.total_token_count or 0
+
+
+def record_usage(response):
+    """
+    Adds a model response to the token counters and to the tally of the current pipeline run, if there is one.
+    """
+    usage_metadata = getattr(response, 'usage_metadata', None)
+    count_model_usage(usage_metadata)
+    tally = _current_tally.get()
+    if tally is not None:
+        tally.add(usage_metadata)
+
+
+def _create_run(mode, video_id, started, succeeded, tally):
+    return PipelineRun.objects.create(mode=mode, video_id=video_id, succeeded=succeeded, latency_seconds=time.monotonic() - started,
+                                      model_calls=tally.model_calls, prompt_tokens=tally.prompt_tokens,
+                                      output_tokens=tally.output_tokens, total_tokens=tally.total_tokens)
+
+
+@contextmanager
+def record_pipeline_run(mode, video_id):
+    """
+    Measures the latency and the model usage of the enclosed pipeline work and stores them as a `PipelineRun`,
+    also when the work fails.
+    """
+    started = time.monotonic()
+    tally = UsageTally()
+    token = _current_tally.set(tally)
+    succeeded = False
+    try:
+        yield tally
+        succeeded = True
+    finally:
+        _current_tally.reset(token)
+        _create_run(mode, video_id, started, succeeded, tally)
+
+
+@asynccontextmanager
+async def arecord_pipeline_run(mode, video_id):
+    """
+    Asynchronous variant of `record_pipeline_run`.
+    """
+    started = time.monotonic()
+    tally = UsageTally()
+    token = _current_tally.set(tally)
+    succeeded = False
+    try:
+        yield tally
+        succeeded = True
+    finally:
+        _current_tally.reset(token)
+        await sync_to_async(_create_run)(mode, video_id, started, succeeded, tally)
+
+
+def pipeline_run_stats():
+    """
+    Returns per pipeline mode the number of runs and failures and, over the successful runs that called Gemini,
+    the average latency, calls and tokens. Runs served from the caches are left out of the averages.
+    """
+    rows = PipelineRun.objects.values('mode').annotate(
+        runs=Count('id'),
+        failures=Count('id', filter=Q(succeeded=False)),
+        generated=Count('id', filter=Q(succeeded=True, model_calls__gt=0)),
+        avg_latency_seconds=Avg('latency_seconds', filter=Q(succeeded=True, model_calls__gt=0)),
+        avg_model_calls=Avg('model_calls', filter=Q(succeeded=True, model_calls__gt=0)),
+        avg_prompt_tokens=Avg('prompt_tokens', filter=Q(succeeded=True, model_calls__gt=0)),
+        avg_output_tokens=Avg('output_tokens', filter=Q(succeeded=True, model_calls__gt=0)),
+        total_tokens=Sum('total_tokens'),
+    ).order_by('mode')
+    return {row.pop('mode'): row for row in rows}
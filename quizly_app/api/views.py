@@ -1,12 +1,43 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions, generics
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 
-from quizly_app.models import Quiz
-from .serializers import QuizSerializer, QuizCreateSerializer
-from .quiz_logic import create_quiz_pipeline
-from .permissions import IsOwnerAndAuthenticated
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Max, Prefetch
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer, BrowsableAPIRenderer
+from django_filters.rest_framework import DjangoFilterBackend
+
+
+from quizly_app.models import Quiz, Question, QuizBatch, QuizJob
+from .serializers import QuizSerializer, QuestionSerializer, QuizCreateSerializer, QuizJobSerializer, QuizImportSerializer, QuizRegenerateSerializer, QuizBatchCreateSerializer, QuizBatchSerializer
+from .quiz_logic import create_quiz_pipeline, acreate_quiz_pipeline, stream_quiz_pipeline, save_quizzes_bulk, regenerate_quiz
+from .renderers import EventStreamRenderer, FastJSONRenderer, format_server_sent_event
+from .readers import DETAIL_FIELDS, LIST_FIELDS, query_fields, quiz_dicts, select_fields
+from .response_cache import build_etag, conditional_cached_response, response_cache
+from .authentication import CookieJWTAuthentication
+from .probe import probe_video, expand_playlist
+from .jobs import submit_quiz_job
+from .batches import batch_runner, create_quiz_batch
+from .pipeline_cache import pipeline_cache
+from .scratch import scratch_space
+from .scheduler import model_scheduler
+from .usage import pipeline_run_stats
+from .permissions import IsOwnerAndAuthenticated, HasMetricsToken
+from .search import get_search_backend
+from .instrumentation import registry
+from .pagination import QuizCursorPagination, QuizSearchPagination
+from .filters import QuizFilter
 
 
 class CreateQuizFromYoutubeView(APIView):
@@ -17,32 +48,322 @@ class CreateQuizFromYoutubeView(APIView):
     def post(self, request):
         """
         This function handles the creation of a quiz using a YouTube URL input and returns
-        appropriate responses based on the outcome.
+        appropriate responses based on the outcome. With `background` set, the quiz is generated
+        by the job worker pool and a 202 response with the job id is returned right away.
+        Videos rejected by the metadata probe are answered with a 4xx before anything is downloaded.
         """
         serializer = QuizCreateSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         youtube_url = serializer.validated_data["url"]
+        background = serializer.validated_data.get("background")
+        mode = serializer.validated_data.get("mode")
+        if background is None:
+            background = settings.QUIZLY_BACKGROUND_JOBS_DEFAULT
         try:
-            quiz = create_quiz_pipeline(user=request.user, youtube_url=youtube_url)
+            video_info = probe_video(youtube_url)
+            if background:
+                return self.submit_job(request, youtube_url, video_info, mode)
+            quiz = create_quiz_pipeline(user=request.user, youtube_url=youtube_url, video_info=video_info, mode=mode)
             return Response(QuizSerializer(quiz).data, status=status.HTTP_201_CREATED)
         except RuntimeError as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({"error": str(e)}, status=getattr(e, "status_code", status.HTTP_400_BAD_REQUEST))
+
+    def submit_job(self, request, youtube_url, video_info, mode=None):
+        """
+        This function persists a background quiz job and returns its id together with the URL to poll for its status.
+        """
+        job = submit_quiz_job(user=request.user, youtube_url=youtube_url, video_info=video_info, mode=mode)
+        status_url = reverse('quiz-job-detail', kwargs={'pk': job.pk})
+        return Response({"job_id": job.pk, "status": job.status, "status_url": status_url}, status=status.HTTP_202_ACCEPTED, headers={"Location": status_url})
+
+
+class CreateQuizBatchView(APIView):
+    """
+    This class defines a view that creates quizzes for a list of YouTube URLs or for the videos of a YouTube playlist in the background.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        This function expands a playlist through its yt-dlp metadata, persists a batch with one job per video and returns
+        its id together with the URL to poll for the progress of the batch.
+        """
+        serializer = QuizBatchCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        playlist_url = serializer.validated_data.get("playlist_url")
+        title = None
+        try:
+            if playlist_url:
+                title, urls = expand_playlist(playlist_url, settings.QUIZLY_BATCH_MAX_VIDEOS)
+            else:
+                urls = serializer.validated_data["urls"]
+        except RuntimeError as e:
+            return Response({"error": str(e)}, status=getattr(e, "status_code", status.HTTP_400_BAD_REQUEST))
+        batch = create_quiz_batch(request.user, urls, source_url=playlist_url, title=title, mode=serializer.validated_data.get("mode"))
+        status_url = reverse('quiz-batch-detail', kwargs={'pk': batch.pk})
+        return Response({"batch_id": batch.pk, "title": title, "total": batch.jobs.count(), "status_url": status_url},
+                        status=status.HTTP_202_ACCEPTED, headers={"Location": status_url})
+
+
+class CreateQuizStreamView(APIView):
+    """
+    This class defines a view that creates a quiz from a YouTube video URL and streams the progress as Server-Sent Events.
+    Every question is sent as soon as it is generated and saved, long before the whole quiz is finished.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    def post(self, request):
+        """
+        This function validates the URL and probes the video, then returns a `text/event-stream` response with the events
+        `stage`, `quiz`, `question`, `done` and, if the generation fails, `error`.
+        """
+        serializer = QuizCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        youtube_url = serializer.validated_data["url"]
+        try:
+            video_info = probe_video(youtube_url)
+        except RuntimeError as e:
+            return Response({"error": str(e)}, status=getattr(e, "status_code", status.HTTP_400_BAD_REQUEST))
+        response = StreamingHttpResponse(self.stream_events(request.user, youtube_url, video_info), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def stream_events(self, user, youtube_url, video_info):
+        """
+        This function turns the events of the streaming pipeline into Server-Sent Events.
+        """
+        try:
+            for event, value in stream_quiz_pipeline(user, youtube_url, video_info=video_info):
+                if event == 'stage':
+                    data = {"stage": value}
+                elif event == 'quiz':
+                    data = {"id": value.id, "title": value.title, "description": value.description, "video_url": value.video_url}
+                elif event == 'question':
+                    data = QuestionSerializer(value).data
+                else:
+                    data = QuizSerializer(value).data
+                yield format_server_sent_event(event, data)
+        except Exception as e:
+            yield format_server_sent_event('error', {"error": str(e)})
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncCreateQuizFromYoutubeView(View):
+    """
+    This class defines an asynchronous variant of `CreateQuizFromYoutubeView` for ASGI deployments. While the pipeline
+    waits for YouTube and Gemini the event loop serves other requests, so one worker can hold many generations in flight.
+    """
+    async def post(self, request):
+        """
+        This function authenticates the request with the access token cookie, validates the YouTube URL and awaits the
+        asynchronous quiz pipeline.
+        """
+        try:
+            auth = await sync_to_async(CookieJWTAuthentication().authenticate)(request)
+        except AuthenticationFailed as e:
+            return JsonResponse({"detail": str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+        if auth is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+        user = auth[0]
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({"error": "Invalid JSON body."}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = QuizCreateSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        youtube_url = serializer.validated_data["url"]
+        try:
+            video_info = await sync_to_async(probe_video, thread_sensitive=False)(youtube_url)
+            quiz = await acreate_quiz_pipeline(user=user, youtube_url=youtube_url, video_info=video_info, mode=serializer.validated_data.get("mode"))
+        except RuntimeError as e:
+            return JsonResponse({"error": str(e)}, status=getattr(e, "status_code", status.HTTP_400_BAD_REQUEST))
+        data = await sync_to_async(lambda: QuizSerializer(quiz).data)()
+        return JsonResponse(data, status=status.HTTP_201_CREATED)
+
+
+def quiz_queryset():
+    """
+    Returns the quiz queryset with all questions loaded in one additional query, ordered by the (quiz, id) index.
+    """
+    return Quiz.objects.prefetch_related(Prefetch('questions', queryset=Question.objects.order_by('id')))
 
 
 class QuizListView(generics.ListAPIView):
     """
-    This class defines a view that lists all quizzes.
+    This class defines a view that lists the quizzes of the authenticated user, newest first and paginated with a cursor.
+    The page is read with `values()` and rendered from plain dicts in the shape of `QuizSerializer`. By default only
+    id, title and created_at are returned, `?fields=` selects other fields and `?expand=questions` adds the questions.
     """
-    queryset = Quiz.objects.all()
     serializer_class = QuizSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = QuizCursorPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = QuizFilter
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def get_queryset(self):
+        return Quiz.objects.filter(owner=self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        """
+        This function answers with 304 when the quizzes of the user did not change since the client's ETag and serves
+        unchanged pages from the response cache. The ETag covers the newest `updated_at` and the number of quizzes,
+        question changes touch `updated_at` of their quiz.
+        """
+        fields, include_questions = select_fields(request.query_params, LIST_FIELDS)
+        state = Quiz.objects.filter(owner=request.user).aggregate(updated_at=Max('updated_at'), count=Count('id'))
+        etag = build_etag('quizzes', request.user.pk, state['updated_at'], state['count'], request.get_full_path(), request.accepted_media_type)
+
+        def build():
+            queryset = self.filter_queryset(self.get_queryset()).values(*query_fields(fields, required=('id', 'created_at')))
+            rows = self.paginate_queryset(queryset)
+            return self.get_paginated_response(quiz_dicts(rows, fields, include_questions)).data
+
+        return conditional_cached_response(request, etag, [f'owner:{request.user.pk}'], build)
+
+
+class QuizSearchView(APIView):
+    """
+    This class defines a view that searches the title, description, questions and answer options of the authenticated
+    user's quizzes for the words of `?q=`, best match first. The last word also matches as prefix. `?fields=`,
+    `?expand=questions` and the default fields work like on the quiz list, results are paginated with `?page=`.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def get(self, request):
+        """
+        This function asks the search backend for one page of quiz ids and reads those quizzes with `values()`,
+        in the order of the ranking.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"error": "The query parameter q is required."}, status=status.HTTP_400_BAD_REQUEST)
+        fields, include_questions = select_fields(request.query_params, LIST_FIELDS)
+        paginator = QuizSearchPagination()
+        quiz_ids = paginator.paginate_search(request, lambda offset, limit: get_search_backend().search(request.user.pk, query, offset, limit))
+        rows = {row['id']: row for row in Quiz.objects.filter(pk__in=quiz_ids, owner=request.user).values(*query_fields(fields))}
+        ranked = [rows[quiz_id] for quiz_id in quiz_ids if quiz_id in rows]
+        return paginator.get_paginated_response(quiz_dicts(ranked, fields, include_questions))
 
 
 class QuizDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
     This class defines a view that retrieves, updates, or deletes a specific quiz. Only the authenticated owner can perform these actions.
     """
-    queryset = Quiz.objects.all()
     serializer_class = QuizSerializer
-    permission_classes = [IsOwnerAndAuthenticated]
\ No newline at end of file
+    permission_classes = [IsOwnerAndAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def get_queryset(self):
+        return quiz_queryset()
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        This function reads the quiz with `values()` and returns it rendered from plain dicts, updates and deletes
+        still go through the serializer. `?fields=` and `?expand=questions` work like on the quiz list, but the
+        full quiz with its questions is returned by default. ETag and Last-Modified are derived from `updated_at` of the
+        quiz and its questions, conditional requests for an unchanged quiz are answered with 304.
+        """
+        fields, include_questions = select_fields(request.query_params, DETAIL_FIELDS)
+        state = Quiz.objects.filter(pk=kwargs['pk']).values('id', 'owner_id', 'updated_at').annotate(
+            questions_updated_at=Max('questions__updated_at'), question_count=Count('questions')).first()
+        if state is None:
+            raise Http404
+        self.check_object_permissions(request, Quiz(pk=state['id'], owner_id=state['owner_id']))
+        last_modified = max(filter(None, [state['updated_at'], state['questions_updated_at']]))
+        etag = build_etag('quiz', state['id'], state['updated_at'], state['questions_updated_at'], state['question_count'],
+                          request.get_full_path(), request.accepted_media_type)
+
+        def build():
+            row = Quiz.objects.filter(pk=state['id']).values(*query_fields(fields)).first()
+            if row is None:
+                raise Http404
+            return quiz_dicts([row], fields, include_questions)[0]
+
+        return conditional_cached_response(request, etag, [f'quiz:{state["id"]}'], build, last_modified=last_modified)
+
+
+class QuizRegenerateView(APIView):
+    """
+    This class defines a view that rebuilds a quiz of the authenticated owner from the stored transcript of its video,
+    optionally with another question count or difficulty. Only one Gemini call is needed, nothing is downloaded or transcribed.
+    """
+    permission_classes = [IsOwnerAndAuthenticated]
+
+    def post(self, request, pk):
+        quiz = get_object_or_404(Quiz.objects.select_related('transcript'), pk=pk)
+        self.check_object_permissions(request, quiz)
+        serializer = QuizRegenerateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            quiz = regenerate_quiz(quiz, question_count=serializer.validated_data.get("question_count"), difficulty=serializer.validated_data.get("difficulty"))
+        except RuntimeError as e:
+            return Response({"error": str(e)}, status=getattr(e, "status_code", status.HTTP_400_BAD_REQUEST))
+        return Response(QuizSerializer(quiz_queryset().get(pk=quiz.pk)).data, status=status.HTTP_200_OK)
+
+
+class QuizImportView(APIView):
+    """
+    This class defines a view that imports many quizzes at once for the authenticated user. All quizzes are validated first
+    and then saved in one transaction, so either every quiz of the request is imported or none.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = QuizImportSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        quizzes = save_quizzes_bulk(request.user, serializer.validated_data["quizzes"])
+        created = Quiz.objects.filter(pk__in=[quiz.pk for quiz in quizzes]).prefetch_related('questions').order_by('pk')
+        return Response(QuizSerializer(created, many=True).data, status=status.HTTP_201_CREATED)
+
+
+class QuizJobDetailView(generics.RetrieveAPIView):
+    """
+    This class defines a view that returns the status, the current stage and the result of a background quiz job. Only the owner of the job can see it.
+    """
+    serializer_class = QuizJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return QuizJob.objects.filter(owner=self.request.user).select_related('quiz').prefetch_related('quiz__questions')
+
+
+class QuizBatchDetailView(generics.RetrieveAPIView):
+    """
+    This class defines a view that returns the status, the progress and the per-video results and errors of a quiz batch. Only the owner of the batch can see it.
+    """
+    serializer_class = QuizBatchSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return QuizBatch.objects.filter(owner=self.request.user).prefetch_related(Prefetch('jobs', queryset=QuizJob.objects.order_by('id')))
+
+
+class PipelineStatsView(APIView):
+    """
+    This class defines a view that exposes runtime statistics of the quiz pipeline like the cache hit and miss counters the scratch space usage, the Gemini scheduler queue, latency and token usage per pipeline mode and the batch queue. Only admin users can access it.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({"cache": pipeline_cache.stats(), "scratch": scratch_space.stats(), "scheduler": model_scheduler.stats(), "modes": pipeline_run_stats(),
+                         "responses": response_cache.stats(), "batches": batch_runner.stats()})
+
+
+class MetricsView(APIView):
+    """
+    This class defines a view that serves the stage and endpoint latency histograms and the byte and token counters of this process in the Prometheus text format. Scrapers authenticate with QUIZLY_METRICS_TOKEN.
+    """
+    permission_classes = [HasMetricsToken]
+
+    def get(self, request):
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
\ No newline at end of file
@@ -0,0 +1,107 @@
+import atexit
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from quizly_app.models import JobWorker
+
+logger = logging.getLogger(__name__)
+
+# Id of this process in the `worker` columns of jobs and batches. It is new on every start, so a restarted process
+# that got the hostname and pid of its predecessor is never mistaken for it.
+WORKER_ID = uuid.uuid4().hex
+
+
+def _pid_is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+class WorkerRegistry:
+    """
+    Registers this process in the `JobWorker` table and refreshes its heartbeat every `heartbeat_interval` seconds
+    from a daemon thread. A worker is live while its heartbeat is younger than `timeout`. Workers on this host whose
+    process is gone, or whose pid is now used by this process, are dead right away. Every heartbeat also runs the
+    registered reapers, which take over the jobs of dead workers.
+    """
+    def __init__(self, worker_id, heartbeat_interval, timeout):
+        self.worker_id = worker_id
+        self.heartbeat_interval = heartbeat_interval
+        self.timeout = timeout
+        self.hostname = socket.gethostname()
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._reapers = []
+
+    def add_reaper(self, fn):
+        self._reapers.append(fn)
+
+    def heartbeat(self):
+        JobWorker.objects.update_or_create(pk=self.worker_id, defaults={
+            'hostname': self.hostname, 'pid': self.pid, 'heartbeat_at': timezone.now()})
+
+    def start(self):
+        """
+        Registers this process and starts the heartbeat thread, once per process.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.heartbeat()
+            self._thread = threading.Thread(target=self._run, name='quizly-worker-heartbeat', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stopped.wait(self.heartbeat_interval):
+            try:
+                self.heartbeat()
+                if settings.QUIZLY_JOB_RESUME_ON_STARTUP:
+                    for reaper in self._reapers:
+                        reaper()
+            except Exception:
+                logger.exception('Worker heartbeat failed')
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        """
+        Stops the heartbeat and removes the registration, so other processes take over unfinished jobs immediately.
+        """
+        self._stopped.set()
+        try:
+            JobWorker.objects.filter(pk=self.worker_id).delete()
+        except Exception:
+            logger.exception('Removing worker %s failed', self.worker_id)
+
+    def is_dead(self, worker):
+        if worker.pk == self.worker_id:
+            return False
+        if worker.hostname == self.hostname and (worker.pid == self.pid or not _pid_is_alive(worker.pid)):
+            return True
+        return worker.heartbeat_at < timezone.now() - timedelta(seconds=self.timeout)
+
+    def live_worker_ids(self):
+        """
+        Returns the ids of all live workers, including this process.
+        """
+        workers = JobWorker.objects.all()
+        return {self.worker_id} | {worker.pk for worker in workers if not self.is_dead(worker)}
+
+
+worker_registry = WorkerRegistry(WORKER_ID, heartbeat_interval=settings.QUIZLY_WORKER_HEARTBEAT_INTERVAL,
+                                 timeout=settings.QUIZLY_WORKER_TIMEOUT)
@@ -1,6 +1,34 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
 
 
 class QuizlyAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'quizly_app'
+
+    def ready(self):
+        """
+        Connects the model signals and the search index updates, removes scratch files left behind by crashed processes and resumes interrupted
+        quiz jobs once the first request reaches this process, so management commands like `migrate` never touch the job queue.
+        """
+        from django.conf import settings
+        from quizly_app import signals  # noqa: F401
+        from quizly_app.api import search  # noqa: F401
+        from quizly_app.api.scratch import scratch_space
+        scratch_space.cleanup_stale()
+        if settings.QUIZLY_JOB_RESUME_ON_STARTUP:
+            request_started.connect(resume_jobs_on_first_request, dispatch_uid='quizly_resume_jobs')
+
+
+def resume_jobs_on_first_request(**kwargs):
+    """
+    Disconnects itself, registers this process as worker and re-queues unfinished quiz jobs and batches of
+    stopped processes. The worker heartbeat repeats the latter for processes that stop later.
+    """
+    from quizly_app.api.jobs import resume_unfinished_jobs
+    from quizly_app.api.batches import resume_unfinished_batches
+    from quizly_app.api.workers import worker_registry
+    request_started.disconnect(dispatch_uid='quizly_resume_jobs')
+    worker_registry.start()
+    resume_unfinished_jobs()
+    resume_unfinished_batches()
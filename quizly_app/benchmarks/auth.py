@@ -0,0 +1,61 @@
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from quizly_app.api import authentication
+from quizly_app.api.authentication import CookieJWTAuthentication, UserCache
+
+
+def measure_throughput(fn, requests):
+    """
+    Runs `fn` `requests` times and returns the calls per second and the database queries per call.
+    """
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        for _ in range(requests):
+            fn()
+        elapsed = time.perf_counter() - started
+    return requests / elapsed, len(queries) / requests
+
+
+def get_ok(client, path):
+    """
+    Requests `path` with the test client and raises `AssertionError` unless the view answered with 200, so error pages are never measured.
+    """
+    response = client.get(path)
+    assert response.status_code == 200, f'GET {path} was answered with {response.status_code}.'
+    return response
+
+
+def run_auth_benchmark(requests=2000, path='/api/quizzes/'):
+    """
+    Measures `CookieJWTAuthentication.authenticate` on its own and whole authenticated requests to `path`, once with
+    the user cache disabled and once enabled, on a temporary user that is rolled back afterwards. The test client's
+    host is allowed for the run.
+    """
+    results = []
+    original_cache = authentication.user_cache
+    try:
+        with override_settings(ALLOWED_HOSTS=['testserver']), transaction.atomic():
+            user = User.objects.create(username=f'benchmark-{uuid.uuid4().hex}')
+            token = str(AccessToken.for_user(user))
+            request = RequestFactory().get(path)
+            request.COOKIES['access_token'] = token
+            client = Client()
+            client.cookies['access_token'] = token
+            auth = CookieJWTAuthentication()
+            for label, cache in (('without cache', UserCache(max_entries=0, ttl=60)), ('with cache', UserCache(max_entries=1000, ttl=60))):
+                authentication.user_cache = cache
+                auth_rate, auth_queries = measure_throughput(lambda: auth.authenticate(request), requests)
+                request_rate, request_queries = measure_throughput(lambda: get_ok(client, path), max(1, requests // 10))
+                results.append({'mode': label, 'authenticate_per_second': round(auth_rate), 'authenticate_queries': round(auth_queries, 2),
+                                'requests_per_second': round(request_rate), 'request_queries': round(request_queries, 2)})
+            transaction.set_rollback(True)
+    finally:
+        authentication.user_cache = original_cache
+    return results
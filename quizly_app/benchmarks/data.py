@@ -0,0 +1,34 @@
+import random
+import uuid
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from quizly_app.models import Quiz, Question
+
+TOPICS = ('Photosynthese', 'Römisches Reich', 'Quantenmechanik', 'Kontinentaldrift', 'Impressionismus', 'Blockchain', 'Vulkanismus', 'Genetik')
+
+
+def generate_dataset(rows, users=10, questions_per_quiz=10, seed=0, batch_size=2000):
+    """
+    Creates synthetic users, quizzes and questions with about `rows` quiz and question rows in total, spread evenly
+    over `users` users. The content only depends on `seed`, so runs with the same arguments compare like with like.
+    Rows are written with batched bulk inserts in one transaction. Returns the created users.
+    """
+    generator = random.Random(seed)
+    quiz_count = max(1, rows // (questions_per_quiz + 1))
+    prefix = uuid.uuid4().hex[:8]
+    with transaction.atomic():
+        created_users = User.objects.bulk_create([User(username=f'benchmark-{prefix}-{index}') for index in range(users)])
+        for start in range(0, quiz_count, batch_size):
+            quizzes = Quiz.objects.bulk_create([
+                Quiz(owner=created_users[index % users], title=f'{generator.choice(TOPICS)} {index}', description=f'Ein synthetisches Quiz Nummer {index}.',
+                     video_url=f'https://www.youtube.com/watch?v={index:011d}')
+                for index in range(start, min(start + batch_size, quiz_count))
+            ])
+            Question.objects.bulk_create([
+                Question(quiz=quiz, question_title=f'Frage {number} zu {quiz.title}?', question_options=[f'Antwort {letter}' for letter in 'ABCD'],
+                         answer=f'Antwort {generator.choice("ABCD")}')
+                for quiz in quizzes for number in range(questions_per_quiz)
+            ], batch_size=batch_size)
+    return created_users
@@ -0,0 +1,67 @@
+import time
+
+from django.db import connection, transaction
+from django.test import Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from quizly_app.models import Quiz
+from quizly_app.api.authentication import CookieJWTAuthentication
+from quizly_app.api.response_cache import response_cache
+from quizly_app.api.search import get_search_backend
+from .auth import get_ok
+from .data import generate_dataset
+from .pipeline import percentile
+
+
+def measure_latency(fn, requests, before=None):
+    """
+    Calls `fn` `requests` times, each after the optional `before`, and returns the p50 and p95 latency in
+    milliseconds and the database queries of one more call.
+    """
+    latencies = []
+    for _ in range(requests):
+        if before is not None:
+            before()
+        started = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+    if before is not None:
+        before()
+    with CaptureQueriesContext(connection) as queries:
+        fn()
+    return {'p50_ms': round(percentile(latencies, 0.5), 2), 'p95_ms': round(percentile(latencies, 0.95), 2), 'queries': len(queries)}
+
+
+def run_endpoint_benchmark(rows=(10000, 100000), users=10, questions_per_quiz=10, requests=200):
+    """
+    Measures the latency of the quiz list, detail and search endpoints and of cookie JWT authentication on synthetic
+    datasets of every size in `rows` (quiz and question rows in total). List and detail are measured with the
+    response cache invalidated before every request and with warm cache. Every request has to be answered with 200,
+    the test client's host is allowed for the run. The data is rolled back afterwards.
+    """
+    results = []
+    for size in rows:
+        with override_settings(ALLOWED_HOSTS=['testserver']), transaction.atomic():
+            user = generate_dataset(size, users=users, questions_per_quiz=questions_per_quiz)[0]
+            get_search_backend().rebuild()
+            quiz_id = Quiz.objects.filter(owner=user).order_by('-created_at', '-id').values_list('id', flat=True).first()
+            token = str(AccessToken.for_user(user))
+            client = Client()
+            client.cookies['access_token'] = token
+            request = RequestFactory().get('/api/quizzes/')
+            request.COOKIES['access_token'] = token
+            auth = CookieJWTAuthentication()
+
+            def invalidate():
+                response_cache.invalidate([f'owner:{user.pk}', f'quiz:{quiz_id}'])
+
+            endpoints = (('list', '/api/quizzes/'), ('list expanded', '/api/quizzes/?expand=questions'), ('detail', f'/api/quizzes/{quiz_id}/'))
+            for name, path in endpoints:
+                for cache, before in (('cold', invalidate), ('warm', None)):
+                    results.append({'rows': size, 'endpoint': name, 'cache': cache, **measure_latency(lambda: get_ok(client, path), requests, before)})
+            results.append({'rows': size, 'endpoint': 'search', 'cache': 'index', **measure_latency(lambda: get_ok(client, '/api/quizzes/search/?q=Photosynthese'), requests)})
+            results.append({'rows': size, 'endpoint': 'search prefix', 'cache': 'index', **measure_latency(lambda: get_ok(client, '/api/quizzes/search/?q=Frage%203%20Vulk'), requests)})
+            results.append({'rows': size, 'endpoint': 'authenticate', 'cache': 'user cache', **measure_latency(lambda: auth.authenticate(request), requests)})
+            transaction.set_rollback(True)
+    return results
@@ -0,0 +1,209 @@
+import asyncio
+import json
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import yt_dlp
+from django.conf import settings
+
+from quizly_app.api import gemini
+from quizly_app.api.scheduler import model_scheduler
+from quizly_app.api.transcription import TRANSCRIPTION_PROMPT
+
+QUESTION_COUNT_PATTERN = re.compile(r'(\d+) (?:Multiple-Choice-)?Fragen|die (\d+) besten')
+SENTENCES = (
+    'Im Video wird erklärt, wie Photosynthese in den Blättern funktioniert.',
+    'Die Sprecherin vergleicht dabei Licht- und Dunkelreaktion.',
+    'Anschließend werden Beispiele aus der Landwirtschaft gezeigt.',
+    'Zum Schluss fasst sie die wichtigsten Begriffe noch einmal zusammen.',
+)
+
+
+def random_video_id():
+    """
+    Returns a new 11 character video id, so runs never hit the pipeline cache or the stored transcripts of earlier runs.
+    """
+    return uuid.uuid4().hex[:11]
+
+
+def synthetic_transcript(chars):
+    text = ''
+    while len(text) < chars:
+        text += SENTENCES[len(text) % len(SENTENCES)] + ' '
+    return text[:chars]
+
+
+class FakeYoutubeDL:
+    """
+    Deterministic stand-in for `yt_dlp.YoutubeDL`. Metadata lookups return a public video of `duration` seconds
+    without captions, downloads sleep `download_latency` seconds and write `audio_bytes` bytes to the output template.
+    The yt-dlp progress and postprocessor hooks are called like by the real downloader.
+    """
+    duration = 600
+    download_latency = 0.0
+    transcode_latency = 0.0
+    audio_bytes = 1024 ** 2
+
+    def __init__(self, params=None):
+        self.params = params or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def sanitize_info(self, info):
+        return info
+
+    def _info(self, url):
+        video_id = url.rsplit('=', 1)[-1].rsplit('/', 1)[-1][:11]
+        return {'_type': 'video', 'id': video_id, 'title': f'Benchmark-Video {video_id}', 'channel': 'Benchmark', 'duration': self.duration,
+                'availability': 'public', 'live_status': 'not_live', 'language': 'de', 'subtitles': {}, 'automatic_captions': {},
+                'formats': [{'format_id': 'audio', 'vcodec': 'none', 'filesize': self.audio_bytes}]}
+
+    def _call_hooks(self, name, progress):
+        for hook in self.params.get(name, []):
+            hook(progress)
+
+    def extract_info(self, url, download=True):
+        info = self._info(url)
+        if not download:
+            return info
+        time.sleep(self.download_latency)
+        ext = next((pp.get('preferredcodec') for pp in self.params.get('postprocessors', []) if pp.get('preferredcodec')), 'opus')
+        filepath = self.params['outtmpl'] % {'ext': ext}
+        with open(filepath, 'wb') as f:
+            f.write(b'\0' * self.audio_bytes)
+        self._call_hooks('progress_hooks', {'status': 'finished', 'downloaded_bytes': self.audio_bytes, 'filename': filepath})
+        self._call_hooks('postprocessor_hooks', {'status': 'started', 'postprocessor': 'ExtractAudio'})
+        time.sleep(self.transcode_latency)
+        self._call_hooks('postprocessor_hooks', {'status': 'finished', 'postprocessor': 'ExtractAudio'})
+        return {**info, 'requested_downloads': [{'filepath': filepath}]}
+
+
+def fake_quiz_answer(prompt):
+    """
+    Returns a quiz JSON answer for any of the generation prompts: it carries the fields of the quiz, the section
+    and the selection prompts, with as many valid questions as the prompt asks for.
+    """
+    match = QUESTION_COUNT_PATTERN.search(prompt)
+    count = int(next(group for group in match.groups() if group)) if match else settings.QUIZLY_QUESTION_COUNT
+    options = ['Antwort A', 'Antwort B', 'Antwort C', 'Antwort D']
+    return {
+        'title': 'Benchmark-Quiz',
+        'description': 'Ein Quiz aus dem Stand-in-Modell.',
+        'summary': 'Eine Zusammenfassung.',
+        'questions': [{'question_title': f'Frage {index}?', 'question_options': options, 'answer': options[index % 4]} for index in range(count)],
+        'selected': list(range(count)),
+    }
+
+
+class FakeModels:
+    def __init__(self, client):
+        self.client = client
+
+    def _answer(self, contents):
+        parts = contents if isinstance(contents, list) else [contents]
+        prompt = next((part for part in reversed(parts) if isinstance(part, str)), '')
+        if prompt == TRANSCRIPTION_PROMPT:
+            text = synthetic_transcript(self.client.transcript_chars)
+        else:
+            answer = fake_quiz_answer(prompt)
+            if len(parts) > 1 and 'transcript' in prompt:
+                answer['transcript'] = synthetic_transcript(self.client.transcript_chars)
+            text = json.dumps(answer, ensure_ascii=False)
+        usage = SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=len(text) // 4, thoughts_token_count=None,
+                                total_token_count=len(prompt) // 4 + len(text) // 4)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+    def generate_content(self, model, contents, config=None):
+        time.sleep(self.client.model_latency)
+        return self._answer(contents)
+
+    def generate_content_stream(self, model, contents, config=None):
+        response = self.generate_content(model, contents, config)
+        for start in range(0, len(response.text), 64):
+            yield SimpleNamespace(text=response.text[start:start + 64], usage_metadata=response.usage_metadata)
+
+
+class FakeAsyncModels(FakeModels):
+    async def generate_content(self, model, contents, config=None):
+        await asyncio.sleep(self.client.model_latency)
+        return self._answer(contents)
+
+
+class FakeFiles:
+    def __init__(self, client):
+        self.client = client
+
+    def upload(self, file, config=None):
+        time.sleep(self.client.upload_latency)
+        return SimpleNamespace(name=f'files/{uuid.uuid4().hex}', state=None)
+
+    def get(self, name):
+        return SimpleNamespace(name=name, state=None)
+
+    def delete(self, name):
+        return None
+
+
+class FakeAsyncFiles(FakeFiles):
+    async def upload(self, file, config=None):
+        await asyncio.sleep(self.client.upload_latency)
+        return SimpleNamespace(name=f'files/{uuid.uuid4().hex}', state=None)
+
+    async def get(self, name):
+        return SimpleNamespace(name=name, state=None)
+
+    async def delete(self, name):
+        return None
+
+
+class FakeGeminiClient:
+    """
+    Deterministic stand-in for the `google.genai` client with the sync and `aio` interfaces the pipeline uses.
+    Every model call sleeps `model_latency` seconds, every upload `upload_latency` seconds, transcriptions
+    return `transcript_chars` characters of German text and quiz prompts get valid quiz JSON.
+    """
+    def __init__(self, model_latency=0.0, upload_latency=0.0, transcript_chars=20000):
+        self.model_latency = model_latency
+        self.upload_latency = upload_latency
+        self.transcript_chars = transcript_chars
+        self.models = FakeModels(self)
+        self.files = FakeFiles(self)
+        self.aio = SimpleNamespace(models=FakeAsyncModels(self), files=FakeAsyncFiles(self))
+
+
+_install_lock = threading.Lock()
+
+
+@contextmanager
+def fake_backends(download_latency=0.0, transcode_latency=0.0, audio_bytes=1024 ** 2, duration=600,
+                  model_latency=0.0, upload_latency=0.0, transcript_chars=20000, unthrottled=True):
+    """
+    Replaces yt-dlp and the Gemini client with the stand-ins for the enclosed block and restores them afterwards.
+    With `unthrottled` the model scheduler gets practically unlimited budgets, so only the pipeline itself is measured.
+    Yields the fake Gemini client.
+    """
+    downloader = type('ConfiguredFakeYoutubeDL', (FakeYoutubeDL,), {'download_latency': download_latency, 'transcode_latency': transcode_latency,
+                                                                     'audio_bytes': audio_bytes, 'duration': duration})
+    client = FakeGeminiClient(model_latency=model_latency, upload_latency=upload_latency, transcript_chars=transcript_chars)
+    with _install_lock:
+        original_downloader = yt_dlp.YoutubeDL
+        yt_dlp.YoutubeDL = downloader
+        original_client = gemini.set_client(client)
+        if unthrottled:
+            model_scheduler.set_budgets(10 ** 9, 10 ** 12)
+    try:
+        yield client
+    finally:
+        with _install_lock:
+            yt_dlp.YoutubeDL = original_downloader
+            gemini.set_client(original_client)
+            if unthrottled:
+                model_scheduler.set_budgets(settings.QUIZLY_GEMINI_REQUESTS_PER_MINUTE, settings.QUIZLY_GEMINI_TOKENS_PER_MINUTE)
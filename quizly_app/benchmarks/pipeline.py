@@ -0,0 +1,112 @@
+import statistics
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+
+from quizly_app.models import PipelineRun, Transcript
+from quizly_app.api.instrumentation import collect_request_timings
+from quizly_app.api.pipeline_cache import pipeline_cache
+from quizly_app.api.quiz_logic import create_quiz_pipeline
+from .fakes import fake_backends, random_video_id
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def percentile(values, fraction):
+    """
+    Returns the nearest-rank percentile of `values`, `fraction` between 0 and 1.
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def max_rss_bytes():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_job(user, video_id, mode):
+    """
+    Runs the whole pipeline for one video and returns its latency in seconds and the seconds per stage.
+    """
+    try:
+        with collect_request_timings() as timings:
+            started = time.perf_counter()
+            create_quiz_pipeline(user, f'https://www.youtube.com/watch?v={video_id}', mode=mode)
+            return time.perf_counter() - started, timings.durations()
+    finally:
+        connections.close_all()
+
+
+def measure_concurrency(user, jobs, concurrency, mode, video_ids):
+    """
+    Runs `jobs` pipeline jobs with `concurrency` worker threads and returns throughput, latency percentiles and
+    the mean seconds per stage.
+    """
+    ids = [random_video_id() for _ in range(jobs)]
+    video_ids.extend(ids)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='quizly-benchmark') as pool:
+        results = list(pool.map(lambda video_id: run_job(user, video_id, mode), ids))
+    elapsed = time.perf_counter() - started
+    latencies = [latency for latency, _ in results]
+    stages = sorted({stage for _, durations in results for stage in durations})
+    return {
+        'concurrency': concurrency,
+        'jobs': jobs,
+        'seconds': round(elapsed, 3),
+        'jobs_per_second': round(jobs / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'max_ms': round(max(latencies) * 1000, 1),
+        'stages_ms': {stage: round(statistics.mean(durations.get(stage, 0.0) for _, durations in results) * 1000, 1) for stage in stages},
+    }
+
+
+def measure_memory(user, jobs, mode, video_ids):
+    """
+    Runs `jobs` jobs one after another under tracemalloc and returns the median peak of Python allocations per job.
+    """
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(jobs):
+            video_id = random_video_id()
+            video_ids.append(video_id)
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            run_job(user, video_id, mode)
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    return int(statistics.median(peaks))
+
+
+def run_pipeline_benchmark(jobs=20, concurrency=(1, 4, 16), mode=None, memory_jobs=3, **fake_options):
+    """
+    Measures the quiz pipeline offline with the stand-in downloader and model client of `fakes`. `fake_options` are
+    passed to `fake_backends`. Every job uses a new video id, so no cache is hit. The temporary user with its quizzes,
+    the stored transcripts and the pipeline runs are deleted afterwards.
+    """
+    user = User.objects.create(username=f'benchmark-{uuid.uuid4().hex}')
+    video_ids = []
+    try:
+        with fake_backends(**fake_options):
+            levels = [measure_concurrency(user, jobs, level, mode, video_ids) for level in concurrency]
+            memory = measure_memory(user, memory_jobs, mode, video_ids) if memory_jobs else None
+    finally:
+        user.delete()
+        Transcript.objects.filter(video_id__in=video_ids).delete()
+        PipelineRun.objects.filter(video_id__in=video_ids).delete()
+        for video_id in video_ids:
+            pipeline_cache.delete(video_id)
+    return {'mode': mode or settings.QUIZLY_PIPELINE_MODE, 'fakes': fake_options, 'concurrency': levels, 'memory_per_job_bytes': memory, 'max_rss_bytes': max_rss_bytes()}
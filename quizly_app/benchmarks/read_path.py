@@ -0,0 +1,81 @@
+import statistics
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from quizly_app.models import Quiz, Question
+from quizly_app.api.quiz_logic import save_quizzes_bulk
+from quizly_app.api.readers import QUIZ_FIELDS, quiz_dicts
+from quizly_app.api.renderers import FastJSONRenderer
+from quizly_app.api.serializers import QuizSerializer
+
+ORDERING = ('-created_at', '-id')
+
+
+def seed_quizzes(user, count, question_count):
+    """
+    Creates `count` quizzes with `question_count` questions each for the given user.
+    """
+    save_quizzes_bulk(user, [{
+        'video_url': f'https://www.youtube.com/watch?v={index:011d}',
+        'title': f'Benchmark-Quiz {index}',
+        'description': 'Ein Quiz für den Benchmark des Lesepfads – mit Umlauten.',
+        'questions': [{
+            'question_title': f'Frage {number} zu Quiz {index}?',
+            'question_options': ['Antwort A', 'Antwort B', 'Antwort C', 'Antwort D'],
+            'answer': 'Antwort B',
+        } for number in range(question_count)],
+    } for index in range(count)])
+
+
+def render_with_serializer(user, count):
+    """
+    The previous read path: model instances, nested ModelSerializers and the standard JSON renderer.
+    """
+    quizzes = Quiz.objects.filter(owner=user).order_by(*ORDERING).prefetch_related(Prefetch('questions', queryset=Question.objects.order_by('id')))[:count]
+    return JSONRenderer().render(QuizSerializer(quizzes, many=True).data)
+
+
+def render_with_values(user, count):
+    """
+    The fast read path: `values()` rows turned into plain dicts and rendered with `FastJSONRenderer`.
+    """
+    rows = Quiz.objects.filter(owner=user).order_by(*ORDERING).values(*QUIZ_FIELDS)[:count]
+    return FastJSONRenderer().render(quiz_dicts(rows))
+
+
+def measure(fn, repeat):
+    """
+    Runs `fn` `repeat` times and returns the median duration in milliseconds together with the last result.
+    """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+
+def run_read_path_benchmark(sizes=(100, 1000), question_count=10, repeat=5):
+    """
+    Compares both read paths for payloads of every size in `sizes` on temporary data that is rolled back afterwards.
+    Returns one result dict per size and raises `AssertionError` if the two paths render different bytes.
+    """
+    results = []
+    with transaction.atomic():
+        user = User.objects.create(username=f'benchmark-{uuid.uuid4().hex}')
+        seed_quizzes(user, max(sizes), question_count)
+        for size in sizes:
+            serializer_ms, expected = measure(lambda: render_with_serializer(user, size), repeat)
+            values_ms, actual = measure(lambda: render_with_values(user, size), repeat)
+            assert actual == expected, f'The read paths rendered different output for {size} quizzes.'
+            results.append({'quizzes': size, 'questions_per_quiz': question_count, 'bytes': len(actual),
+                            'serializer_ms': round(serializer_ms, 2), 'values_ms': round(values_ms, 2),
+                            'speedup': round(serializer_ms / values_ms, 2) if values_ms else None})
+        transaction.set_rollback(True)
+    return results
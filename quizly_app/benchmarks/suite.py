@@ -0,0 +1,48 @@
+import platform
+import sys
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .auth import run_auth_benchmark
+from .endpoints import run_endpoint_benchmark
+from .pipeline import run_pipeline_benchmark
+from .read_path import run_read_path_benchmark
+
+FULL_OPTIONS = {
+    'pipeline': {'jobs': 20, 'concurrency': (1, 4, 16), 'download_latency': 0.2, 'transcode_latency': 0.1, 'model_latency': 0.5, 'upload_latency': 0.1},
+    'endpoints': {'rows': (10000, 100000, 1000000), 'requests': 200},
+    'read_path': {'sizes': (100, 1000)},
+    'auth': {'requests': 2000},
+}
+QUICK_OPTIONS = {
+    'pipeline': {'jobs': 4, 'concurrency': (1, 4), 'memory_jobs': 1, 'download_latency': 0.02, 'model_latency': 0.05},
+    'endpoints': {'rows': (10000,), 'requests': 20},
+    'read_path': {'sizes': (100,), 'repeat': 3},
+    'auth': {'requests': 200},
+}
+
+
+def environment():
+    """
+    Returns what the results depend on besides the code, so runs on different machines are not compared by accident.
+    """
+    return {'python': sys.version.split()[0], 'django': django.get_version(), 'platform': platform.platform(), 'machine': platform.machine(),
+            'database': connection.vendor, 'pipeline_mode': settings.QUIZLY_PIPELINE_MODE, 'transcription_backend': settings.QUIZLY_TRANSCRIPTION_BACKEND,
+            'response_cache_backend': settings.QUIZLY_RESPONSE_CACHE_BACKEND}
+
+
+def run_benchmark_suite(quick=False, only=None):
+    """
+    Runs all benchmarks offline and returns one JSON-serializable dict, meant to be stored per release and diffed.
+    `quick` uses small sizes for a smoke run, `only` restricts the run to some of the benchmark names.
+    """
+    options = QUICK_OPTIONS if quick else FULL_OPTIONS
+    runners = {'pipeline': run_pipeline_benchmark, 'endpoints': run_endpoint_benchmark, 'read_path': run_read_path_benchmark, 'auth': run_auth_benchmark}
+    results = {'started_at': timezone.now().isoformat(), 'quick': quick, 'environment': environment(), 'options': options}
+    for name, runner in runners.items():
+        if not only or name in only:
+            results[name] = runner(**options[name])
+    return results
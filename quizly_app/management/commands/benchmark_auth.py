@@ -0,0 +1,27 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from quizly_app.benchmarks.auth import run_auth_benchmark
+
+
+class Command(BaseCommand):
+    """
+    Compares authenticated-request throughput with and without the user cache of `CookieJWTAuthentication`.
+    """
+    help = 'Benchmarks cookie JWT authentication with and without the per-process user cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Calls of authenticate() per mode, a tenth of them as full requests.')
+        parser.add_argument('--path', default='/api/quizzes/', help='Authenticated endpoint used for the full requests.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        results = run_auth_benchmark(requests=options['requests'], path=options['path'])
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f'{"mode":<14} {"auth/s":>8} {"queries":>8} {"requests/s":>11} {"queries":>8}')
+        for result in results:
+            self.stdout.write(f'{result["mode"]:<14} {result["authenticate_per_second"]:>8} {result["authenticate_queries"]:>8} '
+                              f'{result["requests_per_second"]:>11} {result["request_queries"]:>8}')
@@ -0,0 +1,28 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from quizly_app.benchmarks.endpoints import run_endpoint_benchmark
+
+
+class Command(BaseCommand):
+    """
+    Measures the latency of the quiz list, detail and authentication paths on synthetic datasets.
+    """
+    help = 'Benchmarks the quiz list and detail endpoints and JWT authentication on synthetic data of 10k to 1M rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000], help='Quiz and question rows per dataset, e.g. 10000 100000 1000000.')
+        parser.add_argument('--users', type=int, default=10, help='Users the quizzes are spread over.')
+        parser.add_argument('--questions', type=int, default=10, help='Questions per quiz.')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per measurement.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        results = run_endpoint_benchmark(rows=options['rows'], users=options['users'], questions_per_quiz=options['questions'], requests=options['requests'])
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f'{"rows":>9} {"endpoint":<15} {"cache":<11} {"p50 ms":>8} {"p95 ms":>8} {"queries":>8}')
+        for result in results:
+            self.stdout.write(f'{result["rows"]:>9} {result["endpoint"]:<15} {result["cache"]:<11} {result["p50_ms"]:>8} {result["p95_ms"]:>8} {result["queries"]:>8}')
@@ -0,0 +1,40 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from quizly_app.benchmarks.pipeline import run_pipeline_benchmark
+
+
+class Command(BaseCommand):
+    """
+    Measures pipeline throughput, latency and memory per job offline with the stand-in downloader and model client.
+    """
+    help = 'Benchmarks the quiz pipeline under concurrency with stand-in yt-dlp and Gemini backends.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=20, help='Jobs per concurrency level.')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16], help='Numbers of concurrent jobs.')
+        parser.add_argument('--mode', choices=['two-step', 'multimodal'], help='Pipeline mode, defaults to QUIZLY_PIPELINE_MODE.')
+        parser.add_argument('--memory-jobs', type=int, default=3, help='Sequential jobs measured with tracemalloc, 0 skips the measurement.')
+        parser.add_argument('--download-latency', type=float, default=0.2, help='Seconds of every stand-in download.')
+        parser.add_argument('--transcode-latency', type=float, default=0.1, help='Seconds of every stand-in FFmpeg run.')
+        parser.add_argument('--audio-bytes', type=int, default=1024 ** 2, help='Size of every downloaded audio file.')
+        parser.add_argument('--model-latency', type=float, default=0.5, help='Seconds of every stand-in Gemini call.')
+        parser.add_argument('--upload-latency', type=float, default=0.1, help='Seconds of every stand-in file upload.')
+        parser.add_argument('--transcript-chars', type=int, default=20000, help='Length of the stand-in transcripts.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        result = run_pipeline_benchmark(jobs=options['jobs'], concurrency=options['concurrency'], mode=options['mode'], memory_jobs=options['memory_jobs'],
+                                        download_latency=options['download_latency'], transcode_latency=options['transcode_latency'],
+                                        audio_bytes=options['audio_bytes'], model_latency=options['model_latency'],
+                                        upload_latency=options['upload_latency'], transcript_chars=options['transcript_chars'])
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+        self.stdout.write(f'mode: {result["mode"]}')
+        self.stdout.write(f'{"concurrency":>11} {"jobs/s":>8} {"p50 ms":>9} {"p95 ms":>9} {"max ms":>9}')
+        for level in result['concurrency']:
+            self.stdout.write(f'{level["concurrency"]:>11} {level["jobs_per_second"]:>8} {level["p50_ms"]:>9} {level["p95_ms"]:>9} {level["max_ms"]:>9}')
+        if result['memory_per_job_bytes'] is not None:
+            self.stdout.write(f'memory per job: {result["memory_per_job_bytes"] / 1024:.0f} KiB (tracemalloc peak)')
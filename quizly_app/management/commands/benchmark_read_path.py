@@ -0,0 +1,27 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from quizly_app.benchmarks.read_path import run_read_path_benchmark
+
+
+class Command(BaseCommand):
+    """
+    Compares the ModelSerializer read path of the quiz endpoints with the `values()` read path.
+    """
+    help = 'Benchmarks rendering quiz payloads with the serializers against the fast values() read path.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000], help='Numbers of quizzes per payload.')
+        parser.add_argument('--questions', type=int, default=10, help='Questions per quiz.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement, the median is reported.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        results = run_read_path_benchmark(sizes=options['sizes'], question_count=options['questions'], repeat=options['repeat'])
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f'{"quizzes":>8} {"bytes":>10} {"serializer ms":>14} {"values ms":>10} {"speedup":>8}')
+        for result in results:
+            self.stdout.write(f'{result["quizzes"]:>8} {result["bytes"]:>10} {result["serializer_ms"]:>14} {result["values_ms"]:>10} {str(result["speedup"]) + "x":>8}')
@@ -0,0 +1,27 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from quizly_app.benchmarks.suite import run_benchmark_suite
+
+
+class Command(BaseCommand):
+    """
+    Runs all offline benchmarks and writes their results as one JSON document.
+    """
+    help = 'Runs the pipeline, endpoint, read path and authentication benchmarks and writes the results as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quick', action='store_true', help='Use small sizes for a smoke run.')
+        parser.add_argument('--only', nargs='+', choices=['pipeline', 'endpoints', 'read_path', 'auth'], help='Run only these benchmarks.')
+        parser.add_argument('--output', help='Write the JSON to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        results = run_benchmark_suite(quick=options['quick'], only=options['only'])
+        document = json.dumps(results, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(document + '\n')
+            self.stdout.write(f'Results written to {options["output"]}.')
+            return
+        self.stdout.write(document)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from quizly_app.api.search import get_search_backend
+
+
+class Command(BaseCommand):
+    """
+    Re-indexes all quizzes, e.g. after a restore or after rows were written without the model signals.
+    """
+    help = 'Rebuilds the full-text search index of all quizzes.'
+
+    def handle(self, *args, **options):
+        indexed = get_search_backend().rebuild()
+        self.stdout.write(f'Indexed {indexed} quizzes.')
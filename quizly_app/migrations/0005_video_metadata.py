@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizly_app', '0004_quizjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='video_metadata',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='quizjob',
+            name='video_metadata',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='quizjob',
+            name='stage',
+            field=models.CharField(choices=[('queued', 'Queued'), ('probe', 'Probe'), ('download', 'Download'), ('transcribe', 'Transcribe'), ('generate', 'Generate'), ('save', 'Save'), ('done', 'Done')], default='queued', max_length=20),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizly_app', '0005_video_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizjob',
+            name='mode',
+            field=models.CharField(blank=True, choices=[('two-step', 'Transcribe, then generate'), ('multimodal', 'Single multimodal call')], max_length=20, null=True),
+        ),
+        migrations.CreateModel(
+            name='PipelineRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mode', models.CharField(choices=[('two-step', 'Transcribe, then generate'), ('multimodal', 'Single multimodal call')], max_length=20)),
+                ('video_id', models.CharField(blank=True, max_length=20, null=True)),
+                ('succeeded', models.BooleanField(default=False)),
+                ('latency_seconds', models.FloatField()),
+                ('model_calls', models.PositiveIntegerField(default=0)),
+                ('prompt_tokens', models.PositiveIntegerField(default=0)),
+                ('output_tokens', models.PositiveIntegerField(default=0)),
+                ('total_tokens', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['mode', 'created_at'], name='quizly_app__mode_0084af_idx')],
+            },
+        ),
+    ]
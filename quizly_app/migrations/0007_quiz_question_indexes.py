@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizly_app', '0006_pipelinerun'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['quiz', 'id'], name='quizly_app__quiz_id_a68d27_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['owner', 'created_at'], name='quizly_app__owner_i_2b35fe_idx'),
+        ),
+    ]
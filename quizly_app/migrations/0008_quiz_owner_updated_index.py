@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizly_app', '0007_quiz_question_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['owner', 'updated_at'], name='quizly_app__owner_i_ef5518_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizly_app', '0008_quiz_owner_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Transcript',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('video_id', models.CharField(max_length=20, unique=True)),
+                ('video_url', models.URLField()),
+                ('compressed_text', models.BinaryField()),
+                ('char_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='transcript',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='quizzes', to='quizly_app.transcript'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Creates the FTS5 table of the sqlite search backend with one row per quiz and indexes the existing quizzes.
+    Other databases use the database search backend, which needs no table.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS quizly_quiz_search USING fts5("
+        "owner, title, description, questions, options, tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        "INSERT INTO quizly_quiz_search (rowid, owner, title, description, questions, options) "
+        "SELECT quiz.id, 'u' || quiz.owner_id, quiz.title, coalesce(quiz.description, ''), "
+        "coalesce((SELECT group_concat(question.question_title, ' ') FROM quizly_app_question question WHERE question.quiz_id = quiz.id), ''), "
+        "coalesce((SELECT group_concat(question.question_options, ' ') FROM quizly_app_question question WHERE question.quiz_id = quiz.id), '') "
+        "FROM quizly_app_quiz quiz"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS quizly_quiz_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizly_app', '0010_quizbatch'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
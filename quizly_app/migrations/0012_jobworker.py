@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizly_app', '0011_quiz_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobWorker',
+            fields=[
+                ('id', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('hostname', models.CharField(max_length=255)),
+                ('pid', models.PositiveIntegerField()),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('heartbeat_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizly_app', '0012_jobworker'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizbatch',
+            name='worker',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
@@ -1,18 +1,49 @@
+import zlib
+
 from django.db import models
 from django.contrib.auth.models import User
 
 
+class Transcript(models.Model):
+    """
+    This class stores the transcript of a YouTube video zlib-compressed under its video id, so quizzes can be regenerated without downloading and transcribing the video again.
+    """
+    video_id = models.CharField(max_length=20, unique=True)
+    video_url = models.URLField()
+    compressed_text = models.BinaryField()
+    char_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.video_id} ({self.char_count} characters)'
+
+    @property
+    def text(self):
+        return zlib.decompress(self.compressed_text).decode('utf-8')
+
+    @text.setter
+    def text(self, value):
+        self.compressed_text = zlib.compress(value.encode('utf-8'))
+        self.char_count = len(value)
+
+
 class Quiz(models.Model):
     """
-    This class represents a Quiz model with fields for owner, title, description, video URL, creation timestamp, and update timestamp.
+    This class represents a Quiz model with fields for owner, title, description, video URL, the probed video metadata, the stored transcript, creation timestamp, and update timestamp.
     """
     owner = models.ForeignKey(User, related_name='quizzes', on_delete=models.CASCADE, null=True, blank=True)
     title = models.CharField(max_length=255)
     description = models.TextField(null=True, blank=True)
     video_url = models.URLField()
+    video_metadata = models.JSONField(null=True, blank=True)
+    transcript = models.ForeignKey(Transcript, related_name='quizzes', on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['owner', 'created_at']), models.Index(fields=['owner', 'updated_at'])]
+
     def __str__(self):
         return self.title
 
@@ -28,5 +59,124 @@ class Question(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['quiz', 'id'])]
+
+    def __str__(self):
+        return self.question_title
+
+class PipelineRun(models.Model):
+    """
+    This class records one run of the quiz pipeline with the pipeline mode, the latency, the number of Gemini calls and the tokens they used, so the modes can be compared.
+    """
+    MODE_TWO_STEP = 'two-step'
+    MODE_MULTIMODAL = 'multimodal'
+    MODE_CHOICES = [
+        (MODE_TWO_STEP, 'Transcribe, then generate'),
+        (MODE_MULTIMODAL, 'Single multimodal call'),
+    ]
+
+    mode = models.CharField(max_length=20, choices=MODE_CHOICES)
+    video_id = models.CharField(max_length=20, null=True, blank=True)
+    succeeded = models.BooleanField(default=False)
+    latency_seconds = models.FloatField()
+    model_calls = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    output_tokens = models.PositiveIntegerField(default=0)
+    total_tokens = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['mode', 'created_at'])]
+
+    def __str__(self):
+        return f'{self.mode} {self.video_id} ({self.latency_seconds:.1f}s)'
+
+
+class JobWorker(models.Model):
+    """
+    This class registers a running process that executes quiz jobs under its per-start id, with its host, process id and last heartbeat, so other processes can tell running jobs from interrupted ones.
+    """
+    id = models.CharField(max_length=32, primary_key=True)
+    hostname = models.CharField(max_length=255)
+    pid = models.PositiveIntegerField()
+    started_at = models.DateTimeField(auto_now_add=True)
+    heartbeat_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.hostname}:{self.pid} ({self.pk})'
+
+
+class QuizBatch(models.Model):
+    """
+    This class represents a batch of quiz jobs created together from a list of video URLs or a YouTube playlist, with its owner, the playlist URL and title, the pipeline mode of its jobs and the worker process that runs them.
+    """
+    owner = models.ForeignKey(User, related_name='quiz_batches', on_delete=models.CASCADE)
+    source_url = models.URLField(null=True, blank=True)
+    title = models.CharField(max_length=255, null=True, blank=True)
+    mode = models.CharField(max_length=20, choices=PipelineRun.MODE_CHOICES, null=True, blank=True)
+    worker = models.CharField(max_length=255, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
     def __str__(self):
-        return self.question_title
\ No newline at end of file
+        return self.title or self.source_url or f'Batch {self.pk}'
+
+
+class QuizJob(models.Model):
+    """
+    This class represents a background quiz generation job with its owner, the requested video URL and pipeline mode, the batch it belongs to, the overall status, the current pipeline stage and the resulting quiz.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    STAGE_QUEUED = 'queued'
+    STAGE_PROBE = 'probe'
+    STAGE_DOWNLOAD = 'download'
+    STAGE_TRANSCRIBE = 'transcribe'
+    STAGE_GENERATE = 'generate'
+    STAGE_SAVE = 'save'
+    STAGE_DONE = 'done'
+    STAGE_CHOICES = [
+        (STAGE_QUEUED, 'Queued'),
+        (STAGE_PROBE, 'Probe'),
+        (STAGE_DOWNLOAD, 'Download'),
+        (STAGE_TRANSCRIBE, 'Transcribe'),
+        (STAGE_GENERATE, 'Generate'),
+        (STAGE_SAVE, 'Save'),
+        (STAGE_DONE, 'Done'),
+    ]
+
+    owner = models.ForeignKey(User, related_name='quiz_jobs', on_delete=models.CASCADE)
+    video_url = models.URLField()
+    video_metadata = models.JSONField(null=True, blank=True)
+    mode = models.CharField(max_length=20, choices=PipelineRun.MODE_CHOICES, null=True, blank=True)
+    batch = models.ForeignKey(QuizBatch, related_name='jobs', on_delete=models.CASCADE, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    stage = models.CharField(max_length=20, choices=STAGE_CHOICES, default=STAGE_QUEUED)
+    error = models.TextField(null=True, blank=True)
+    quiz = models.ForeignKey(Quiz, related_name='jobs', on_delete=models.SET_NULL, null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    worker = models.CharField(max_length=255, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f'{self.video_url} ({self.status})'
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_SUCCEEDED, self.STATUS_FAILED)
@@ -0,0 +1,37 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from quizly_app.models import Quiz, Question
+
+# Sent after the transaction commits whenever quizzes or their questions were created, changed or deleted,
+# with the `owner_id` and the `quiz_ids` of the affected quizzes
+quiz_changed = Signal()
+
+
+def notify_quiz_changed(owner_id, quiz_ids):
+    """
+    Sends `quiz_changed` once the surrounding transaction commits. Bulk writes, which skip the model signals,
+    call this explicitly.
+    """
+    transaction.on_commit(lambda: quiz_changed.send(sender=Quiz, owner_id=owner_id, quiz_ids=list(quiz_ids)))
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def quiz_saved_or_deleted(sender, instance, **kwargs):
+    notify_quiz_changed(instance.owner_id, [instance.pk])
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_saved_or_deleted(sender, instance, origin=None, **kwargs):
+    """
+    Touches `updated_at` of the quiz, so quiz timestamps cover changes of their questions. Questions deleted
+    by a cascade, for example together with their quiz or its owner, are skipped, the deletion of the quiz is reported on its own.
+    """
+    if instance.quiz_id is None or (origin is not None and getattr(origin, 'model', type(origin)) is not Question):
+        return
+    Quiz.objects.filter(pk=instance.quiz_id).update(updated_at=timezone.now())
+    notify_quiz_changed(instance.quiz.owner_id, [instance.quiz_id])
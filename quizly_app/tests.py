@@ -1,3 +1,1052 @@
-from django.test import TestCase
+import asyncio
+import io
+import fcntl
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.signals import request_started
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from django.utils import timezone
+
+from quizly_app.models import JobWorker, PipelineRun, Question, Quiz, QuizBatch, QuizJob, Transcript
+from quizly_app.benchmarks.read_path import render_with_serializer, render_with_values
+from quizly_app.benchmarks.fakes import FakeAsyncFiles, FakeFiles, FakeModels, FakeYoutubeDL, fake_backends, random_video_id
+from quizly_app.api import batches
+from quizly_app.api.batches import BatchRunner, create_quiz_batch, resume_unfinished_batches
+from quizly_app.api.captions import parse_json3_captions, parse_vtt_captions, select_caption_track
+from quizly_app.api.chunking import transcribe_segment
+from quizly_app.api.exceptions import InvalidQuizDataError, JobQueueFullError, ModelUnavailableError, VideoRejectedError
+from quizly_app.api import generation
+from quizly_app.api.generation import agenerate_json, assemble_quiz, deduplicate_questions, generate_json, generate_quiz_map_reduce, split_transcript
+from quizly_app.api.jobs import resume_unfinished_jobs, submit_quiz_job
+from quizly_app.api.pipeline_cache import pipeline_cache
+from quizly_app.api.quiz_logic import create_quiz_pipeline, extract_video_id, obtain_transcript, save_quizzes_bulk, stream_quiz_pipeline
+from quizly_app.api.instrumentation import Counter, Histogram, MetricsRegistry, registry
+from quizly_app.api.multimodal import (
+    agenerate_quiz_from_audio, generate_quiz_from_audio, generate_quiz_from_youtube_url,
+)
+from quizly_app.api import scratch
+from quizly_app.api.scheduler import ModelCallScheduler
+from quizly_app.api.scratch import ScratchSpace, ScratchSpaceExhaustedError
+from quizly_app.api import renderers
+from quizly_app.api.renderers import FastJSONRenderer
+from quizly_app.api.search import SEARCH_TABLE, DatabaseSearchBackend
+from quizly_app.api.singleflight import CoalescedCallCancelledError, SingleFlight
+from quizly_app.api.serializers import QuizSerializer
+from quizly_app.api.transcription import GeminiTranscriptionBackend
+from quizly_app.api.views import QuizListView
+from quizly_app.api.workers import WORKER_ID
+
+
+def setUpModule():
+    # Requests of the test client must not resume jobs or register the test process as worker
+    request_started.disconnect(dispatch_uid='quizly_resume_jobs')
+
+
+def quiz_item(title='Photosynthese', answer='Licht', video_id='aaaaaaaaaaa'):
+    return {'video_url': f'https://www.youtube.com/watch?v={video_id}', 'title': title, 'description': 'Pflanzen und Licht',
+            'questions': [{'question_title': 'Was braucht Chlorophyll?', 'question_options': ['Licht', 'Wasser'], 'answer': answer}]}
+
+
+class PipelineCacheTests(TestCase):
+    """
+    Quizzes are cached by canonical video id, so every URL form of a video shares one entry.
+    """
+    def test_video_id_of_url_forms(self):
+        urls = {
+            'https://www.youtube.com/watch?v=dQw4w9WgXcQ': 'dQw4w9WgXcQ',
+            'https://m.youtube.com/watch?feature=share&v=dQw4w9WgXcQ&t=42s': 'dQw4w9WgXcQ',
+            ' https://youtu.be/dQw4w9WgXcQ?si=abc ': 'dQw4w9WgXcQ',
+            'https://www.youtube.com/shorts/dQw4w9WgXcQ': 'dQw4w9WgXcQ',
+            'https://www.youtube.com/embed/dQw4w9WgXcQ': 'dQw4w9WgXcQ',
+            'https://www.youtube.com/watch?v=short': None,
+            'https://www.youtube.com/playlist?list=PL123': None,
+            'https://vimeo.com/dQw4w9WgXcQ': None,
+            'not a url': None,
+        }
+        for url, video_id in urls.items():
+            with self.subTest(url=url):
+                self.assertEqual(extract_video_id(url), video_id)
+
+    def test_second_request_for_a_video_is_served_from_cache(self):
+        def downloads(extract_info):
+            return [call for call in extract_info.call_args_list if call.kwargs.get('download', True)]
+
+        user = User.objects.create(username='owner')
+        video_id = random_video_id()
+        with fake_backends(transcript_chars=2000), mock.patch.object(FakeModels, 'generate_content', autospec=True, side_effect=FakeModels.generate_content) as generate, \
+                mock.patch.object(FakeYoutubeDL, 'extract_info', autospec=True, side_effect=FakeYoutubeDL.extract_info) as extract_info:
+            create_quiz_pipeline(user, f'https://www.youtube.com/watch?v={video_id}')
+            hits = pipeline_cache.stats()['quiz']['hits']
+            self.assertGreater(generate.call_count, 0)
+            self.assertTrue(downloads(extract_info))
+            generate.reset_mock()
+            extract_info.reset_mock()
+            quiz = create_quiz_pipeline(user, f'https://youtu.be/{video_id}')
+        self.assertEqual(generate.call_count, 0)
+        self.assertFalse(downloads(extract_info))
+        self.assertEqual(pipeline_cache.stats()['quiz']['hits'], hits + 1)
+        self.assertEqual(quiz.questions.count(), Quiz.objects.exclude(pk=quiz.pk).get().questions.count())
+
+
+JSON3_CAPTIONS = json.dumps({'events': [
+    {'tStartMs': 0, 'segs': [{'utf8': 'Heute geht es um '}, {'utf8': 'Photosynthese.'}]},
+    {'tStartMs': 1500, 'segs': [{'utf8': '\n'}]},
+    {'tStartMs': 2000},
+    {'tStartMs': 3000, 'segs': [{'utf8': 'Pflanzen   brauchen\nLicht & Wasser.'}]},
+]})
+VTT_CAPTIONS = """WEBVTT
+Kind: captions
+Language: de
+
+00:00:00.000 --> 00:00:01.500
+Heute geht es um <c>Photosynthese.</c>
+
+00:00:01.500 --> 00:00:03.000
+Heute geht es um <c>Photosynthese.</c>
+Pflanzen brauchen Licht &amp; Wasser.
+"""
+
+
+def caption_track(ext, language='de'):
+    return {'ext': ext, 'url': f'https://captions.example/{language}.{ext}'}
+
+
+class CaptionTests(TestCase):
+    """
+    Caption tracks are parsed to plain text, manual subtitles win over automatic captions and videos without a usable
+    track are transcribed from their audio.
+    """
+    def test_parse_caption_documents(self):
+        self.assertEqual(parse_json3_captions(JSON3_CAPTIONS), 'Heute geht es um Photosynthese. Pflanzen brauchen Licht & Wasser.')
+        self.assertEqual(parse_json3_captions('{}'), '')
+        self.assertEqual(parse_vtt_captions(VTT_CAPTIONS), 'Heute geht es um Photosynthese. Pflanzen brauchen Licht & Wasser.')
+
+    def test_track_selection(self):
+        video_info = {'subtitles': {'de-DE': [caption_track('vtt', 'de-DE'), caption_track('json3', 'de-DE')]},
+                      'automatic_captions': {'de': [caption_track('json3')]}}
+        track = select_caption_track(video_info)
+        self.assertEqual((track['language'], track['ext'], track['automatic']), ('de-DE', 'json3', False))
+        video_info = {'subtitles': {'fr': [caption_track('json3', 'fr')], 'en': [caption_track('srv3', 'en')]},
+                      'automatic_captions': {'en-orig': [caption_track('vtt', 'en-orig')]}}
+        track = select_caption_track(video_info)
+        self.assertEqual((track['language'], track['ext'], track['automatic']), ('en-orig', 'vtt', True))
+        self.assertIsNone(select_caption_track({'subtitles': {'fr': [caption_track('json3', 'fr')]}, 'automatic_captions': None}))
+
+    def transcribe(self, video_info, caption_text):
+        video_id = random_video_id()
+        with fake_backends(transcript_chars=2000), \
+                mock.patch.object(FakeYoutubeDL, 'urlopen', create=True, side_effect=lambda url: io.BytesIO(caption_text.encode())), \
+                mock.patch.object(FakeYoutubeDL, 'extract_info', autospec=True, side_effect=FakeYoutubeDL.extract_info) as extract_info:
+            transcript = obtain_transcript(f'https://www.youtube.com/watch?v={video_id}', video_info={'id': video_id, 'duration': 600, **video_info})
+        return transcript, extract_info.call_count
+
+    def test_captions_replace_audio_transcription(self):
+        caption_text = json.dumps({'events': [{'segs': [{'utf8': 'Photosynthese im Blatt. ' * 20}]}]})
+        transcript, downloads = self.transcribe({'subtitles': {'de': [caption_track('json3')]}}, caption_text)
+        self.assertTrue(transcript.startswith('Photosynthese im Blatt.'))
+        self.assertEqual(downloads, 0)
+
+    def test_audio_is_transcribed_without_usable_captions(self):
+        for video_info, caption_text in (({}, ''), ({'subtitles': {'de': [caption_track('json3')]}}, JSON3_CAPTIONS),
+                                         ({'automatic_captions': {'de': [caption_track('json3')]}}, 'not json'),
+                                         ({'subtitles': {'de': [caption_track('srv3')]}}, JSON3_CAPTIONS)):
+            with self.subTest(video_info=video_info):
+                transcript, downloads = self.transcribe(video_info, caption_text)
+                self.assertTrue(transcript.startswith('Im Video wird erklärt'))
+                self.assertEqual(downloads, 1)
+
+
+class VideoProbeTests(TestCase):
+    """
+    Videos the pipeline would fail on are rejected with 422 by the metadata probe, before anything is downloaded.
+    """
+    def test_long_and_live_videos_are_rejected_before_download(self):
+        user = User.objects.create(username='owner')
+        client = APIClient()
+        client.force_authenticate(user)
+        rejected = ({'duration': 5 * 60 * 60}, {'live_status': 'is_live'}, {'is_live': True}, {'availability': 'private'})
+        for overrides in rejected:
+            def extract_info(ydl, url, download=True):
+                return {**ydl._info(url), **overrides}
+
+            for background in (False, True):
+                with self.subTest(overrides=overrides, background=background), fake_backends(), \
+                        mock.patch.object(FakeYoutubeDL, 'extract_info', autospec=True, side_effect=extract_info) as probe, \
+                        mock.patch.object(FakeModels, 'generate_content') as generate:
+                    response = client.post('/api/createQuiz/', {'url': f'https://www.youtube.com/watch?v={random_video_id()}', 'background': background}, format='json')
+                    self.assertEqual(response.status_code, 422)
+                    self.assertEqual([call.kwargs['download'] for call in probe.call_args_list], [False])
+                    generate.assert_not_called()
+        self.assertFalse(Quiz.objects.exists())
+        self.assertFalse(QuizJob.objects.exists())
+
+
+class ScratchSpaceTests(SimpleTestCase):
+    """
+    Reservations wait for free quota, job directories are removed on success and failure and directories of
+    stopped processes are removed at startup.
+    """
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.space = ScratchSpace(root=self.root, quota_bytes=100, wait_timeout=5, poll_interval=0.01)
+
+    def test_reservation_waits_until_quota_is_released(self):
+        first = self.space.acquire(80, label='first')
+        acquired = []
+        waiter = threading.Thread(target=lambda: acquired.append(self.space.acquire(50, label='second')))
+        waiter.start()
+        waiter.join(0.2)
+        self.assertEqual(acquired, [])
+        self.space.release(first)
+        waiter.join(5)
+        self.assertEqual([scratch_dir.label for scratch_dir in acquired], ['second'])
+        self.assertFalse(os.path.exists(first.path))
+        self.assertEqual(self.space.stats()['reserved_bytes'], 50)
+
+    def test_reservation_times_out(self):
+        self.space.wait_timeout = 0.05
+        self.space.acquire(80)
+        with self.assertRaises(ScratchSpaceExhaustedError) as raised:
+            self.space.acquire(50)
+        self.assertEqual(raised.exception.status_code, 503)
+
+    def test_job_directory_is_released_on_failure(self):
+        with self.assertRaises(RuntimeError):
+            with self.space.job_dir(80, label='failing') as scratch_dir:
+                with open(os.path.join(scratch_dir.path, 'audio.opus'), 'wb') as audio:
+                    audio.write(b'\0' * 10)
+                raise RuntimeError('Download failed')
+        self.assertFalse(os.path.exists(scratch_dir.path))
+        self.assertEqual(self.space.stats()['reserved_bytes'], 0)
+        [finished] = self.space.stats()['recent_jobs']
+        self.assertEqual(finished['label'], 'failing')
+        self.assertGreaterEqual(finished['peak_bytes'], 10)
+
+    def test_stale_directories_are_removed_at_startup(self):
+        stopped = subprocess.Popen([sys.executable, '-c', 'pass'])
+        stopped.wait()
+        names = (f'{stopped.pid}-stale', f'{os.getpid()}-own', 'not-a-job')
+        for name in names:
+            os.makedirs(os.path.join(self.root, name))
+        with mock.patch.object(scratch, 'scratch_space', self.space), override_settings(QUIZLY_JOB_RESUME_ON_STARTUP=False):
+            apps.get_app_config('quizly_app').ready()
+        self.assertEqual(sorted(os.listdir(self.root)), sorted([names[1], names[2], '.lock']))
+
+
+class JobResumeTests(TestCase):
+    """
+    Interrupted jobs are taken over by live processes, jobs of live workers are left alone.
+    """
+    def setUp(self):
+        self.user = User.objects.create(username='owner')
+
+    def create_job(self, worker, status=QuizJob.STATUS_RUNNING, **fields):
+        return QuizJob.objects.create(owner=self.user, video_url='https://www.youtube.com/watch?v=aaaaaaaaaaa', status=status, worker=worker, **fields)
+
+    def resume(self):
+        with mock.patch('quizly_app.api.jobs.enqueue_job') as enqueue_job:
+            resume_unfinished_jobs()
+        return [call.args[0] for call in enqueue_job.call_args_list]
+
+    def test_job_of_previous_process_with_same_hostname_and_pid_is_resumed(self):
+        JobWorker.objects.create(pk='previous', hostname=socket.gethostname(), pid=os.getpid(), heartbeat_at=timezone.now())
+        job = self.create_job('previous', attempts=1)
+        self.assertEqual(self.resume(), [job.pk])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), (QuizJob.STATUS_PENDING, WORKER_ID))
+
+    def test_job_of_unregistered_worker_is_resumed(self):
+        job = self.create_job('host:1234', attempts=1)
+        self.assertEqual(self.resume(), [job.pk])
+
+    def test_jobs_of_live_worker_are_left_alone(self):
+        JobWorker.objects.create(pk='other', hostname='other-host', pid=1, heartbeat_at=timezone.now())
+        running = self.create_job('other', attempts=1)
+        self.create_job('other', status=QuizJob.STATUS_PENDING)
+        self.assertEqual(self.resume(), [])
+        running.refresh_from_db()
+        self.assertEqual((running.status, running.worker), (QuizJob.STATUS_RUNNING, 'other'))
+
+    def test_jobs_of_worker_without_heartbeat_are_resumed(self):
+        JobWorker.objects.create(pk='other', hostname='other-host', pid=1, heartbeat_at=timezone.now() - timedelta(hours=1))
+        running = self.create_job('other', attempts=1)
+        pending = self.create_job('other', status=QuizJob.STATUS_PENDING)
+        self.assertCountEqual(self.resume(), [running.pk, pending.pk])
+
+    def test_job_out_of_attempts_fails(self):
+        job = self.create_job('host:1234', attempts=3)
+        self.assertEqual(self.resume(), [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, QuizJob.STATUS_FAILED)
+
+    @mock.patch('quizly_app.api.jobs.worker_registry')
+    def test_job_is_marked_failed_when_queue_is_full(self, worker_registry):
+        with mock.patch('quizly_app.api.jobs.enqueue_job', side_effect=JobQueueFullError('full')):
+            with self.assertRaises(JobQueueFullError), self.captureOnCommitCallbacks(execute=True):
+                job = submit_quiz_job(self.user, 'https://www.youtube.com/watch?v=aaaaaaaaaaa')
+        job.refresh_from_db()
+        self.assertEqual(job.status, QuizJob.STATUS_FAILED)
+
+
+class SegmentRetryTests(TestCase):
+    """
+    Segments are retried for failures outside the model scheduler only, which retries model calls itself.
+    """
+    def transcribe(self, *failures):
+        calls = []
+
+        def transcribe(path):
+            calls.append(path)
+            if len(calls) <= len(failures):
+                raise failures[len(calls) - 1]
+            return 'text'
+        with mock.patch('tenacity.nap.time.sleep'):
+            try:
+                return transcribe_segment(transcribe, 'segment.m4a'), len(calls)
+            except Exception as e:
+                return e, len(calls)
+
+    def test_upload_failure_is_retried(self):
+        self.assertEqual(self.transcribe(OSError('upload interrupted')), ('text', 2))
+
+    def test_model_failure_is_not_retried_again(self):
+        error, calls = self.transcribe(ModelUnavailableError('unavailable'))
+        self.assertIsInstance(error, ModelUnavailableError)
+        self.assertEqual(calls, 1)
+
+
+class ModelCallSchedulerTests(TestCase):
+    """
+    Model call failures that run out of retries are translated into pipeline errors.
+    """
+    def call(self, error):
+        scheduler = ModelCallScheduler(requests_per_minute=1000, tokens_per_minute=1000000, max_attempts=2)
+
+        def fail():
+            raise error
+        with mock.patch('tenacity.nap.time.sleep'), self.assertRaises(ModelUnavailableError):
+            scheduler.call(fail, tokens=1)
+        return scheduler.stats()
+
+    def test_network_errors_are_translated_after_retries(self):
+        for error in (ConnectionError('reset'), TimeoutError('timed out')):
+            self.assertEqual(self.call(error)['retries'], 1)
+
+
+class ModelAnswerTests(TestCase):
+    """
+    Empty, blocked and malformed model answers become `InvalidQuizDataError` instead of a ValueError or TypeError.
+    """
+    def test_unusable_answers_are_translated(self):
+        youtube_url = 'https://www.youtube.com/watch?v=aaaaaaaaaaa'
+        for text in (None, '', '{"title": "Photosynth', '["Licht"]'):
+            with self.subTest(text=text), fake_backends(), mock.patch.object(FakeModels, '_answer', return_value=SimpleNamespace(text=text, usage_metadata=None)):
+                for generate in (lambda: generate_json('Prompt'), lambda: asyncio.run(agenerate_json('Prompt')),
+                                 lambda: generate_quiz_from_youtube_url(youtube_url, {'duration': 60})):
+                    with self.assertRaises(InvalidQuizDataError) as raised:
+                        generate()
+                    self.assertEqual(raised.exception.status_code, 502)
+
+
+class MapReduceGenerationTests(SimpleTestCase):
+    """
+    Long transcripts are split at sentence boundaries, candidate questions are de-duplicated and the selection is
+    filled up to the requested question count.
+    """
+    def test_split_at_sentence_boundaries(self):
+        sentences = [f'Satz {index} handelt von Photosynthese.' for index in range(40)]
+        sections = split_transcript(' '.join(sentences), 200)
+        self.assertGreater(len(sections), 1)
+        for section in sections:
+            self.assertLessEqual(len(section), 200)
+            self.assertTrue(section.startswith('Satz ') and section.endswith('.'))
+        self.assertEqual(' '.join(sections), ' '.join(sentences))
+
+    def test_split_keeps_long_sentences_and_line_breaks(self):
+        long_sentence = 'Licht ' * 60 + 'ist wichtig.'
+        sections = split_transcript(f'Kurz.\n{long_sentence} Ende!', 100)
+        self.assertEqual(sections, ['Kurz.', long_sentence, 'Ende!'])
+        self.assertEqual(split_transcript('  ', 100), [])
+
+    def test_deduplicate_questions(self):
+        questions = [{'question_title': 'Was braucht eine Pflanze?'}, {'question_title': 'was braucht  eine Pflanze'},
+                     {'question_title': ''}, {'answer': 'Licht'}, {'question_title': 'Wo findet Photosynthese statt?'},
+                     {'question_title': 'Was-braucht eine Pflanze ?'}]
+        self.assertEqual(deduplicate_questions(questions), [questions[0], questions[4]])
+
+    def test_assemble_fills_up_to_question_count(self):
+        candidates = [{'question_title': f'Frage {index}?'} for index in range(5)]
+        selection = {'title': 'Photosynthese', 'description': 'Licht', 'selected': [3, 3, 'eins', 99, -1, 1]}
+        quiz = assemble_quiz(selection, candidates, 4)
+        self.assertEqual(quiz['title'], 'Photosynthese')
+        self.assertEqual(quiz['questions'], [candidates[3], candidates[1], candidates[0], candidates[2]])
+        self.assertEqual(assemble_quiz({}, candidates, 10)['questions'], candidates)
+
+    def test_map_reduce_selects_from_unique_candidates(self):
+        prompts = []
+
+        def answer(prompt, model=None):
+            prompts.append(prompt)
+            if model is not None:
+                return {'title': 'Photosynthese', 'description': 'Licht', 'selected': [2]}
+            section = len(prompts)
+            return {'summary': f'Abschnitt {section}', 'questions': [
+                {'question_title': 'Was braucht eine Pflanze?', 'question_options': ['Licht', 'Wasser'], 'answer': 'Licht'},
+                {'question_title': f'Frage zu Abschnitt {section}?', 'question_options': ['Ja', 'Nein'], 'answer': 'Ja'}]}
+
+        text = ' '.join(f'Satz {index} handelt von Photosynthese.' for index in range(40))
+        with override_settings(QUIZLY_SECTION_CHARS=400, QUIZLY_GENERATION_WORKERS=1), mock.patch.object(generation, 'generate_json', answer):
+            quiz = generate_quiz_map_reduce(text, 3)
+        titles = [question['question_title'] for question in quiz['questions']]
+        self.assertEqual(len(prompts), len(split_transcript(text, 400)) + 1)
+        self.assertEqual(titles, ['Frage zu Abschnitt 2?', 'Was braucht eine Pflanze?', 'Frage zu Abschnitt 1?'])
+        self.assertIn('Abschnitt 1', prompts[-1])
+
+
+class UploadedFileCleanupTests(TestCase):
+    """
+    A failed delete of an uploaded audio file is logged and neither replaces the error of the model call nor fails a
+    successful one.
+    """
+    def setUp(self):
+        audio = tempfile.NamedTemporaryFile(suffix='.opus')
+        audio.write(b'\0' * 1024)
+        audio.flush()
+        self.addCleanup(audio.close)
+        self.audio_path = audio.name
+
+    def run_with_failing_delete(self, call):
+        with fake_backends(transcript_chars=200), \
+                mock.patch.object(FakeFiles, 'delete', side_effect=ConnectionError('delete failed')) as delete, \
+                mock.patch.object(FakeAsyncFiles, 'delete', side_effect=ConnectionError('delete failed')) as adelete, \
+                self.assertLogs('quizly_app.api', 'WARNING'):
+            result = call()
+        self.assertEqual(delete.call_count + adelete.call_count, 1)
+        return result
+
+    def test_transcription(self):
+        backend = GeminiTranscriptionBackend()
+        for transcribe in (lambda: backend.transcribe(self.audio_path), lambda: asyncio.run(backend.atranscribe(self.audio_path))):
+            self.assertTrue(self.run_with_failing_delete(transcribe).startswith('Im Video'))
+
+            def failing():
+                with mock.patch.object(FakeModels, '_answer', side_effect=ModelUnavailableError('Gemini is overloaded.')):
+                    transcribe()
+            with self.assertRaisesMessage(ModelUnavailableError, 'Gemini is overloaded.'):
+                self.run_with_failing_delete(failing)
+
+
+    def test_multimodal_generation(self):
+        for generate in (lambda: generate_quiz_from_audio(self.audio_path),
+                         lambda: asyncio.run(agenerate_quiz_from_audio(self.audio_path))):
+            quiz_json, transcript = self.run_with_failing_delete(generate)
+            self.assertTrue(quiz_json['questions'])
+            self.assertTrue(transcript)
+
+            def failing():
+                with mock.patch.object(FakeModels, '_answer', side_effect=ModelUnavailableError('Gemini is overloaded.')):
+                    generate()
+            with self.assertRaisesMessage(ModelUnavailableError, 'Gemini is overloaded.'):
+                self.run_with_failing_delete(failing)
+
+class StreamPipelineTests(TestCase):
+    """
+    The streaming pipeline saves the quiz with its title, records the run with its tokens and shares results with coalesced callers.
+    """
+    def test_quiz_is_saved_with_title_and_run_is_recorded(self):
+        user = User.objects.create(username='owner')
+        video_id = random_video_id()
+        events = []
+        with fake_backends(transcript_chars=2000):
+            for event, value in stream_quiz_pipeline(user, f'https://www.youtube.com/watch?v={video_id}'):
+                events.append(event)
+                if event in ('quiz', 'question'):
+                    self.assertFalse(Quiz.objects.filter(owner=user, title='').exists())
+        self.assertEqual(events[-1], 'done')
+        self.assertLess(events.index('quiz'), events.index('question'))
+        run = PipelineRun.objects.get(video_id=video_id)
+        self.assertTrue(run.succeeded)
+        self.assertEqual(run.model_calls, 2)
+        self.assertGreater(run.output_tokens, 0)
+
+    def test_truncated_stream_ends_with_error_event_and_deletes_quiz(self):
+        user = User.objects.create(username='owner')
+        client = APIClient()
+        client.force_authenticate(user)
+        generate_content_stream = FakeModels.generate_content_stream
+
+        def truncated(models, model, contents, config=None):
+            chunks = list(generate_content_stream(models, model, contents, config))
+            return chunks[:len(chunks) // 2]
+
+        with fake_backends(transcript_chars=2000), mock.patch.object(FakeModels, 'generate_content_stream', truncated):
+            response = client.post('/api/createQuiz/stream/', {'url': f'https://www.youtube.com/watch?v={random_video_id()}'}, format='json')
+            content = b''.join(response.streaming_content).decode()
+        self.assertIn('event: quiz\n', content)
+        event, data = content.rsplit('event: ', 1)[1].split('\n')[:2]
+        self.assertEqual(event, 'error')
+        self.assertIn('Gemini returned invalid JSON', data)
+        self.assertFalse(Quiz.objects.exists())
+        self.assertFalse(PipelineRun.objects.get().succeeded)
+
+    def test_callers_arriving_during_a_stream_get_its_result(self):
+        single_flight = SingleFlight(lock_dir=tempfile.mkdtemp(), result_ttl=60)
+        waiting = threading.Event()
+        results = []
+
+        class WaitingEvent(threading.Event):
+            def wait(self, timeout=None):
+                waiting.set()
+                return super().wait(timeout)
+
+        def generate():
+            yield 'event'
+            return {'title': 'shared'}
+        stream = single_flight.stream('video', generate)
+        self.assertEqual(next(stream), 'event')
+        single_flight._calls['video'].event = WaitingEvent()
+        waiter = threading.Thread(target=lambda: results.append(single_flight.do('video', lambda: {'title': 'own'})))
+        waiter.start()
+        self.assertTrue(waiting.wait(5))
+        with self.assertRaises(StopIteration) as finished:
+            next(stream)
+        waiter.join(5)
+        self.assertEqual(finished.exception.value, {'title': 'shared'})
+        self.assertEqual(results, [{'title': 'shared'}])
+
+
+class SingleFlightCancelTests(SimpleTestCase):
+    """
+    Callers waiting for a coalesced call get a 503 when the first caller is cancelled instead of hanging or getting None.
+    """
+    def setUp(self):
+        lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(lock_dir.cleanup)
+        self.single_flight = SingleFlight(lock_dir=lock_dir.name, result_ttl=60)
+
+    def test_async_followers_fail_when_leader_is_cancelled(self):
+        async def scenario():
+            started = asyncio.Event()
+
+            async def generate():
+                started.set()
+                await asyncio.Event().wait()
+
+            leader = asyncio.create_task(self.single_flight.ado('video', generate))
+            await started.wait()
+            follower = asyncio.create_task(self.single_flight.ado('video', generate))
+            await asyncio.sleep(0)
+            leader.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            with self.assertRaises(CoalescedCallCancelledError) as raised:
+                await asyncio.wait_for(follower, 5)
+            return raised.exception
+
+        self.assertEqual(asyncio.run(scenario()).status_code, 503)
+        self.assertEqual(self.single_flight._async_calls, {})
+
+    def test_cancelled_caller_waiting_for_file_lock_of_other_process(self):
+        async def scenario():
+            calls = []
+
+            async def generate():
+                calls.append(1)
+                return {'title': 'own'}
+
+            waiting = asyncio.create_task(self.single_flight.ado('video', generate))
+            await asyncio.sleep(0.1)
+            waiting.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiting
+            fcntl.flock(other_process, fcntl.LOCK_UN)
+            result = await asyncio.wait_for(self.single_flight.ado('video', generate), 5)
+            return result, calls
+
+        with open(os.path.join(self.single_flight.lock_dir, 'video.lock'), 'a') as other_process:
+            fcntl.flock(other_process, fcntl.LOCK_EX)
+            self.assertEqual(asyncio.run(scenario()), ({'title': 'own'}, [1]))
+
+    def test_followers_fail_when_leader_is_interrupted(self):
+        started, waiting, errors = threading.Event(), threading.Event(), []
+
+        class WaitingEvent(threading.Event):
+            def wait(self, timeout=None):
+                waiting.set()
+                return super().wait(timeout)
+
+        def interrupted():
+            started.set()
+            waiting.wait(5)
+            raise KeyboardInterrupt
+
+        def follow():
+            try:
+                self.single_flight.do('video', lambda: {'title': 'own'})
+            except CoalescedCallCancelledError as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=lambda: self.assertRaises(KeyboardInterrupt, self.single_flight.do, 'video', interrupted))
+        leader.start()
+        self.assertTrue(started.wait(5))
+        self.single_flight._calls['video'].event = WaitingEvent()
+        follower = threading.Thread(target=follow)
+        follower.start()
+        leader.join(5)
+        follower.join(5)
+        self.assertEqual([e.status_code for e in errors], [503])
+
+
+class TranscriptStorageTests(TestCase):
+    """
+    Transcripts are stored compressed and quizzes are regenerated from them without download or transcription.
+    """
+    def setUp(self):
+        self.user = User.objects.create(username='owner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_compression_round_trip(self):
+        text = 'Photosynthese wandelt Licht in chemische Energie um – Blätter, Wurzeln und Stängel. ' * 200
+        transcript = Transcript(video_id='aaaaaaaaaaa', video_url='https://www.youtube.com/watch?v=aaaaaaaaaaa')
+        transcript.text = text
+        transcript.save()
+        stored = Transcript.objects.get(video_id='aaaaaaaaaaa')
+        self.assertEqual(stored.text, text)
+        self.assertEqual(stored.char_count, len(text))
+        self.assertLess(len(bytes(stored.compressed_text)), len(text.encode('utf-8')) // 10)
+
+    def test_regenerate_uses_the_stored_transcript(self):
+        with fake_backends(transcript_chars=2000):
+            quiz = create_quiz_pipeline(self.user, f'https://www.youtube.com/watch?v={random_video_id()}')
+            pipeline_cache.clear()
+            with mock.patch.object(FakeYoutubeDL, 'extract_info') as extract_info, mock.patch.object(FakeFiles, 'upload') as upload, \
+                    mock.patch.object(FakeModels, 'generate_content', autospec=True, side_effect=FakeModels.generate_content) as generate:
+                response = self.client.post(f'/api/quizzes/{quiz.pk}/regenerate/', {'question_count': 3, 'difficulty': 'hard'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['questions']), 3)
+        self.assertEqual(Question.objects.filter(quiz=quiz).count(), 3)
+        extract_info.assert_not_called()
+        upload.assert_not_called()
+        [call] = generate.call_args_list
+        self.assertIn(quiz.transcript.text[:100], call.kwargs['contents'])
+        self.assertIn('schwer', call.kwargs['contents'])
+
+    def test_regenerate_without_stored_transcript(self):
+        quiz = save_quizzes_bulk(self.user, [quiz_item()])[0]
+        with fake_backends(), mock.patch.object(FakeModels, 'generate_content') as generate:
+            response = self.client.post(f'/api/quizzes/{quiz.pk}/regenerate/', {}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('No transcript is stored', response.json()['error'])
+        generate.assert_not_called()
+        self.assertEqual(Question.objects.filter(quiz=quiz).count(), 1)
+
+    def test_regenerate_other_users_quiz(self):
+        quiz = save_quizzes_bulk(User.objects.create(username='other'), [quiz_item()])[0]
+        response = self.client.post(f'/api/quizzes/{quiz.pk}/regenerate/', {}, format='json')
+        self.assertIn(response.status_code, (403, 404))
+
+
+class InstrumentationTests(TestCase):
+    """
+    Requests carry a `Server-Timing` header with their pipeline stages and the metrics are served in the Prometheus
+    text format.
+    """
+    def setUp(self):
+        self.user = User.objects.create(username='owner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header_lists_the_stages(self):
+        with fake_backends(transcript_chars=2000):
+            response = self.client.post('/api/createQuiz/', {'url': f'https://www.youtube.com/watch?v={random_video_id()}'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        entries = dict(entry.split(';', 1) for entry in response['Server-Timing'].split(', '))
+        self.assertLessEqual({'probe', 'captions', 'download', 'transcribe', 'generate', 'total'}, set(entries))
+        self.assertEqual(list(entries)[-1], 'total')
+        for name, params in entries.items():
+            self.assertRegex(params, r'^dur=\d+\.\d(;desc="\d+x")?$', name)
+        self.assertIn('quizly_stage_duration_seconds_count{stage="generate",outcome="ok"}', registry.render())
+
+    def test_exposition_format(self):
+        metrics = MetricsRegistry()
+        calls = metrics.register(Counter('calls_total', 'Calls.', ('kind',)))
+        duration = metrics.register(Histogram('duration_seconds', 'Duration.', ('stage',), buckets=(0.5, 1)))
+        calls.inc(2, kind='say "hi"\n')
+        duration.observe(0.25, stage='probe')
+        duration.observe(0.75, stage='probe')
+        duration.observe(3, stage='probe')
+        self.assertEqual(metrics.render(), '\n'.join([
+            '# HELP calls_total Calls.',
+            '# TYPE calls_total counter',
+            'calls_total{kind="say \\"hi\\"\\n"} 2',
+            '# HELP duration_seconds Duration.',
+            '# TYPE duration_seconds histogram',
+            'duration_seconds_bucket{stage="probe",le="0.5"} 1',
+            'duration_seconds_bucket{stage="probe",le="1.0"} 2',
+            'duration_seconds_bucket{stage="probe",le="+Inf"} 3',
+            'duration_seconds_sum{stage="probe"} 4.0',
+            'duration_seconds_count{stage="probe"} 3',
+        ]) + '\n')
+
+    def test_metrics_view(self):
+        with override_settings(QUIZLY_METRICS_TOKEN='scraper-token'):
+            response = APIClient().get('/api/metrics/', HTTP_AUTHORIZATION='Bearer scraper-token')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+            self.assertIn('# TYPE quizly_http_request_duration_seconds histogram', response.content.decode())
+            self.assertIn(APIClient().get('/api/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code, (401, 403))
+        with override_settings(QUIZLY_METRICS_TOKEN=''):
+            self.assertIn(self.client.get('/api/metrics/').status_code, (401, 403))
+            self.user.is_staff = True
+            self.assertEqual(self.client.get('/api/metrics/').status_code, 200)
+            self.assertIn('quizly_http_request_duration_seconds_count{endpoint="metrics",method="GET",status="200"}', self.client.get('/api/metrics/').content.decode())
+
+
+class QuizImportTests(TestCase):
+    """
+    Imports are validated as a whole and saved in one transaction.
+    """
+    def setUp(self):
+        self.user = User.objects.create(username='owner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_import_saves_all_quizzes(self):
+        response = self.client.post('/api/quizzes/import/', {'quizzes': [quiz_item(), quiz_item('Zellbiologie')]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Quiz.objects.filter(owner=self.user).count(), 2)
+        self.assertEqual(Question.objects.filter(quiz__owner=self.user).count(), 2)
+
+    def test_invalid_item_imports_nothing(self):
+        response = self.client.post('/api/quizzes/import/', {'quizzes': [quiz_item(), quiz_item(answer='Erde')]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Quiz.objects.exists())
+
+    def test_failed_question_insert_rolls_back_quizzes(self):
+        with mock.patch.object(Question.objects, 'bulk_create', side_effect=RuntimeError('insert failed')), self.assertRaises(RuntimeError):
+            save_quizzes_bulk(self.user, [quiz_item()])
+        self.assertFalse(Quiz.objects.exists())
+
+
+class QuizListTests(TestCase):
+    """
+    The quiz list only contains the quizzes of the requesting user, also with filters and without the filter backend.
+    """
+    def setUp(self):
+        self.user = User.objects.create(username='owner')
+        self.other = User.objects.create(username='other')
+        self.own = save_quizzes_bulk(self.user, [quiz_item()])[0]
+        save_quizzes_bulk(self.other, [quiz_item()])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_contains_own_quizzes_only(self):
+        for query in ({}, {'video_url': 'https://www.youtube.com/watch?v=aaaaaaaaaaa'}):
+            response = self.client.get('/api/quizzes/', query)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([quiz['id'] for quiz in response.json()['results']], [self.own.pk])
+
+    def test_list_is_scoped_without_filter_backend(self):
+        with mock.patch.object(QuizListView, 'filter_backends', []):
+            response = self.client.get('/api/quizzes/')
+        self.assertEqual([quiz['id'] for quiz in response.json()['results']], [self.own.pk])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class CachedUserTests(TestCase):
+    """
+    Users resolved from access token cookies are cached, but deactivations, password changes and deletions take effect
+    with the next request.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='Photosynthese-1')
+
+    def get(self, client):
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get('/api/quizzes/')
+        return response.status_code, sum('FROM "auth_user"' in query['sql'] for query in captured)
+
+    def authenticated_client(self):
+        client = APIClient()
+        client.cookies['access_token'] = str(AccessToken.for_user(self.user))
+        return client
+
+    def test_user_is_resolved_once_per_token(self):
+        client = self.authenticated_client()
+        self.assertEqual(self.get(client), (200, 1))
+        self.assertEqual(self.get(client), (200, 0))
+
+    def test_deactivation_takes_effect_immediately(self):
+        client = self.authenticated_client()
+        self.assertEqual(self.get(client), (200, 1))
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get(client)[0], 401)
+
+    def test_password_change_takes_effect_immediately(self):
+        with mock.patch.object(jwt_settings, 'CHECK_REVOKE_TOKEN', True):
+            client = self.authenticated_client()
+            self.assertEqual(self.get(client), (200, 1))
+            self.assertEqual(self.get(client), (200, 0))
+            self.user.set_password('Photosynthese-2')
+            self.user.save()
+            self.assertEqual(self.get(client)[0], 401)
+
+    def test_deletion_takes_effect_immediately(self):
+        client = self.authenticated_client()
+        self.assertEqual(self.get(client), (200, 1))
+        self.user.delete()
+        self.assertEqual(self.get(client)[0], 401)
+
+
+class SparseFieldsetTests(TestCase):
+    """
+    `?fields=` and `?expand=` select the quiz fields, unknown names are rejected and questions are only read when asked
+    for. The detail ETag joins the questions for their timestamps, but their rows are only selected when expanded.
+    """
+    def setUp(self):
+        self.user = User.objects.create(username='owner')
+        self.quizzes = save_quizzes_bulk(self.user, [quiz_item(video_id='aaaaaaaaaaa'), quiz_item(video_id='bbbbbbbbbbb')])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, path, query, queries):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(path, query)
+        self.assertEqual(response.status_code, 200)
+        question_queries = [query['sql'] for query in captured if 'FROM "quizly_app_question"' in query['sql']]
+        self.assertEqual(len(question_queries), queries)
+        return response.json()
+
+    def test_unknown_fields_are_rejected(self):
+        for path in ('/api/quizzes/', f'/api/quizzes/{self.quizzes[0].pk}/', '/api/quizzes/search/'):
+            for query in ({'fields': 'title,owner'}, {'expand': 'owner'}):
+                with self.subTest(path=path, query=query):
+                    response = self.client.get(path, {'q': 'Photosynthese', **query})
+                    self.assertEqual(response.status_code, 400)
+                    self.assertEqual(list(response.json()), list(query))
+
+    def test_questions_are_only_read_when_expanded(self):
+        results = self.get('/api/quizzes/', {}, 0)['results']
+        self.assertEqual([set(quiz) for quiz in results], [{'id', 'title', 'created_at'}] * 2)
+        results = self.get('/api/quizzes/', {'fields': 'title,video_url'}, 0)['results']
+        self.assertEqual([set(quiz) for quiz in results], [{'title', 'video_url'}] * 2)
+        results = self.get('/api/quizzes/', {'fields': 'title', 'expand': 'questions'}, 1)['results']
+        self.assertEqual([len(quiz['questions']) for quiz in results], [1, 1])
+        quiz = self.get(f'/api/quizzes/{self.quizzes[0].pk}/', {'fields': 'title,description'}, 0)
+        self.assertEqual(quiz, {'title': 'Photosynthese', 'description': 'Pflanzen und Licht'})
+        self.assertEqual(len(self.get(f'/api/quizzes/{self.quizzes[0].pk}/', {}, 1)['questions']), 1)
+
+    def test_query_count_does_not_grow_with_the_page(self):
+        with self.assertNumQueries(2):
+            self.client.get('/api/quizzes/', {'fields': 'id,title,description,video_url'})
+        save_quizzes_bulk(self.user, [quiz_item(video_id=f'{index:011d}') for index in range(10)])
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/quizzes/', {'expand': 'questions'})
+        self.assertEqual(len(response.json()['results']), 12)
+
+
+class ConditionalReadTests(TestCase):
+    """
+    Quiz list and detail carry ETags, are answered with 304 while unchanged and are invalidated by changes.
+    """
+    def setUp(self):
+        self.user = User.objects.create(username='owner')
+        self.quiz = save_quizzes_bulk(self.user, [quiz_item()])[0]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertNotModifiedUntilChanged(self, path):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            question = self.quiz.questions.get()
+            question.question_title = 'Was braucht eine Pflanze?'
+            question.save()
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return response
+
+    def test_list(self):
+        response = self.assertNotModifiedUntilChanged('/api/quizzes/?expand=questions')
+        self.assertEqual(response.json()['results'][0]['questions'][0]['question_title'], 'Was braucht eine Pflanze?')
+
+    def test_detail(self):
+        response = self.assertNotModifiedUntilChanged(f'/api/quizzes/{self.quiz.pk}/')
+        self.assertEqual(response.json()['questions'][0]['question_title'], 'Was braucht eine Pflanze?')
+
+    def test_detail_of_other_user_is_forbidden(self):
+        other = User.objects.create(username='other')
+        client = APIClient()
+        client.force_authenticate(other)
+        self.assertIn(client.get(f'/api/quizzes/{self.quiz.pk}/').status_code, (403, 404))
+
+    def test_deleting_user_deletes_quizzes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertFalse(Quiz.objects.exists())
+        self.assertFalse(Question.objects.exists())
+
+
+class ReadPathRenderingTests(TestCase):
+    """
+    The values() read path with `FastJSONRenderer` renders the same bytes as `QuizSerializer` with `JSONRenderer`.
+    """
+    def setUp(self):
+        self.user = User.objects.create(username='owner')
+        special = quiz_item(title='Übung\u2028Zeile\u2029Ende – „Zitat“ 🌱', answer='Licht \\ "Sonne"', video_id='aaaaaaaaaaa')
+        special['description'] = None
+        special['questions'][0]['question_options'] = ['Licht \\ "Sonne"', 'Wasser\u2028', '</script>', 'ß']
+        save_quizzes_bulk(self.user, [special, quiz_item(video_id='bbbbbbbbbbb')])
+
+    def test_list_and_detail_match_the_serializer(self):
+        for fast_json in (renderers.orjson, None):
+            with self.subTest(orjson=fast_json is not None), mock.patch.object(renderers, 'orjson', fast_json):
+                expected = render_with_serializer(self.user, 10)
+                self.assertEqual(render_with_values(self.user, 10), expected)
+                self.assertIn(b'\\u2028', expected)
+                self.assertIn(b'"description":null', expected)
+                quiz = Quiz.objects.get(video_url__endswith='aaaaaaaaaaa')
+                client = APIClient()
+                client.force_authenticate(self.user)
+                response = client.get(f'/api/quizzes/{quiz.pk}/', HTTP_ACCEPT='application/json')
+                self.assertEqual(response.content, JSONRenderer().render(QuizSerializer(quiz).data))
+
+    def test_values_outside_the_quiz_schema(self):
+        data = {'aware': timezone.now(), 'naive': timezone.now().replace(tzinfo=None), 'date': timezone.now().date(),
+                'big': 10 ** 20, 'text': 'ü\u2028\u2029\x00', 'nested': [None, True, 1.5, {'id': 1}]}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class QuizSearchTests(TestCase):
+    """
+    Search finds only the quizzes of the requesting user, ranks title matches first and follows deletions.
+    """
+    def setUp(self):
+        self.user = User.objects.create(username='owner')
+        self.other = User.objects.create(username='other')
+        by_option = quiz_item(title='Zellatmung', video_id='bbbbbbbbbbb')
+        by_option['questions'][0]['question_options'] = ['Photosynthese', 'Glykolyse']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.by_title, self.by_option = save_quizzes_bulk(self.user, [quiz_item(title='Photosynthese', video_id='aaaaaaaaaaa'), by_option])
+            save_quizzes_bulk(self.other, [quiz_item(title='Photosynthese', video_id='ccccccccccc')])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, query):
+        response = self.client.get('/api/quizzes/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [quiz['id'] for quiz in response.json()['results']]
+
+    def test_results_are_owned_and_ranked(self):
+        self.assertEqual(self.search('Photosynthese'), [self.by_title.pk, self.by_option.pk])
+        self.assertEqual(self.search('photo'), [self.by_title.pk, self.by_option.pk])
+        self.assertEqual(self.search('Zellatmung Photo'), [self.by_option.pk])
+        self.assertEqual(self.search('"OR owner'), [])
+
+    def test_database_backend_is_scoped_to_owner(self):
+        quiz_ids = DatabaseSearchBackend().search(self.user.pk, 'Photosynthese', 0, 10)
+        self.assertEqual(sorted(quiz_ids), [self.by_title.pk])
+
+    def test_deleted_quizzes_leave_the_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT rowid FROM {SEARCH_TABLE}')
+            self.assertEqual(len(cursor.fetchall()), 1)
+
+
+class QuizBatchTests(TransactionTestCase):
+    """
+    Batch items run on real worker threads: failed items do not affect the others and saved items are visible
+    before the batch finished.
+    """
+    def setUp(self):
+        self.user = User.objects.create(username='owner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.runner = BatchRunner(workers=2, per_user=1, buffer_size=10, flush_interval=0.05)
+        self.release = threading.Event()
+        registry = mock.Mock(worker_id=WORKER_ID)
+        registry.live_worker_ids.return_value = {WORKER_ID}
+        for target, value in (('batch_runner', self.runner), ('worker_registry', registry), ('build_quiz_item', self.build_quiz_item)):
+            patcher = mock.patch.object(batches, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.release.set)
+
+    def build_quiz_item(self, youtube_url, **kwargs):
+        if youtube_url.endswith('rejected000'):
+            raise VideoRejectedError('Video is not available.')
+        if youtube_url.endswith('lastvideo00'):
+            self.release.wait(10)
+        return {**quiz_item(video_id=youtube_url[-11:]), 'video_metadata': {'title': 'Photosynthese'}}
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 10
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.02)
+
+    def test_partial_failure_and_progress(self):
+        urls = [f'https://www.youtube.com/watch?v={video_id}' for video_id in ('firstvideo0', 'rejected000', 'lastvideo00')]
+        with fake_backends():
+            batch = create_quiz_batch(self.user, urls)
+            first = batch.jobs.get(video_url=urls[0])
+            self.wait_for(lambda: QuizJob.objects.get(pk=first.pk).status == QuizJob.STATUS_SUCCEEDED)
+            self.assertIsNone(QuizBatch.objects.get(pk=batch.pk).finished_at)
+            self.assertEqual(self.client.get(f'/api/batches/{batch.pk}/').json()['status'], 'running')
+            self.release.set()
+            self.wait_for(lambda: QuizBatch.objects.get(pk=batch.pk).finished_at is not None)
+        response = self.client.get(f'/api/batches/{batch.pk}/').json()
+        self.assertEqual(response['status'], 'partial')
+        self.assertEqual([item['status'] for item in response['items']], ['succeeded', 'failed', 'succeeded'])
+        self.assertEqual(Quiz.objects.filter(owner=self.user).count(), 2)
+
+
+class BatchResumeTests(TestCase):
+    """
+    Only batches whose worker is gone are taken over.
+    """
+    def setUp(self):
+        self.user = User.objects.create(username='owner')
+        JobWorker.objects.create(pk='other', hostname='other-host', pid=1, heartbeat_at=timezone.now())
+
+    def create_batch(self, worker):
+        batch = QuizBatch.objects.create(owner=self.user, worker=worker)
+        QuizJob.objects.create(owner=self.user, batch=batch, video_url='https://www.youtube.com/watch?v=aaaaaaaaaaa')
+        return batch
+
+    def test_only_batches_of_dead_workers_are_resumed(self):
+        live = self.create_batch('other')
+        orphaned = self.create_batch('gone')
+        with mock.patch.object(batches.batch_runner, 'submit') as submit:
+            self.assertEqual(resume_unfinished_batches(), 1)
+        self.assertEqual([call.args[0].pk for call in submit.call_args_list], [orphaned.pk])
+        self.assertEqual(QuizBatch.objects.get(pk=orphaned.pk).worker, WORKER_ID)
+        self.assertEqual(QuizBatch.objects.get(pk=live.pk).worker, 'other')